@@ -0,0 +1,132 @@
+"""Baseline schema, as previously created by Base.metadata.create_all()
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Databases that were created with create_all() are stamped at this revision
+by init_db() instead of running it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _timestamps():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        *_timestamps(),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('full_name', sa.String(length=255), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('role', sa.Enum('USER', 'ADMIN', name='userrole'), nullable=False),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'subscriptions',
+        *_timestamps(),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('plan_id', sa.String(length=50), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('monthly_character_limit', sa.Integer(), nullable=True),
+        sa.Column('monthly_character_usage', sa.Integer(), nullable=True),
+        sa.Column('daily_character_limit', sa.Integer(), nullable=True),
+        sa.Column('daily_character_usage', sa.Integer(), nullable=True),
+        sa.Column('max_voice_clones', sa.Integer(), nullable=True),
+        sa.Column('current_period_start', sa.DateTime(), nullable=True),
+        sa.Column('current_period_end', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_subscriptions_id', 'subscriptions', ['id'])
+
+    op.create_table(
+        'reference_audios',
+        *_timestamps(),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('audio_key', sa.String(length=500), nullable=False),
+        sa.Column('audio_sha256', sa.String(length=64), nullable=True),
+        sa.Column('audio_duration', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('metadata', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_reference_audios_id', 'reference_audios', ['id'])
+
+    op.create_table(
+        'tts_jobs',
+        *_timestamps(),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('QUEUED', 'PROCESSING', 'COMPLETED', 'FAILED', 'CANCELLED', name='ttsjobstatus'), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('voice_type', sa.Enum('STANDARD', 'CLONED', name='ttsvoicetype'), nullable=False),
+        sa.Column('voice_id', sa.String(length=100), nullable=True),
+        sa.Column('reference_audio_id', sa.Integer(), nullable=True),
+        sa.Column('audio_key', sa.String(length=500), nullable=True),
+        sa.Column('audio_sha256', sa.String(length=64), nullable=True),
+        sa.Column('audio_duration', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('metadata', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['reference_audio_id'], ['reference_audios.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_tts_jobs_id', 'tts_jobs', ['id'])
+
+    op.create_table(
+        'storage_blobs',
+        *_timestamps(),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=500), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('cold_key', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key'),
+        sa.UniqueConstraint('cold_key'),
+    )
+    op.create_index('ix_storage_blobs_id', 'storage_blobs', ['id'])
+    op.create_index('ix_storage_blobs_sha256', 'storage_blobs', ['sha256'], unique=True)
+
+    op.create_table(
+        'maintenance_cursors',
+        *_timestamps(),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('position', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_index('ix_maintenance_cursors_id', 'maintenance_cursors', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('maintenance_cursors')
+    op.drop_table('storage_blobs')
+    op.drop_table('tts_jobs')
+    op.drop_table('reference_audios')
+    op.drop_table('subscriptions')
+    op.drop_table('users')
+    for name in ('ttsvoicetype', 'ttsjobstatus', 'userrole'):
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,44 @@
+"""Composite and partial indexes for the hot queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+Indexes are built CONCURRENTLY so tts_jobs stays writable while they build;
+that cannot run inside a transaction, hence the autocommit block.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # name, table, columns, extra keyword arguments
+    ('ix_tts_jobs_user_id_created_at', 'tts_jobs', ['user_id', sa.text('created_at DESC')], {}),
+    ('ix_tts_jobs_user_id_status_created_at', 'tts_jobs', ['user_id', 'status', sa.text('created_at DESC')], {}),
+    ('ix_tts_jobs_queued', 'tts_jobs', ['created_at'], {'postgresql_where': sa.text("status = 'QUEUED'")}),
+    ('ix_tts_jobs_audio_key', 'tts_jobs', ['audio_key'], {}),
+    ('ix_reference_audios_user_id_is_active', 'reference_audios', ['user_id', 'is_active'], {}),
+    ('ix_reference_audios_audio_key', 'reference_audios', ['audio_key'], {}),
+    ('ix_subscriptions_user_id', 'subscriptions', ['user_id'], {}),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True, if_not_exists=True, **kwargs
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+"""Track the day daily usage belongs to, and index scheduled reset lookups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'subscriptions',
+        sa.Column('daily_usage_date', sa.Date(), server_default=sa.text('CURRENT_DATE'), nullable=False)
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_subscriptions_daily_usage_date', 'subscriptions', ['daily_usage_date'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_subscriptions_current_period_end', 'subscriptions', ['current_period_end'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_subscriptions_current_period_end', table_name='subscriptions', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_subscriptions_daily_usage_date', table_name='subscriptions', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('subscriptions', 'daily_usage_date')
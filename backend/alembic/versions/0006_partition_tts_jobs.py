@@ -0,0 +1,141 @@
+"""Partition tts_jobs by month and track archived job payloads
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+The existing table becomes the first partition, tts_jobs_legacy, holding
+everything before the boundary, so no rows are copied. The boundary is
+worked out when the upgrade runs: the first month start after both the
+newest job and the migration itself. The legacy range is proven by a CHECK
+constraint validated while the table stays writable, which lets the attach
+skip its scan, and the new (id, created_at) primary key index is
+built concurrently beforehand: a partitioned table's unique constraints
+must include the partition key. Monthly partitions from the boundary on are
+created here and kept ahead afterwards by app.services.partitions; rows no
+monthly partition covers yet land in tts_jobs_default instead of failing.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _utc(month: date) -> str:
+    return f"'{month} 00:00:00+00'"
+
+
+PARTITIONS_AHEAD = 3
+# Jobs keep being inserted while the migration runs; they must still fall
+# before the boundary, or the CHECK constraint rejects them
+INSERT_MARGIN = timedelta(days=1)
+
+INDEXES = [
+    # name, columns, extra keyword arguments (as on the TTSJob model)
+    ('ix_tts_jobs_id', ['id'], {}),
+    ('ix_tts_jobs_user_id_created_at', ['user_id', sa.text('created_at DESC')], {}),
+    ('ix_tts_jobs_user_id_status_created_at', ['user_id', 'status', sa.text('created_at DESC')], {}),
+    ('ix_tts_jobs_queued', ['created_at'], {'postgresql_where': sa.text("status = 'QUEUED'")}),
+    ('ix_tts_jobs_audio_key', ['audio_key'], {}),
+]
+
+FOREIGN_KEYS = [
+    # constraint suffix, definition
+    ('user_id_fkey', 'FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE'),
+    ('reference_audio_id_fkey', 'FOREIGN KEY (reference_audio_id) REFERENCES reference_audios (id)'),
+]
+
+
+def _boundary(bind) -> date:
+    """The first month start after both the newest job and the end of the insert margin."""
+    latest = datetime.utcnow() + INSERT_MARGIN
+    if bind is not None:
+        # One scan, like the VALIDATE after it; future-dated rows push the boundary out
+        created_at = sa.column('created_at', sa.DateTime(timezone=True))
+        newest = bind.execute(sa.select(sa.func.max(created_at)).select_from(sa.table('tts_jobs'))).scalar()
+        if newest is not None:
+            if newest.tzinfo is not None:
+                newest = newest.astimezone(timezone.utc).replace(tzinfo=None)
+            latest = max(latest, newest)
+    return _add_months(latest.date().replace(day=1), 1)
+
+
+def _legacy_index(name: str) -> str:
+    return name.replace('ix_tts_jobs_', 'ix_tts_jobs_legacy_')
+
+
+def upgrade() -> None:
+    # Offline there are no rows to look at: the boundary only covers the margin
+    boundary = _boundary(None if context.is_offline_mode() else op.get_bind())
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            'ALTER TABLE tts_jobs ADD CONSTRAINT tts_jobs_legacy_range '
+            f'CHECK (created_at IS NOT NULL AND created_at < {_utc(boundary)}) NOT VALID'
+        )
+        op.execute('ALTER TABLE tts_jobs VALIDATE CONSTRAINT tts_jobs_legacy_range')
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS tts_jobs_legacy_pkey ON tts_jobs (id, created_at)')
+
+    op.add_column('tts_jobs', sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True))
+
+    # The validated CHECK constraint lets SET NOT NULL skip its scan
+    op.execute('ALTER TABLE tts_jobs ALTER COLUMN created_at SET NOT NULL')
+    op.execute('ALTER TABLE tts_jobs DROP CONSTRAINT tts_jobs_pkey')
+    op.execute('ALTER TABLE tts_jobs ADD CONSTRAINT tts_jobs_legacy_pkey PRIMARY KEY USING INDEX tts_jobs_legacy_pkey')
+    for suffix, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE tts_jobs RENAME CONSTRAINT tts_jobs_{suffix} TO tts_jobs_legacy_{suffix}')
+    for name, _, _ in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {_legacy_index(name)}')
+    op.execute('ALTER TABLE tts_jobs RENAME TO tts_jobs_legacy')
+
+    op.execute('CREATE TABLE tts_jobs (LIKE tts_jobs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    op.execute('ALTER TABLE tts_jobs ADD CONSTRAINT tts_jobs_pkey PRIMARY KEY (id, created_at)')
+    for suffix, definition in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE tts_jobs ADD CONSTRAINT tts_jobs_{suffix} {definition}')
+    op.execute('ALTER SEQUENCE tts_jobs_id_seq OWNED BY tts_jobs.id')
+    for name, columns, kwargs in INDEXES:
+        op.create_index(name, 'tts_jobs', columns, **kwargs)
+
+    # Matching indexes and foreign keys of the legacy table are attached, not rebuilt
+    op.execute(f'ALTER TABLE tts_jobs ATTACH PARTITION tts_jobs_legacy FOR VALUES FROM (MINVALUE) TO ({_utc(boundary)})')
+    op.execute('ALTER TABLE tts_jobs_legacy DROP CONSTRAINT tts_jobs_legacy_range')
+
+    for offset in range(PARTITIONS_AHEAD + 1):
+        month = _add_months(boundary, offset)
+        op.execute(
+            f'CREATE TABLE tts_jobs_p{month:%Y_%m} PARTITION OF tts_jobs '
+            f'FOR VALUES FROM ({_utc(month)}) TO ({_utc(_add_months(month, 1))})'
+        )
+    op.execute('CREATE TABLE tts_jobs_default PARTITION OF tts_jobs DEFAULT')
+
+
+def downgrade() -> None:
+    # Monthly partitions are folded back into the legacy table; payloads
+    # already moved to the archive stay there
+    op.execute('ALTER SEQUENCE tts_jobs_id_seq OWNED BY NONE')
+    op.execute('ALTER TABLE tts_jobs DETACH PARTITION tts_jobs_legacy')
+    op.execute('INSERT INTO tts_jobs_legacy SELECT * FROM tts_jobs')
+    op.execute('DROP TABLE tts_jobs')
+
+    op.execute('ALTER TABLE tts_jobs_legacy RENAME TO tts_jobs')
+    for name, _, _ in INDEXES:
+        op.execute(f'ALTER INDEX {_legacy_index(name)} RENAME TO {name}')
+    for suffix, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE tts_jobs RENAME CONSTRAINT tts_jobs_legacy_{suffix} TO tts_jobs_{suffix}')
+    op.execute('ALTER TABLE tts_jobs DROP CONSTRAINT tts_jobs_legacy_pkey')
+    op.execute('ALTER TABLE tts_jobs ADD CONSTRAINT tts_jobs_pkey PRIMARY KEY (id)')
+    op.execute('ALTER TABLE tts_jobs ALTER COLUMN created_at DROP NOT NULL')
+    op.execute('ALTER SEQUENCE tts_jobs_id_seq OWNED BY tts_jobs.id')
+    op.drop_column('tts_jobs', 'archived_at')
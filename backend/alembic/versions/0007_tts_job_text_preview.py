@@ -0,0 +1,54 @@
+"""Store a short preview of each job's text for history listings
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+Existing rows are filled in batches, each committed on its own, so the
+backfill never holds many row locks or one long transaction. Batches walk
+the primary key, (id, created_at), from the last key of the previous batch,
+so each one reads only its own rows from the index.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+PREVIEW_LENGTH = 140  # TEXT_PREVIEW_LENGTH in app.models.tts
+BATCH_SIZE = 5000
+
+
+def _backfill(after: str) -> sa.TextClause:
+    """Fill one batch of previews and return the batch's last key."""
+    return sa.text(
+        f'WITH batch AS (SELECT id, created_at FROM tts_jobs {after} ORDER BY id, created_at LIMIT {BATCH_SIZE}), '
+        f'filled AS (UPDATE tts_jobs SET text_preview = left(tts_jobs.text, {PREVIEW_LENGTH}) FROM batch '
+        'WHERE tts_jobs.id = batch.id AND tts_jobs.created_at = batch.created_at) '
+        'SELECT id, created_at FROM batch ORDER BY id DESC, created_at DESC LIMIT 1'
+    )
+
+
+FIRST_BATCH = _backfill('')
+NEXT_BATCH = _backfill('WHERE (id, created_at) > (:id, :created_at)')
+
+
+def upgrade() -> None:
+    op.add_column('tts_jobs', sa.Column('text_preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+
+    with op.get_context().autocommit_block():
+        if context.is_offline_mode():
+            op.execute(f'UPDATE tts_jobs SET text_preview = left(text, {PREVIEW_LENGTH}) WHERE text_preview IS NULL')
+            return
+        bind = op.get_bind()
+        last = bind.execute(FIRST_BATCH).first()
+        while last is not None:
+            last = bind.execute(NEXT_BATCH, {'id': last.id, 'created_at': last.created_at}).first()
+
+
+def downgrade() -> None:
+    op.drop_column('tts_jobs', 'text_preview')
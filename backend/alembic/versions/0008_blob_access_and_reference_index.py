@@ -0,0 +1,61 @@
+"""Track when blobs were last read, and index jobs by reference audio
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+Cold tiering picks blobs by last_accessed_at instead of updated_at, which
+only changes on writes. Existing blobs count as accessed when this runs:
+now() is evaluated once, so adding the column does not rewrite the table.
+
+Purging a reference audio unlinks its jobs by reference_audio_id. An index
+on a partitioned table cannot be built concurrently, so it is created on
+the parent alone and each partition's index is built concurrently and
+attached; partitions created later inherit it.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_tts_jobs_reference_audio_id'
+
+
+def upgrade() -> None:
+    op.add_column(
+        'storage_blobs',
+        sa.Column('last_accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_storage_blobs_last_accessed_at', 'storage_blobs', ['last_accessed_at'],
+            postgresql_where=sa.text('cold_key IS NULL'), postgresql_concurrently=True, if_not_exists=True
+        )
+
+        if context.is_offline_mode():
+            # The partitions are unknown without a connection: one locking build
+            op.create_index(INDEX, 'tts_jobs', ['reference_audio_id'], if_not_exists=True)
+            return
+        op.execute(f'CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY tts_jobs (reference_audio_id)')
+        partitions = op.get_bind().execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST('tts_jobs' AS regclass) ORDER BY c.relname"
+        )).scalars().all()
+        for partition in partitions:
+            name = f'{partition}_reference_audio_id_idx'
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {partition} (reference_audio_id)')
+            op.execute(f'ALTER INDEX {INDEX} ATTACH PARTITION {name}')
+
+
+def downgrade() -> None:
+    # Dropping the parent index drops the attached partition indexes with it
+    op.execute(f'DROP INDEX IF EXISTS {INDEX}')
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_storage_blobs_last_accessed_at', table_name='storage_blobs', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('storage_blobs', 'last_accessed_at')
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from app.core import security
@@ -25,13 +25,13 @@ router = APIRouter()
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Register a new user.
     """
     # Check if user already exists
-    db_user = get_user_by_email(db, email=user_in.email)
+    db_user = await get_user_by_email(db, email=user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,7 +39,7 @@ async def register(
         )
     
     # Create new user
-    user = create_user(db, user_in)
+    user = await create_user(db, user_in)
     
     return {
         "data": user,
@@ -48,14 +48,14 @@ async def register(
 
 @router.post("/login", response_model=UserTokenResponse)
 async def login(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
     """
     # Authenticate user
-    user = authenticate_user(
+    user = await authenticate_user(
         db=db,
         email=form_data.username,
         password=form_data.password
@@ -90,7 +90,7 @@ async def login(
 @router.post("/refresh-token", response_model=UserTokenResponse)
 async def refresh_token(
     current_user: User = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Refresh access token.
@@ -111,12 +111,12 @@ async def refresh_token(
 @router.post("/forgot-password", response_model=UserMessageResponse)
 async def forgot_password(
     email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Request password reset.
     """
-    user = get_user_by_email(db, email=email)
+    user = await get_user_by_email(db, email=email)
     if not user:
         # Don't reveal that the user doesn't exist
         return {"message": "If an account exists with this email, a password reset link has been sent"}
@@ -129,7 +129,7 @@ async def forgot_password(
 async def reset_password(
     token: str,
     new_password: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Reset password with a valid token.
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File, Form
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime
 import json
+import logging
+import mimetypes
 
-from app.core.security import get_current_user
+from app.core.security import get_current_user, get_current_admin_user, get_read_db
+from app.core.streaming import etag_matches, stored_file_response
 from app.db.session import get_db
 from app.models.user import User
 from app.models.tts import TTSJob, TTSJobStatus, ReferenceAudio
@@ -16,10 +20,21 @@ from app.schemas.tts import (
     ReferenceAudioResponse,
     ReferenceAudiosResponse,
     TTSUsageResponse,
-    TTSJobFilter
+    TTSJobFilter,
+    TTSOutputFormat,
+    StorageStatsResponse
 )
-from app.services.tts import TTSService, get_tts_service
-from app.services.storage import StorageService
+from app.services.archive import restore_archived_payload
+from app.services.audio_formats import FORMAT_INFO, derivative_key, is_format_available, stream_derivative
+from app.services.blobs import BlobStore
+from app.services.export import HistoryExporter
+from app.services.storage import get_storage_service, get_async_storage_service
+from app.services.tts import DEFAULT_JOB_LIST_FIELDS, TTSService, get_read_tts_service, get_tts_service, job_list_item
+from app.services.urls import URLService, get_url_service
+from app.services.usage import get_usage_summary
+from app.services.waveform import peaks_key, select_level, store_peaks
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -27,23 +42,26 @@ router = APIRouter()
 async def submit_tts_job(
     request: TTSGenerateRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    tts_service: TTSService = Depends(get_tts_service)
+    db: AsyncSession = Depends(get_db),
+    tts_service: TTSService = Depends(get_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
     Submit a new text-to-speech job.
     """
     try:
         # Create the TTS job
-        job = tts_service.create_tts_job(current_user, request)
+        job = await tts_service.create_tts_job(current_user, request)
         
         # In a real implementation, you would queue the job for processing
         # For now, we'll simulate processing it immediately
         try:
-            tts_service.process_tts_job(job.id)
-        except Exception as e:
+            await tts_service.process_tts_job(job.id, job.created_at)
+        except Exception:
             # Log the error but don't fail the request
-            print(f"Error processing TTS job: {e}")
+            logger.exception("Error processing TTS job %s", job.id)
+        
+        await url_service.attach_job_urls(tts_service.db, [job])
         
         return {
             "data": job,
@@ -65,69 +83,216 @@ async def submit_tts_job(
 async def get_tts_job_status(
     job_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    tts_service: TTSService = Depends(get_tts_service)
+    tts_service: TTSService = Depends(get_read_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
     Get the status of a TTS job.
     """
-    job = tts_service.get_job_status(job_id, current_user.id)
+    job = await tts_service.get_job_status(job_id, current_user.id)
     if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
     
+    # Old jobs keep only their summary in the table
+    await restore_archived_payload(job)
+    await url_service.attach_job_urls(tts_service.db, [job])
+    
     return {"data": job}
 
+@router.get("/audio/{job_id}")
+async def get_tts_job_audio(
+    job_id: int,
+    request: Request,
+    format: Optional[TTSOutputFormat] = None,
+    current_user: User = Depends(get_current_user),
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Stream the generated audio of a TTS job.
+    Supports Range requests so players can seek without downloading the whole file.
+    Defaults to the output format chosen at submit time; other formats are
+    encoded on first request and cached.
+    """
+    job = await tts_service.get_job_status(job_id, current_user.id)
+    if not job or not job.audio_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audio not found"
+        )
+    
+    output_format = format or TTSOutputFormat((job.metadata_ or {}).get("output_format", TTSOutputFormat.WAV.value))
+    storage = get_async_storage_service()
+    await tts_service.ensure_audio_available(job.audio_key)
+    
+    if output_format == TTSOutputFormat.WAV or not job.audio_sha256:
+        return await stored_file_response(
+            request,
+            storage,
+            job.audio_key,
+            etag=f'"{job.audio_sha256}"' if job.audio_sha256 else None,
+            media_type="audio/wav"
+        )
+    
+    if not is_format_available(output_format):
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Output format '{output_format.value}' is not available"
+        )
+    
+    media_type = FORMAT_INFO[output_format][1]
+    cache_key = derivative_key(job.audio_sha256, output_format)
+    if await storage.file_exists(cache_key):
+        return await stored_file_response(
+            request,
+            storage,
+            cache_key,
+            etag=f'"{job.audio_sha256}-{output_format.value}"',
+            media_type=media_type
+        )
+    
+    # First request for this format: stream while encoding (no ranges yet)
+    return StreamingResponse(
+        stream_derivative(storage, job.audio_key, cache_key, output_format),
+        media_type=media_type
+    )
+
+@router.get("/audio/{job_id}/peaks")
+async def get_tts_job_peaks(
+    job_id: int,
+    request: Request,
+    buckets: int = Query(256, ge=1, le=4096),
+    current_user: User = Depends(get_current_user),
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Get precomputed waveform peaks of a TTS job's audio.
+    Returns the smallest stored resolution with at least `buckets` (min, max)
+    pairs as a compact binary blob; peaks never change, so they are cached for good.
+    """
+    job = await tts_service.get_job_status(job_id, current_user.id)
+    if not job or not job.audio_key or not job.audio_sha256:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audio not found"
+        )
+    
+    headers = {
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "ETag": f'"{job.audio_sha256}-peaks-{buckets}"'
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    storage = get_async_storage_service()
+    key = peaks_key(job.audio_sha256)
+    if not await storage.file_exists(key):
+        # Audio generated before peaks existed: compute them once now
+        await tts_service.ensure_audio_available(job.audio_key)
+        await store_peaks(storage, job.audio_sha256, await storage.download_file(job.audio_key))
+    
+    blob = select_level(await storage.download_file(key), buckets)
+    if blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Invalid waveform data"
+        )
+    
+    return Response(content=blob, media_type="application/octet-stream", headers=headers)
+
 @router.post("/cancel/{job_id}", response_model=TTSJobResponse)
 async def cancel_tts_job(
     job_id: int,
     current_user: User = Depends(get_current_user),
-    tts_service: TTSService = Depends(get_tts_service)
+    tts_service: TTSService = Depends(get_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
     Cancel a pending TTS job.
     """
-    success = tts_service.cancel_job(job_id, current_user.id)
+    success = await tts_service.cancel_job(job_id, current_user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Could not cancel job. It may have already been processed or does not exist."
         )
     
+    job = await tts_service.get_job_status(job_id, current_user.id)
+    await url_service.attach_job_urls(tts_service.db, [job])
+    
     return {
-        "data": tts_service.get_job_status(job_id, current_user.id),
+        "data": job,
         "message": "Job cancelled successfully"
     }
 
 @router.get("/history", response_model=TTSJobsResponse)
 async def get_tts_history(
     status: Optional[TTSJobStatus] = None,
-    page: int = 1,
-    limit: int = 10,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(False, description="Also return the (cached) total count"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated job fields to return; by default everything but text and metadata"
+    ),
     current_user: User = Depends(get_current_user),
-    tts_service: TTSService = Depends(get_tts_service)
+    tts_service: TTSService = Depends(get_read_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
-    Get the current user's TTS job history.
+    Get the current user's TTS job history, newest first.
     """
-    offset = (page - 1) * limit
-    jobs, total = tts_service.get_user_jobs(
-        current_user.id,
-        status=status,
-        limit=limit,
-        offset=offset
-    )
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else DEFAULT_JOB_LIST_FIELDS
+    try:
+        jobs, next_cursor, total = await tts_service.get_user_jobs(
+            current_user.id,
+            status=status,
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total,
+            fields=selected
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await url_service.attach_job_urls(tts_service.db, jobs)
     
     return {
-        "data": jobs,
-        "total": total,
-        "page": page,
+        "data": [job_list_item(job, selected) for job in jobs],
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit if limit > 0 else 0
+        "next_cursor": next_cursor,
+        "total": total
     }
 
+@router.get("/history/export")
+async def export_tts_history(
+    status: Optional[TTSJobStatus] = TTSJobStatus.COMPLETED,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the current user's generated audio as a ZIP archive.
+    The archive is built while it is sent: audio files are deflated one by one
+    next to a manifest.json describing every exported job.
+    """
+    exporter = HistoryExporter(
+        current_user.id,
+        status=status,
+        created_from=created_from,
+        created_to=created_to
+    )
+    filename = f"speechix-history-{exporter.started_at:%Y%m%d-%H%M%S}.zip"
+    
+    # A sync generator with its own sync session: Starlette pulls each chunk
+    # in the threadpool, so the export's queries never block the event loop
+    return StreamingResponse(
+        exporter.stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/voices", response_model=TTSVoicesResponse)
 async def get_available_voices(
     language: Optional[str] = None,
@@ -177,7 +342,8 @@ async def upload_reference_audio(
     is_public: bool = Form(False),
     metadata: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user),
-    tts_service: TTSService = Depends(get_tts_service)
+    tts_service: TTSService = Depends(get_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
     Upload a reference audio file for voice cloning.
@@ -197,7 +363,7 @@ async def upload_reference_audio(
         file_data = await file.read()
         
         # Create the reference audio
-        audio = tts_service.create_reference_audio(
+        audio = await tts_service.create_reference_audio(
             user_id=current_user.id,
             file_data=file_data,
             filename=file.filename,
@@ -206,6 +372,7 @@ async def upload_reference_audio(
             is_public=is_public,
             metadata=metadata_dict
         )
+        await url_service.attach_reference_audio_urls(tts_service.db, [audio])
         
         return {
             "data": audio,
@@ -226,30 +393,61 @@ async def upload_reference_audio(
 @router.get("/reference-audios", response_model=ReferenceAudiosResponse)
 async def get_reference_audios(
     is_active: bool = True,
-    page: int = 1,
-    limit: int = 10,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(10, ge=1, le=100),
+    include_total: bool = Query(False, description="Also return the (cached) total count"),
     current_user: User = Depends(get_current_user),
-    tts_service: TTSService = Depends(get_tts_service)
+    tts_service: TTSService = Depends(get_read_tts_service),
+    url_service: URLService = Depends(get_url_service)
 ):
     """
-    Get the current user's reference audios.
+    Get the current user's reference audios, newest first.
     """
-    offset = (page - 1) * limit
-    audios, total = tts_service.get_reference_audios(
-        current_user.id,
-        is_active=is_active,
-        limit=limit,
-        offset=offset
-    )
+    try:
+        audios, next_cursor, total = await tts_service.get_reference_audios(
+            current_user.id,
+            is_active=is_active,
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await url_service.attach_reference_audio_urls(tts_service.db, audios)
     
     return {
         "data": audios,
-        "total": total,
-        "page": page,
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit if limit > 0 else 0
+        "next_cursor": next_cursor,
+        "total": total
     }
 
+@router.get("/reference-audios/{audio_id}/audio")
+async def get_reference_audio_file(
+    audio_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    tts_service: TTSService = Depends(get_tts_service)
+):
+    """
+    Stream a reference audio file, with Range support.
+    """
+    audio = await tts_service.get_reference_audio(audio_id, current_user.id)
+    if not audio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reference audio not found"
+        )
+    
+    await tts_service.ensure_audio_available(audio.audio_key)
+    return await stored_file_response(
+        request,
+        get_async_storage_service(),
+        audio.audio_key,
+        etag=f'"{audio.audio_sha256}"' if audio.audio_sha256 else None,
+        media_type=mimetypes.guess_type(audio.audio_key)[0] or "application/octet-stream"
+    )
+
 @router.delete("/reference-audios/{audio_id}", response_model=ReferenceAudioResponse)
 async def delete_reference_audio(
     audio_id: int,
@@ -259,7 +457,7 @@ async def delete_reference_audio(
     """
     Delete a reference audio.
     """
-    success = tts_service.delete_reference_audio(audio_id, current_user.id)
+    success = await tts_service.delete_reference_audio(audio_id, current_user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -273,7 +471,7 @@ async def delete_reference_audio(
 @router.get("/usage", response_model=TTSUsageResponse)
 async def get_tts_usage(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get the current user's TTS usage statistics.
@@ -284,43 +482,23 @@ async def get_tts_usage(
             detail="No active subscription found"
         )
     
-    # Get job statistics
-    from sqlalchemy import func, and_, extract
-    from datetime import datetime, timedelta
-    
-    today = datetime.utcnow().date()
-    start_of_month = datetime.utcnow().replace(day=1).date()
-    
-    # Get today's jobs
-    today_jobs = db.query(TTSJob).filter(
-        TTSJob.user_id == current_user.id,
-        func.date(TTSJob.created_at) == today,
-        TTSJob.status == TTSJobStatus.COMPLETED
-    ).all()
-    
-    # Get this month's jobs
-    month_jobs = db.query(TTSJob).filter(
-        TTSJob.user_id == current_user.id,
-        func.date(TTSJob.created_at) >= start_of_month,
-        TTSJob.status == TTSJobStatus.COMPLETED
-    ).all()
-    
-    # Count active reference audios
-    active_audios = db.query(ReferenceAudio).filter(
-        ReferenceAudio.user_id == current_user.id,
-        ReferenceAudio.is_active == True
-    ).count()
+    # Answered from the daily rollups rather than by scanning jobs
+    return {"data": await get_usage_summary(db, current_user)}
+
+@router.get("/storage/stats", response_model=StorageStatsResponse)
+async def get_storage_stats(
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get storage deduplication and cache statistics (admin only).
+    """
+    storage = get_storage_service()
     
     return {
         "data": {
-            "daily_usage": current_user.subscription.daily_character_usage,
-            "daily_limit": current_user.subscription.daily_character_limit,
-            "monthly_usage": current_user.subscription.monthly_character_usage,
-            "monthly_limit": current_user.subscription.monthly_character_limit,
-            "voice_clones_used": active_audios,
-            "voice_clones_limit": current_user.subscription.max_voice_clones,
-            "jobs_today": len(today_jobs),
-            "characters_today": sum(len(job.text) for job in today_jobs),
-            "characters_this_month": sum(len(job.text) for job in month_jobs)
+            "storage_type": storage.storage_type,
+            "dedup": await BlobStore(db).stats(),
+            "disk_cache": storage.cache_stats()
         }
     }
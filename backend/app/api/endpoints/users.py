@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from app.core.security import get_current_user, get_current_admin_user
+from app.core.principal_cache import principal_cache
+from app.core.security import get_current_user, get_current_admin_user, get_read_db
 from app.db.session import get_db
 from app.models.user import User, UserRole
 from app.schemas.user import (
@@ -21,19 +22,20 @@ from app.services.user import (
     delete_user as delete_user_service,
     update_user_subscription
 )
+from app.services.usage import get_usage_summary
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserProfileResponse)
 async def read_user_me(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get current user's profile.
     """
     # Refresh the user to get the latest data
-    db_user = get_user(db, current_user.id)
+    db_user = await get_user(db, current_user.id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -43,13 +45,17 @@ async def read_user_me(
 async def update_user_me(
     user_in: UserUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update current user's profile.
     """
+    db_user = await get_user(db, current_user.id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     try:
-        updated_user = update_user_service(db, current_user, user_in)
+        updated_user = await update_user_service(db, db_user, user_in)
         return {
             "data": updated_user,
             "message": "Profile updated successfully"
@@ -60,7 +66,7 @@ async def update_user_me(
 @router.get("/me/usage", response_model=UserUsageResponse)
 async def get_my_usage(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get current user's usage statistics.
@@ -68,66 +74,53 @@ async def get_my_usage(
     if not current_user.subscription:
         raise HTTPException(status_code=400, detail="No subscription found")
     
-    sub = current_user.subscription
-    
-    return {
-        "data": {
-            "daily_usage": sub.daily_character_usage,
-            "daily_limit": sub.daily_character_limit,
-            "monthly_usage": sub.monthly_character_usage,
-            "monthly_limit": sub.monthly_character_limit,
-            "voice_clones_used": 0,  # Will be implemented with reference audios
-            "voice_clones_limit": sub.max_voice_clones
-        }
-    }
+    return {"data": await get_usage_summary(db, current_user)}
 
 # Admin routes
 @router.get("/", response_model=UsersResponse)
 async def get_users(
-    page: int = Query(1, ge=1, description="Page number"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     limit: int = Query(10, ge=1, le=100, description="Items per page"),
     email: Optional[str] = None,
     is_active: Optional[bool] = None,
     role: Optional[UserRole] = None,
+    include_total: bool = Query(False, description="Also return the (cached) total count"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Get a list of users (admin only).
+    Get a list of users, newest first (admin only).
     """
-    skip = (page - 1) * limit
-    
-    # Get filtered users
-    users = get_users_service(
-        db,
-        skip=skip,
-        limit=limit,
-        email=email,
-        is_active=is_active,
-        role=role.value if role else None
-    )
-    
-    # Get total count for pagination
-    total = db.query(User).count()
+    try:
+        users, next_cursor, total = await get_users_service(
+            db,
+            limit=limit,
+            cursor=cursor,
+            email=email,
+            is_active=is_active,
+            role=role,
+            include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "data": users,
-        "total": total,
-        "page": page,
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit
+        "next_cursor": next_cursor,
+        "total": total
     }
 
 @router.get("/{user_id}", response_model=UserProfileResponse)
 async def get_user_by_id(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a user by ID (admin only).
     """
-    user = get_user(db, user_id)
+    user = await get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -138,17 +131,17 @@ async def update_user_by_id(
     user_id: int,
     user_in: UserUpdate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a user by ID (admin only).
     """
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     try:
-        updated_user = update_user_service(db, db_user, user_in)
+        updated_user = await update_user_service(db, db_user, user_in)
         return {
             "data": updated_user,
             "message": "User updated successfully"
@@ -160,7 +153,7 @@ async def update_user_by_id(
 async def delete_user_by_id(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a user by ID (admin only).
@@ -171,7 +164,7 @@ async def delete_user_by_id(
             detail="Cannot delete your own account"
         )
     
-    if not delete_user_service(db, user_id):
+    if not await delete_user_service(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     return {"message": "User deleted successfully"}
@@ -180,7 +173,7 @@ async def delete_user_by_id(
 async def suspend_user(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Suspend or unsuspend a user (admin only).
@@ -191,14 +184,14 @@ async def suspend_user(
             detail="Cannot suspend your own account"
         )
     
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     db_user.is_active = not db_user.is_active
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await principal_cache.invalidate(user_id)
     
     action = "suspended" if not db_user.is_active else "activated"
     
@@ -212,7 +205,7 @@ async def set_admin(
     user_id: int,
     is_admin: bool = True,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Grant or revoke admin privileges (admin only).
@@ -223,14 +216,14 @@ async def set_admin(
             detail="Cannot modify your own admin status"
         )
     
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     db_user.role = UserRole.ADMIN if is_admin else UserRole.USER
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await principal_cache.invalidate(user_id)
     
     action = "granted admin privileges to" if is_admin else "revoked admin privileges from"
     
@@ -248,16 +241,16 @@ async def set_user_plan(
     max_voice_clones: int,
     is_active: bool = True,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Set a user's subscription plan (admin only).
     """
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user or not db_user.subscription:
         raise HTTPException(status_code=404, detail="User or subscription not found")
     
-    success = update_user_subscription(
+    success = await update_user_subscription(
         db=db,
         user_id=user_id,
         plan_id=plan_id,
@@ -269,9 +262,10 @@ async def set_user_plan(
     
     if not success:
         raise HTTPException(status_code=400, detail="Failed to update subscription")
+    await principal_cache.invalidate(user_id)
     
     # Refresh user data
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     
     return {
         "data": db_user,
@@ -284,12 +278,12 @@ async def adjust_user_credits(
     daily_credits: Optional[int] = None,
     monthly_credits: Optional[int] = None,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Adjust a user's credit limits (admin only).
     """
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user or not db_user.subscription:
         raise HTTPException(status_code=404, detail="User or subscription not found")
     
@@ -301,8 +295,8 @@ async def adjust_user_credits(
         subscription.monthly_character_limit = monthly_credits
     
     db.add(subscription)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await principal_cache.invalidate(user_id)
     
     return {
         "data": db_user,
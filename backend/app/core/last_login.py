@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from sqlalchemy import bindparam, or_
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.db.session import async_engine
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+class LastLoginBuffer:
+    """
+    Coalesces users' last-seen times in memory and writes them in batches.
+
+    Authenticated requests only touch a dict; a background task flushes it
+    every flush_interval seconds, or sooner once max_pending users are
+    waiting, as one executemany UPDATE. The UPDATE skips users whose stored
+    value is younger than min_interval, so a polling client causes at most
+    one write per min_interval.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine = async_engine,
+        flush_interval: float = settings.LAST_LOGIN_FLUSH_SECONDS,
+        max_pending: int = settings.LAST_LOGIN_MAX_PENDING,
+        min_interval: float = settings.LAST_LOGIN_MIN_INTERVAL_SECONDS
+    ):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.min_interval = timedelta(seconds=min_interval)
+        self._pending: Dict[int, datetime] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.flushes = 0
+        self.rows_written = 0
+
+    def touch(self, user_id: int) -> None:
+        """Record that a user was seen now."""
+        # Naive UTC, like the last_login column
+        self._pending[user_id] = datetime.utcnow()
+        if len(self._pending) >= self.max_pending and self._flusher is not None:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> int:
+        """
+        Write every buffered time in one batched UPDATE.
+
+        Returns:
+            The number of users flushed, including ones the UPDATE skipped
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+
+        users = User.__table__
+        stmt = (
+            users.update()
+            .where(
+                users.c.id == bindparam("user_id"),
+                # Compared with the database rather than a cached copy: this
+                # never moves a newer value (from another worker) backwards
+                # and leaves values younger than min_interval alone
+                or_(users.c.last_login.is_(None), users.c.last_login < bindparam("stale_before"))
+            )
+            .values(last_login=bindparam("seen_at"))
+        )
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(stmt, [
+                    {"user_id": user_id, "seen_at": seen_at, "stale_before": seen_at - self.min_interval}
+                    for user_id, seen_at in pending.items()
+                ])
+        except Exception:
+            logger.exception("Failed to write last login times for %d users", len(pending))
+            # Keep them for the next flush unless the user has been seen again since
+            for user_id, seen_at in pending.items():
+                self._pending.setdefault(user_id, seen_at)
+            return 0
+
+        self.flushes += 1
+        self.rows_written += len(pending)
+        return len(pending)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush on the running event loop."""
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still buffered."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+last_login_buffer = LastLoginBuffer()
@@ -0,0 +1,106 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing just past the row with this (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    model: Any,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query, newest first, by seeking past the cursor.
+
+    Unlike OFFSET, the database jumps straight to the cursor through the
+    (…, created_at, id) ordering, so every page costs the same as the first.
+
+    Args:
+        db: Database session
+        query: A select() of model, with filters but without ordering
+        model: Mapped class with created_at and id columns
+        limit: Page size
+        cursor: next_cursor from the previous page, if any
+
+    Returns:
+        The page of rows and the cursor of the next page (None on the last one)
+    """
+    if cursor:
+        query = query.where(tuple_(model.created_at, model.id) < decode_cursor(cursor))
+
+    # One extra row tells whether another page follows
+    rows = list(await db.scalars(
+        query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    ))
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+class CountCache:
+    """
+    Short-lived cache of COUNT(*) results for list totals.
+
+    Totals are informational (the cursor alone drives paging), so being a few
+    seconds stale is fine and saves a full count of the filtered rows on every
+    page request.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str, count: Callable[[], Awaitable[int]]) -> int:
+        """Return the cached total for key, running count() when missing or stale."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        total = await count()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, prefix: str) -> None:
+        """Drop every cached total whose key starts with prefix."""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+count_cache = CountCache(settings.PAGINATION_COUNT_TTL_SECONDS, settings.PAGINATION_COUNT_CACHE_ENTRIES)
+
+def count_key(*parts: Any) -> str:
+    """Cache key for a filtered total, e.g. count_key("jobs", user_id, status)."""
+    return ":".join("" if part is None else str(getattr(part, "value", part)) for part in parts)
@@ -0,0 +1,174 @@
+import enum
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.models.user import Subscription, User
+
+logger = logging.getLogger(__name__)
+
+# Never cached: secrets, and counters that change on every submit
+_EXCLUDED = {
+    User: {"hashed_password"},
+    Subscription: {"daily_character_usage", "monthly_character_usage"},
+}
+
+def _snapshot(obj: Any) -> Dict[str, Any]:
+    """JSON-safe copy of a row's cacheable column attributes."""
+    data = {}
+    for attr in inspect(type(obj)).column_attrs:
+        if attr.key in _EXCLUDED[type(obj)]:
+            continue
+        value = getattr(obj, attr.key)
+        if isinstance(value, enum.Enum):
+            value = value.value
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        data[attr.key] = value
+    return data
+
+def _restore(model: Any, data: Dict[str, Any]) -> Any:
+    """Rebuild a detached instance from a snapshot; the session sees it as already persisted."""
+    values = {}
+    for attr in inspect(model).column_attrs:
+        if attr.key not in data:
+            continue
+        value = data[attr.key]
+        if value is not None:
+            python_type = attr.columns[0].type.python_type
+            if python_type in (datetime, date):
+                value = python_type.fromisoformat(value)
+            elif issubclass(python_type, enum.Enum):
+                value = python_type(value)
+        values[attr.key] = value
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated users and their subscription limits.
+
+    Saves the user + subscription lookup on every authenticated request.
+    Entries are column snapshots rather than ORM objects: each hit builds
+    fresh detached User/Subscription instances, so nothing is shared between
+    requests or sessions. Admin changes to a user call invalidate() so that
+    suspensions and role changes apply on the next request.
+
+    With PRINCIPAL_CACHE_BACKEND="redis" entries live in Redis instead of
+    process memory, and an invalidation reaches every replica at once; with
+    the in-process LRU other replicas catch up within the TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, backend: str = "memory"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries: "OrderedDict[int, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _redis_client(self):
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+        return self._redis
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    async def _get_raw(self, user_id: int) -> Optional[str]:
+        if self.backend == "redis":
+            try:
+                raw = await self._redis_client().get(self._key(user_id))
+            except Exception:
+                logger.exception("Principal cache read failed")
+                return None
+            return raw.decode() if raw else None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    async def _set_raw(self, user_id: int, raw: str) -> None:
+        if self.backend == "redis":
+            try:
+                await self._redis_client().set(self._key(user_id), raw, ex=max(1, int(self.ttl)))
+            except Exception:
+                logger.exception("Principal cache write failed")
+            return
+
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, raw)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> Optional[User]:
+        """
+        A detached User, with its subscription, rebuilt from the cache.
+
+        Args:
+            user_id: ID from the access token
+
+        Returns:
+            None on a miss. Attributes excluded from the cache (the password
+            hash and usage counters) are not loaded on the returned objects.
+        """
+        raw = await self._get_raw(user_id)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        data = json.loads(raw)
+        user = _restore(User, data["user"])
+        subscription = _restore(Subscription, data["subscription"]) if data["subscription"] else None
+        set_committed_value(user, "subscription", subscription)
+        return user
+
+    async def set(self, user: User) -> None:
+        """Cache a user loaded with their subscription."""
+        raw = json.dumps({
+            "user": _snapshot(user),
+            "subscription": _snapshot(user.subscription) if user.subscription else None,
+        })
+        await self._set_raw(user.id, raw)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Forget a user, so the next request reloads them from the database."""
+        if self.backend == "redis":
+            try:
+                await self._redis_client().delete(self._key(user_id))
+            except Exception:
+                logger.exception("Principal cache invalidation failed for user %s", user_id)
+            return
+
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    settings.PRINCIPAL_CACHE_BACKEND
+)
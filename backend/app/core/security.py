@@ -1,25 +1,111 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, AsyncGenerator, Callable, Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import settings
+from app.core.last_login import last_login_buffer
+from app.core.principal_cache import principal_cache
 from app.models.user import User
-from app.db.session import get_db
-from sqlalchemy.orm import Session
+from app.db.session import get_db, read_session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+
+logger = logging.getLogger(__name__)
+
+def _build_password_context() -> CryptContext:
+    """
+    Hashing policy from settings: the first scheme hashes new passwords, the
+    others are only verified. Hashes made with another scheme or cost are
+    flagged for rehashing (see verify_and_update_password).
+    """
+    options: Dict[str, Any] = {}
+    if "bcrypt" in settings.PASSWORD_HASH_SCHEMES:
+        options["bcrypt__rounds"] = settings.BCRYPT_ROUNDS
+    if "argon2" in settings.PASSWORD_HASH_SCHEMES:
+        options["argon2__time_cost"] = settings.ARGON2_TIME_COST
+        options["argon2__memory_cost"] = settings.ARGON2_MEMORY_COST
+        options["argon2__parallelism"] = settings.ARGON2_PARALLELISM
+    return CryptContext(schemes=settings.PASSWORD_HASH_SCHEMES, deprecated="auto", **options)
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = _build_password_context()
+
+class PasswordHasher:
+    """
+    Runs password hashing on a small dedicated thread pool.
+    
+    A hash costs hundreds of milliseconds of CPU, which would stall every
+    other request on the event loop. The pool is separate from the default
+    executor so a burst of logins cannot starve other threaded work, and
+    calls beyond max_pending are refused instead of queueing without bound.
+    """
+    
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        
+        # Only touched from the event loop thread
+        self.pending = 0  # queued or running
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+    
+    async def run(self, func: Callable, *args) -> Any:
+        """Call func(*args) on the hashing pool."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Password hashing queue full (%d pending)", self.pending)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.busy_seconds += time.perf_counter() - start
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": self.busy_seconds / self.completed if self.completed else 0.0,
+        }
+
+password_hasher = PasswordHasher(pwd_context, settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if its hash uses an outdated scheme or cost,
+    return a fresh hash to store in its place.
+    """
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
     """Generate a password hash."""
-    return pwd_context.hash(password)
+    return await password_hasher.run(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
@@ -36,7 +122,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """Dependency to get the current user from the JWT token."""
@@ -56,19 +142,40 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Commits in this request's session count as the user's own writes,
+    # which keeps their next reads on the primary (see read_session)
+    db.info["user_id"] = user_id
+    
+    # Usually served from the cache as a detached copy without the password
+    # hash or usage counters; load the user when those are needed
+    user = await principal_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = await db.scalar(
+            select(User).options(selectinload(User.subscription), raiseload("*")).where(User.id == user_id)
+        )
+        if user is None:
+            raise credentials_exception
+        await principal_cache.set(user)
+        # Hand the connection back before the handler runs: read-only
+        # handlers open a session of their own, and holding two connections
+        # per request deadlocks the pool once it is fully checked out
+        await db.commit()
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    # Update last login time
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Written later in a batch, so read-only requests stay read-only
+    last_login_buffer.touch(user.id)
     
     return user
 
+async def get_read_db(
+    current_user: User = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for read-only endpoints: a replica session unless the user has just written."""
+    async with read_session(current_user.id) as db:
+        yield db
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
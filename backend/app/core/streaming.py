@@ -0,0 +1,201 @@
+import os
+from typing import BinaryIO, Dict, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.services.storage import AsyncStorageService
+
+CHUNK_SIZE = 64 * 1024
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header lies entirely outside the file."""
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range: bytes=...`` header.
+
+    Args:
+        range_header: The raw header value
+        size: The size of the file in bytes
+
+    Returns:
+        An inclusive (start, end) byte range, or None to serve the whole file
+        (no header, or one we choose not to honour such as multiple ranges)
+
+    Raises:
+        RangeNotSatisfiable: If the range starts past the end of the file
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+
+    return start, min(end, size - 1)
+
+def etag_matches(header: Optional[str], etag: Optional[str]) -> bool:
+    """Check an If-None-Match / If-Range header against our ETag."""
+    if not header or not etag:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+class RangeFileResponse(Response):
+    """
+    Sends a byte range of an open file.
+
+    The range is read with ``os.pread`` in a worker thread, one chunk at a
+    time. Only if the ASGI server advertises the zero-copy send extension is
+    the file descriptor handed to it instead, for it to ``os.sendfile``;
+    uvicorn, which we deploy on, does not, so that branch is dormant there.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        start: int,
+        end: int,
+        size: int,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None,
+        media_type: Optional[str] = None
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.file = file
+        self.start = start
+        self.length = end - start + 1
+        self.headers["content-length"] = str(self.length)
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers
+            })
+
+            fd = self.file.fileno()
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": fd,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False
+                })
+                return
+
+            offset = self.start
+            remaining = self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0
+                })
+            if remaining > 0 or self.length == 0:
+                # Empty file, or it shrank underneath us; terminate the body
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.file.close()
+
+async def stored_file_response(
+    request: Request,
+    storage: AsyncStorageService,
+    key: str,
+    etag: Optional[str] = None,
+    media_type: str = "application/octet-stream",
+    cache_control: str = "private, max-age=86400"
+) -> Response:
+    """
+    Serve a stored file with Range, If-Range and If-None-Match support.
+
+    Local files (and S3 objects present in the disk cache) are sent from an
+    open file descriptor. Other S3 objects are proxied with a ranged GET, so
+    seeking only transfers the requested bytes, while the whole object is
+    downloaded into the disk cache in the background for later requests.
+    """
+    headers = {"accept-ranges": "bytes", "cache-control": cache_control}
+    if etag:
+        headers["etag"] = etag
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        file = await storage.open_local_file(key)
+    except (FileNotFoundError, OSError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio file not found")
+    if file is not None:
+        size = os.fstat(file.fileno()).st_size
+    else:
+        size = await storage.get_file_size(key)
+        if size is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio file not found")
+        storage.warm_cache(key)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and not etag_matches(if_range, etag):
+        # The client's copy is stale: send the whole (new) file
+        range_header = None
+
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        if file:
+            file.close()
+        headers["content-range"] = f"bytes */{size}"
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+    else:
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+
+    if file:
+        return RangeFileResponse(file, start, end, size, status_code, headers, media_type)
+
+    headers["content-length"] = str(end - start + 1)
+    if status_code == status.HTTP_206_PARTIAL_CONTENT:
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        storage.storage.iter_range(key, start, end, CHUNK_SIZE),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
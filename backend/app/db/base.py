@@ -10,5 +10,9 @@ class BaseModel(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
+    # Fetch server-generated timestamps with RETURNING on flush; async sessions
+    # cannot lazily load them afterwards
+    __mapper_args__ = {"eager_defaults": True}
+    
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
@@ -1,34 +1,346 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from sqlalchemy.sql.dml import UpdateBase
+import itertools
+import logging
+import os
+import re
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Dict, Generator, Iterator, List, Optional
 
 from app.core.config import settings
 
-# Create database engine
+slow_query_logger = logging.getLogger("app.db.slow_query")
+
+# Statements kept per track_queries() scope for budget errors; the count goes on
+MAX_TRACKED_STATEMENTS = 100
+
+# Row-locking reads (job claims, blob demotion) are slow from waiting on
+# locks, not from their plan, so they are not explained
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+def _to_async_url(database_url: str) -> str:
+    """The same database with the asyncpg driver (other backends are left as they are)."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+def _async_database_url() -> str:
+    """The async driver URL, derived from DATABASE_URL unless set explicitly."""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return _to_async_url(settings.DATABASE_URL)
+
+def _pool_options(database_url: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """Connection pool sizing; SQLite (used by the tests) picks its own pool."""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {"pool_size": pool_size, "max_overflow": max_overflow, "pool_recycle": 3600}
+
+# Create database engine (scripts, CLI tools and threadpool work)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=10,
-    pool_recycle=3600,
+    **_pool_options(settings.DATABASE_URL, 20, 10),
 )
 
+# Create async database engine (request handlers)
+async_engine = create_async_engine(
+    _async_database_url(),
+    pool_pre_ping=True,
+    **_pool_options(_async_database_url(), 20, 10),
+)
+
+# Read replicas (read-only request handlers); without any, reads use the primary
+replica_engines = [
+    create_async_engine(
+        _to_async_url(url),
+        pool_pre_ping=True,
+        **_pool_options(url, settings.DATABASE_REPLICA_POOL_SIZE, settings.DATABASE_REPLICA_MAX_OVERFLOW),
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+_replica_cycle = itertools.cycle(replica_engines)
+
+class QueryStats:
+    """Statements issued inside one track_queries() scope, e.g. one request."""
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds spent in the database
+        self.statements: List[str] = []  # the first MAX_TRACKED_STATEMENTS
+
+class QueryBudgetExceeded(Exception):
+    """More queries than allowed ran in a query_budget() scope, usually an N+1."""
+
+class DatabaseMetrics:
+    """Per-endpoint totals of requests, queries and database time since startup."""
+    
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+        self.explains = 0
+    
+    def record(self, endpoint: str, stats: QueryStats) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, {"requests": 0, "queries": 0, "db_seconds": 0.0, "max_queries": 0})
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["db_seconds"] += stats.duration
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **totals,
+                    "avg_queries": totals["queries"] / totals["requests"],
+                    "avg_db_ms": totals["db_seconds"] * 1000 / totals["requests"],
+                }
+                for endpoint, totals in self._totals.items()
+            }
+        return {"endpoints": endpoints, "slow_queries": self.slow_queries, "explains": self.explains}
+
+db_metrics = DatabaseMetrics()
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_explain_lock = threading.Lock()
+_last_explain = 0.0
+
+def _parameters_shape(parameters: Any, executemany: bool) -> str:
+    """Describe bound parameters by type only, so values never reach the logs."""
+    if executemany:
+        return f"{len(parameters)} rows of {_parameters_shape(parameters[0], False) if parameters else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+def _explain_allowed() -> bool:
+    """At most one EXPLAIN per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS per process."""
+    global _last_explain
+    if settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS <= 0:
+        return False
+    with _explain_lock:
+        now = time.monotonic()
+        if now - _last_explain < settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+            return False
+        _last_explain = now
+        return True
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[str]:
+    """
+    The estimated plan of a slow SELECT.
+    
+    Plain EXPLAIN only plans the statement, so the query is not run a second
+    time on the request's connection. Inside a transaction it runs in a
+    savepoint so a failure cannot abort the caller's transaction; without
+    one (or on an autocommit connection) there is nothing to protect and
+    SAVEPOINT would fail, so it runs directly.
+    """
+    try:
+        dbapi_connection = conn.connection.dbapi_connection
+        protect = conn.in_transaction() and not getattr(dbapi_connection, "autocommit", False)
+        cursor = conn.connection.cursor()
+        try:
+            if protect:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN {statement}", parameters)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                if protect:
+                    cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
+    except Exception:
+        slow_query_logger.warning("Could not EXPLAIN slow query", exc_info=True)
+        return None
+
+@event.listens_for(engine, "before_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        if len(stats.statements) < MAX_TRACKED_STATEMENTS:
+            stats.statements.append(statement)
+    
+    if elapsed < settings.SLOW_QUERY_SECONDS:
+        return
+    db_metrics.slow_queries += 1
+    
+    plan = None
+    if (
+        not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip()[:6].upper() == "SELECT"
+        and not _LOCKING_CLAUSE.search(statement)
+        and _explain_allowed()
+    ):
+        plan = _explain(conn, statement, parameters)
+        if plan:
+            db_metrics.explains += 1
+    
+    slow_query_logger.warning(
+        "Slow query (%.0f ms): %s\nParameters: %s%s",
+        elapsed * 1000,
+        statement,
+        _parameters_shape(parameters, executemany),
+        f"\nPlan:\n{plan}" if plan else ""
+    )
+
+for _replica in replica_engines:
+    event.listen(_replica.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_replica.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements run in this context, including tasks and threads it spawns."""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+@contextmanager
+def query_budget(limit: int) -> Iterator[QueryStats]:
+    """
+    Fail with QueryBudgetExceeded if the block runs more than limit statements.
+    
+    Meant for tests: wrapping a request in a small budget turns a relationship
+    lazily loaded per row into an error instead of a slow page.
+    """
+    with track_queries() as stats:
+        yield stats
+    check_query_budget(stats, limit)
+
+def check_query_budget(stats: QueryStats, limit: int) -> None:
+    """Raise QueryBudgetExceeded when stats show more than limit statements."""
+    if stats.count > limit:
+        listing = "\n".join(f"  {statement.splitlines()[0]}" for statement in stats.statements)
+        if stats.count > len(stats.statements):
+            listing += f"\n  ... and {stats.count - len(stats.statements)} more"
+        raise QueryBudgetExceeded(f"{stats.count} queries run, budget is {limit}:\n{listing}")
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay usable after commit: reloading expired attributes would need IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create scoped session factory for background tasks
 ScopedSession = scoped_session(SessionLocal)
 
+class RoutingSession(Session):
+    """
+    Sends reads to a replica, picked once per session, and writes to the primary.
+    
+    Flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE go to the primary,
+    and so does every statement after the first of those, so a session always
+    sees its own writes.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not replica_engines or self.info.get("use_primary"):
+            return async_engine.sync_engine
+        if (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.info["use_primary"] = True
+            return async_engine.sync_engine
+        if "replica" not in self.info:
+            self.info["replica"] = next(_replica_cycle).sync_engine
+        return self.info["replica"]
+
+ReadSessionLocal = async_sessionmaker(sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+
+class RecentWriters:
+    """
+    Users who committed a write in the last window seconds.
+    
+    Their reads stay on the primary until the replicas have had time to
+    replay the write. Tracked per process, so the window is best effort
+    behind a load balancer without session affinity.
+    """
+    
+    def __init__(self, window: float, max_entries: int = 10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+    
+    def mark(self, user_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window
+            if len(self._until) > self.max_entries:
+                self._until = {uid: until for uid, until in self._until.items() if until > now}
+    
+    def is_recent(self, user_id: int) -> bool:
+        with self._lock:
+            until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+# A session's writes are credited to session.info["user_id"], which
+# get_current_user sets for the request's session
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session):
+    if session.info.pop("wrote", False) and "user_id" in session.info:
+        recent_writers.mark(session.info["user_id"])
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
 # Dependency to get DB session
-def get_db() -> Generator[Session, None, None]:
-    """Dependency that provides a DB session."""
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that provides an async DB session."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def read_session(user_id: Optional[int] = None) -> AsyncSession:
+    """
+    A session for read-only work on behalf of user_id.
+    
+    Reads go to the replicas, except for users who wrote within the last
+    READ_YOUR_WRITES_SECONDS: they read from the primary so they never see
+    a replica that has not caught up with their own changes.
+    """
+    if not replica_engines or (user_id is not None and recent_writers.is_recent(user_id)):
+        return AsyncSessionLocal()
+    return ReadSessionLocal()
 
 @contextmanager
 def get_scoped_session() -> Generator[Session, None, None]:
@@ -44,15 +356,35 @@ def get_scoped_session() -> Generator[Session, None, None]:
         session.close()
         ScopedSession.remove()
 
+# Revision matching the schema create_all() used to build
+BASELINE_REVISION = "0001"
+
+def run_migrations() -> None:
+    """
+    Upgrade the database to the latest Alembic revision.
+    
+    Databases created before migrations existed are stamped at the baseline
+    first, so only the newer revisions run against them.
+    """
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+    
+    config = Config(os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
 def init_db() -> None:
-    ""
-    Initialize the database by creating all tables.
-    In a production environment, use migrations instead.
+    """
+    Initialize the database by applying migrations and seeding the admin user.
     """
     from app.models.user import User, Subscription, UserRole
-    from app.models.tts import TTSJob, ReferenceAudio, TTSJobStatus, TTSVoiceType
     
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
     
     # Create admin user if not exists
     db = SessionLocal()
@@ -1,15 +1,18 @@
 import os
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import logging
 from typing import Dict, Any
 
 from app.core.config import settings
-from app.db.session import init_db, SessionLocal, engine
+from app.core.last_login import last_login_buffer
+from app.core.principal_cache import principal_cache
+from app.core.security import get_current_admin_user, password_hasher
+from app.db.session import init_db, check_query_budget, db_metrics, track_queries, SessionLocal, engine, async_engine
+from app.models.user import User
 from app.api.endpoints import auth, users, tts
 
 # Configure logging
@@ -26,11 +29,14 @@ async def lifespan(app: FastAPI):
     # Startup: Initialize database
     logger.info("Initializing database...")
     init_db()
+    last_login_buffer.start()
     
     yield
     
     # Shutdown: Clean up resources
     logger.info("Shutting down...")
+    await last_login_buffer.stop()
+    await async_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -52,6 +58,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class DatabaseUsageMiddleware:
+    """
+    Counts each request's queries and database time.
+    
+    Plain ASGI rather than @app.middleware("http"): that wraps responses in
+    a buffering stream, which breaks streamed downloads and the zerocopysend
+    extension. The debug headers are added to the response start message, so
+    for streamed bodies they cover the queries run before the first byte.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.duration * 1000:.1f}".encode()),
+                ]
+            await send(message)
+        
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                # The router stores the matched endpoint in the shared scope
+                endpoint = scope.get("endpoint")
+                db_metrics.record(f"{scope['method']} {endpoint.__name__ if endpoint else 'unmatched'}", stats)
+        
+        # N+1 guard for tests and development
+        if settings.QUERY_BUDGET_PER_REQUEST > 0:
+            check_query_budget(stats, settings.QUERY_BUDGET_PER_REQUEST)
+
+app.add_middleware(DatabaseUsageMiddleware)
+
 # Add exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -118,8 +165,15 @@ async def health_check() -> Dict[str, Any]:
         "version": "1.0.0"
     }
 
-# Serve static files for local storage
-app.mount("/storage", StaticFiles(directory=settings.LOCAL_STORAGE_PATH), name="storage")
+@app.get("/api/metrics", tags=["System"])
+async def metrics(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Process-local performance counters (admin only)."""
+    return {
+        "database": db_metrics.snapshot(),
+        "password_hashing": password_hasher.stats(),
+        "principal_cache": {"hits": principal_cache.hits, "misses": principal_cache.misses},
+        "last_login": {"flushes": last_login_buffer.flushes, "rows_written": last_login_buffer.rows_written}
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, func, text
+
+from app.db.base import BaseModel
+
+class StorageBlob(BaseModel):
+    """A content-addressed stored object shared by every row that references it."""
+    __tablename__ = "storage_blobs"
+    __table_args__ = (
+        # Tiering finds the hot blobs read longest ago
+        Index("ix_storage_blobs_last_accessed_at", "last_accessed_at", postgresql_where=text("cold_key IS NULL")),
+    )
+
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    key = Column(String(500), unique=True, nullable=False)
+    size = Column(BigInteger, nullable=False)  # in bytes
+    ref_count = Column(Integer, default=1, nullable=False)
+    cold_key = Column(String(500), unique=True, nullable=True)  # Compressed copy when tiered cold
+    # Last write or read, refreshed at most every BLOB_ACCESS_TOUCH_SECONDS
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<StorageBlob {self.sha256[:12]} refs={self.ref_count}>"
+
+class MaintenanceCursor(BaseModel):
+    """Where an incremental maintenance task left off, so runs resume instead of rescanning."""
+    __tablename__ = "maintenance_cursors"
+
+    name = Column(String(100), unique=True, nullable=False)
+    position = Column(String(500), nullable=True)
+
+    def __repr__(self):
+        return f"<MaintenanceCursor {self.name}={self.position}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, Integer, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import Column, String, Enum, Integer, ForeignKey, Text, Boolean, JSON, Index, DateTime, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum as PyEnum
@@ -13,28 +13,55 @@ class TTSJobStatus(str, PyEnum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+# Characters of a job's text kept in text_preview for listings
+TEXT_PREVIEW_LENGTH = 140
+
 class TTSVoiceType(str, PyEnum):
     STANDARD = "standard"
     CLONED = "cloned"
 
 class TTSJob(BaseModel):
     __tablename__ = "tts_jobs"
+    __table_args__ = (
+        # A user's history, newest first, with or without a status filter
+        Index("ix_tts_jobs_user_id_created_at", "user_id", text("created_at DESC")),
+        Index("ix_tts_jobs_user_id_status_created_at", "user_id", "status", text("created_at DESC")),
+        # Workers claiming the oldest queued jobs; stays tiny as jobs complete
+        Index("ix_tts_jobs_queued", "created_at", postgresql_where=text("status = 'QUEUED'")),
+        # Blob release and orphan sweeps look jobs up by storage key
+        Index("ix_tts_jobs_audio_key", "audio_key"),
+        # Purging a reference audio unlinks the jobs made with it
+        Index("ix_tts_jobs_reference_audio_id", "reference_audio_id"),
+        # One partition per month (migration 0006, app.services.partitions). The
+        # table's primary key is (id, created_at), as partitioning requires;
+        # the mapper still identifies rows by id alone.
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status = Column(Enum(TTSJobStatus), default=TTSJobStatus.QUEUED, nullable=False)
     text = Column(Text, nullable=False)
+    text_preview = Column(String(TEXT_PREVIEW_LENGTH), nullable=True)  # listings read this instead of text
     voice_type = Column(Enum(TTSVoiceType), default=TTSVoiceType.STANDARD, nullable=False)
     voice_id = Column(String(100), nullable=True)  # For standard voices
     reference_audio_id = Column(Integer, ForeignKey("reference_audios.id"), nullable=True)  # For cloned voices
-    audio_url = Column(String(500), nullable=True)
+    audio_key = Column(String(500), nullable=True)  # Storage key of the generated audio
+    audio_sha256 = Column(String(64), nullable=True)  # Content hash, used as the ETag
     audio_duration = Column(Integer, nullable=True)  # in seconds
     error_message = Column(Text, nullable=True)
-    metadata = Column(JSON, default=dict, nullable=True)
+    # "metadata" is reserved on declarative classes, so the attribute is renamed
+    metadata_ = Column("metadata", JSON, default=dict, nullable=True)
+    # Set once text and metadata have moved to the archive (app.services.archive)
+    archived_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="tts_jobs")
     reference_audio = relationship("ReferenceAudio", back_populates="tts_jobs")
     
+    # Not persisted: minted from audio_key on read by the URL service
+    audio_url = None
+    peaks_url = None
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
@@ -45,26 +72,36 @@ class TTSJob(BaseModel):
             "voice_type": self.voice_type,
             "voice_id": self.voice_id,
             "audio_url": self.audio_url,
+            "peaks_url": self.peaks_url,
             "audio_duration": self.audio_duration,
             "error_message": self.error_message,
-            "metadata": self.metadata or {}
+            "metadata": self.metadata_ or {}
         }
 
 class ReferenceAudio(BaseModel):
     __tablename__ = "reference_audios"
+    __table_args__ = (
+        Index("ix_reference_audios_user_id_is_active", "user_id", "is_active"),
+        Index("ix_reference_audios_audio_key", "audio_key"),
+    )
     
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
-    audio_url = Column(String(500), nullable=False)
+    audio_key = Column(String(500), nullable=False)  # Storage key of the uploaded audio
+    audio_sha256 = Column(String(64), nullable=True)  # Content hash, used as the ETag
     audio_duration = Column(Integer, nullable=False)  # in seconds
     is_active = Column(Boolean, default=True, nullable=False)
-    metadata = Column(JSON, default=dict, nullable=True)
+    # "metadata" is reserved on declarative classes, so the attribute is renamed
+    metadata_ = Column("metadata", JSON, default=dict, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="reference_audios")
     tts_jobs = relationship("TTSJob", back_populates="reference_audio")
     
+    # Not persisted: minted from audio_key on read by the URL service
+    audio_url = None
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
@@ -74,5 +111,5 @@ class ReferenceAudio(BaseModel):
             "audio_duration": self.audio_duration,
             "is_active": self.is_active,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "metadata": self.metadata or {}
+            "metadata": self.metadata_ or {}
         }
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, ForeignKey, UniqueConstraint
+
+from app.db.base import BaseModel
+
+class UsageRollup(BaseModel):
+    """Completed jobs and characters for one user on one UTC day (by job creation date)."""
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_usage_rollups_user_id_day"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    jobs = Column(Integer, default=0, nullable=False)
+    characters = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<UsageRollup user={self.user_id} {self.day} chars={self.characters}>"
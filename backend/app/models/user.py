@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, String, Boolean, Integer, Date, DateTime, ForeignKey, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from typing import Optional
@@ -12,6 +12,10 @@ class UserRole(str, enum.Enum):
 
 class User(BaseModel):
     __tablename__ = "users"
+    __table_args__ = (
+        # Admin user list, paged newest first by (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
     
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
@@ -21,23 +25,31 @@ class User(BaseModel):
     last_login = Column(DateTime, nullable=True)
     
     # Relationships
-    subscription = relationship("Subscription", back_populates="user", uselist=False)
-    tts_jobs = relationship("TTSJob", back_populates="user")
-    reference_audios = relationship("ReferenceAudio", back_populates="user")
+    # Deleting a user leaves unloaded children to the database's ON DELETE
+    # CASCADE instead of loading them to null their foreign keys
+    subscription = relationship("Subscription", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    tts_jobs = relationship("TTSJob", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    reference_audios = relationship("ReferenceAudio", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<User {self.email}>"
 
 class Subscription(BaseModel):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Scheduled resets find due rows without scanning the table
+        Index("ix_subscriptions_daily_usage_date", "daily_usage_date"),
+        Index("ix_subscriptions_current_period_end", "current_period_end"),
+    )
     
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
     plan_id = Column(String(50), nullable=False)
     is_active = Column(Boolean, default=True)
     monthly_character_limit = Column(Integer, default=10000)  # in characters
     monthly_character_usage = Column(Integer, default=0)  # in characters
     daily_character_limit = Column(Integer, default=500)  # in characters
     daily_character_usage = Column(Integer, default=0)  # in characters
+    daily_usage_date = Column(Date, default=lambda: datetime.utcnow().date(), nullable=False)  # UTC day the daily usage belongs to
     max_voice_clones = Column(Integer, default=3)
     
     # Billing cycle
@@ -48,22 +60,22 @@ class Subscription(BaseModel):
     user = relationship("User", back_populates="subscription")
     
     def has_quota(self, text_length: int) -> bool:
-        now = datetime.utcnow()
-        
-        # Reset daily usage if it's a new day
-        if now.date() > (self.updated_at.date() if self.updated_at else now.date()):
-            self.daily_character_usage = 0
+        # Counters of a past day or billing period count as zero (see
+        # app.services.quota); they are never reset here
+        daily_usage = self.daily_character_usage
+        if self.daily_usage_date is not None and self.daily_usage_date < datetime.utcnow().date():
+            daily_usage = 0
+        monthly_usage = self.monthly_character_usage
+        if self.current_period_end is not None and self.current_period_end <= datetime.utcnow():
+            monthly_usage = 0
         
         # Check daily quota
-        if (self.daily_character_usage + text_length) > self.daily_character_limit:
+        if (daily_usage + text_length) > self.daily_character_limit:
             return False
             
         # Check monthly quota
-        if (self.monthly_character_usage + text_length) > self.monthly_character_limit:
+        if (monthly_usage + text_length) > self.monthly_character_limit:
             return False
             
         return True
-    
-    def record_usage(self, text_length: int) -> None:
-        self.daily_character_usage += text_length
-        self.monthly_character_usage += text_length
+
@@ -18,6 +18,13 @@ class PaginatedResponse(Generic[T], ResponseModel):
     limit: int = 10
     total_pages: int = 1
 
+class CursorPaginatedResponse(Generic[T], ResponseModel):
+    """Generic keyset-paginated response; pass next_cursor back to get the following page."""
+    data: List[T] = []
+    limit: int = 10
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None  # only when requested, and possibly a few seconds stale
+
 class Token(BaseModel):
     """JWT token response model."""
     access_token: str
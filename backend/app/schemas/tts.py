@@ -1,14 +1,20 @@
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_serializer, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
-from app.schemas.base import ResponseModel, PaginatedResponse
+from app.schemas.base import ResponseModel, CursorPaginatedResponse
 
 class TTSVoiceType(str, Enum):
     STANDARD = "standard"
     CLONED = "cloned"
 
+class TTSOutputFormat(str, Enum):
+    WAV = "wav"      # 16-bit PCM, the canonical stored format
+    ULAW = "ulaw"    # 8 kHz mu-law WAV for telephony
+    FLAC = "flac"
+    OPUS = "opus"    # Ogg/Opus
+
 class TTSJobStatus(str, Enum):
     QUEUED = "queued"
     PROCESSING = "processing"
@@ -27,6 +33,7 @@ class TTSGenerateRequest(BaseModel):
     pitch: float = Field(0.0, ge=-20.0, le=20.0, description="Pitch adjustment in semitones (-20 to +20)")
     emotion: Optional[str] = Field(None, description="Emotion for voice (e.g., happy, sad, neutral)")
     language: Optional[str] = Field("en-US", description="Language code (e.g., en-US, es-ES)")
+    output_format: TTSOutputFormat = Field(TTSOutputFormat.WAV, description="Default format the audio is served in")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata")
 
     @validator('text')
@@ -72,18 +79,42 @@ class TTSJobResponse(ResponseModel):
         voice_id: Optional[str] = None
         reference_audio_id: Optional[int] = None
         audio_url: Optional[str] = None
+        peaks_url: Optional[str] = None
         audio_duration: Optional[float] = None
         error_message: Optional[str] = None
-        metadata: Dict[str, Any] = {}
+        metadata: Dict[str, Any] = Field({}, validation_alias="metadata_")
         
         class Config:
             orm_mode = True
     
     data: Optional[JobData] = None
 
-class TTSJobsResponse(PaginatedResponse):
+class TTSJobSummary(BaseModel):
+    """A job in a listing; only the requested fields are present (fields= on /history)."""
+    id: Optional[int] = None
+    status: Optional[TTSJobStatus] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    text_preview: Optional[str] = None
+    text: Optional[str] = None
+    voice_type: Optional[TTSVoiceType] = None
+    voice_id: Optional[str] = None
+    reference_audio_id: Optional[int] = None
+    audio_url: Optional[str] = None
+    peaks_url: Optional[str] = None
+    audio_duration: Optional[float] = None
+    error_message: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    
+    @model_serializer(mode="wrap")
+    def _requested_fields_only(self, handler):
+        # Fields that were not requested are left out rather than sent as null
+        data = handler(self)
+        return {key: value for key, value in data.items() if key in self.model_fields_set}
+
+class TTSJobsResponse(CursorPaginatedResponse):
     """Response model for paginated list of TTS jobs."""
-    data: List[TTSJobResponse.JobData] = []
+    data: List[TTSJobSummary] = []
 
 class ReferenceAudioResponse(ResponseModel):
     """Response model for a reference audio."""
@@ -97,14 +128,14 @@ class ReferenceAudioResponse(ResponseModel):
         is_public: bool
         created_at: datetime
         updated_at: datetime
-        metadata: Dict[str, Any] = {}
+        metadata: Dict[str, Any] = Field({}, validation_alias="metadata_")
         
         class Config:
             orm_mode = True
     
     data: Optional[AudioData] = None
 
-class ReferenceAudiosResponse(PaginatedResponse):
+class ReferenceAudiosResponse(CursorPaginatedResponse):
     """Response model for paginated list of reference audios."""
     data: List[ReferenceAudioResponse.AudioData] = []
 
@@ -134,3 +165,7 @@ class TTSUsageResponse(ResponseModel):
         "characters_today": 0,
         "characters_this_month": 0
     }
+
+class StorageStatsResponse(ResponseModel):
+    """Response model for storage statistics (admin only)."""
+    data: Dict[str, Any] = {}
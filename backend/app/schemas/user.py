@@ -2,7 +2,7 @@ from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional
 from datetime import datetime
 
-from app.schemas.base import BaseUser, BaseSubscription, ResponseModel, Token, PaginatedResponse
+from app.schemas.base import BaseUser, BaseSubscription, ResponseModel, Token, CursorPaginatedResponse
 
 # Request models
 class UserCreate(BaseModel):
@@ -51,7 +51,7 @@ class UserResponse(ResponseModel):
     """Response model for a single user."""
     data: BaseUser
 
-class UsersResponse(PaginatedResponse[BaseUser]):
+class UsersResponse(CursorPaginatedResponse[BaseUser]):
     """Response model for paginated list of users."""
     pass
 
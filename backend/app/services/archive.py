@@ -0,0 +1,258 @@
+"""
+Cold archive of old TTS job payloads.
+
+Once a month of tts_jobs is older than TTS_JOB_ARCHIVE_AFTER_MONTHS, the
+text and metadata of its finished jobs move to one gzipped JSON-lines object
+per user and month under archive/tts_jobs/, and are blanked in the rows.
+The summary columns (status, voice, timestamps, duration, audio key) stay in
+the table and remain queryable; the few callers that need the full payload
+read it back with restore_archived_payload or read_archive.
+
+tts_jobs is partitioned by month (app.services.partitions), so an archived
+month is a partition that has stopped changing: it shrinks once, and vacuum
+has nothing left to do there afterwards.
+
+A pass archives at most batch_size users of one month and remembers where
+it stopped in ``maintenance_cursors``. It runs under the scheduler
+(app.services.scheduler), or by hand:
+
+Usage:
+    python -m app.services.archive [--passes 1] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.storage import MaintenanceCursor
+from app.models.tts import TTSJob, TTSJobStatus
+from app.services.partitions import add_months, month_start
+from app.services.storage import AsyncStorageService, StorageService, get_async_storage_service
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "archive/tts_jobs"
+CURSOR_NAME = "archive_tts_jobs"
+
+# Jobs that will not change any more; queued or running jobs are never archived
+FINISHED_STATUSES = (TTSJobStatus.COMPLETED, TTSJobStatus.FAILED, TTSJobStatus.CANCELLED)
+
+# Metadata the application still reads from archived rows
+RETAINED_METADATA_KEYS = ("output_format", "audio_expired_at")
+
+def archive_key(user_id: int, month: date) -> str:
+    return f"{ARCHIVE_PREFIX}/{month:%Y-%m}/{user_id}.jsonl.gz"
+
+def archive_month(created_at: datetime) -> date:
+    """The UTC month a job is archived under, matching the partition bounds."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return month_start(created_at.date())
+
+def _month_bounds(month: date) -> Tuple[datetime, datetime]:
+    end = add_months(month, 1)
+    return (
+        datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        datetime(end.year, end.month, 1, tzinfo=timezone.utc),
+    )
+
+def _encode(records: Iterable[Dict[str, Any]]) -> bytes:
+    lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    return gzip.compress(lines.encode())
+
+def _decode(data: bytes) -> Dict[int, Dict[str, Any]]:
+    records = (json.loads(line) for line in gzip.decompress(data).decode().splitlines() if line)
+    return {record["id"]: record for record in records}
+
+def read_archive(storage: StorageService, user_id: int, month: date) -> Dict[int, Dict[str, Any]]:
+    """A user's archived jobs of one month by job ID (sync, for threadpool callers)."""
+    key = archive_key(user_id, month)
+    if not storage.file_exists(key):
+        return {}
+    return _decode(storage.download_file(key))
+
+async def _read_archive_async(storage: AsyncStorageService, user_id: int, month: date) -> Dict[int, Dict[str, Any]]:
+    key = archive_key(user_id, month)
+    if not await storage.file_exists(key):
+        return {}
+    return await asyncio.to_thread(_decode, await storage.download_file(key))
+
+def _merged_metadata(record: Dict[str, Any], retained: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Keys written to the row after archival (e.g. audio expiry) win
+    return {**(record.get("metadata") or {}), **(retained or {})}
+
+async def restore_archived_payload(job: TTSJob, storage: Optional[AsyncStorageService] = None) -> None:
+    """
+    Put an archived job's text and metadata back on the loaded object.
+
+    The values are set as already committed, so nothing is written back.
+    """
+    if job.archived_at is None:
+        return
+    records = await _read_archive_async(storage or get_async_storage_service(), job.user_id, archive_month(job.created_at))
+    record = records.get(job.id)
+    if record is None:
+        logger.warning("Archived payload of job %s is missing", job.id)
+        return
+    set_committed_value(job, "text", record["text"])
+    set_committed_value(job, "metadata_", _merged_metadata(record, job.metadata_))
+
+class JobArchiver:
+    """Moves the payload of old finished jobs to the archive, one batch of users at a time."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        storage: Optional[AsyncStorageService] = None,
+        batch_size: int = 500
+    ):
+        self.db = db
+        self.storage = storage or get_async_storage_service()
+        self.batch_size = batch_size
+
+    async def run_once(self) -> int:
+        """
+        Archive up to batch_size users' jobs of the oldest month not yet done.
+
+        Months with nothing left to archive are stepped over in the same pass.
+
+        Returns:
+            The number of jobs archived
+        """
+        if settings.TTS_JOB_ARCHIVE_AFTER_MONTHS <= 0:
+            return 0
+        cutoff = add_months(month_start(datetime.utcnow().date()), -settings.TTS_JOB_ARCHIVE_AFTER_MONTHS)
+
+        cursor = await self._get_cursor()
+        position = await self._position(cursor)
+        if position is None:
+            return 0
+        month, after_user_id = position
+
+        archived = 0
+        while month < cutoff:
+            start, end = _month_bounds(month)
+            user_ids = list(await self.db.scalars(
+                select(TTSJob.user_id)
+                .where(
+                    TTSJob.created_at >= start,
+                    TTSJob.created_at < end,
+                    TTSJob.user_id > after_user_id,
+                    TTSJob.archived_at.is_(None),
+                    TTSJob.status.in_(FINISHED_STATUSES)
+                )
+                .distinct()
+                .order_by(TTSJob.user_id)
+                .limit(self.batch_size)
+            ))
+
+            for user_id in user_ids:
+                archived += await self._archive_user_month(user_id, month)
+                cursor.position = f"{month:%Y-%m}:{user_id}"
+                await self.db.commit()
+            if len(user_ids) == self.batch_size:
+                break  # More users left in this month
+
+            if user_ids or after_user_id:
+                logger.info("Archived job payloads of %s", f"{month:%Y-%m}")
+            month, after_user_id = add_months(month, 1), 0
+            cursor.position = f"{month:%Y-%m}:0"
+            await self.db.commit()
+            if user_ids:
+                break  # One batch per pass; months without work are skipped through
+        return archived
+
+    async def _get_cursor(self) -> MaintenanceCursor:
+        cursor = await self.db.scalar(select(MaintenanceCursor).where(MaintenanceCursor.name == CURSOR_NAME))
+        if cursor is None:
+            cursor = MaintenanceCursor(name=CURSOR_NAME)
+            self.db.add(cursor)
+        return cursor
+
+    async def _position(self, cursor: MaintenanceCursor) -> Optional[Tuple[date, int]]:
+        """The month being archived and the last user finished in it."""
+        if cursor.position:
+            month, user_id = cursor.position.split(":")
+            return date.fromisoformat(f"{month}-01"), int(user_id)
+        # First run: start at the oldest job (a one-off scan)
+        oldest = await self.db.scalar(select(func.min(TTSJob.created_at)))
+        if oldest is None:
+            return None
+        return archive_month(oldest), 0
+
+    async def _archive_user_month(self, user_id: int, month: date) -> int:
+        start, end = _month_bounds(month)
+        rows = (await self.db.execute(
+            select(TTSJob.id, TTSJob.created_at, TTSJob.text, TTSJob.metadata_)
+            .where(
+                TTSJob.user_id == user_id,
+                TTSJob.created_at >= start,
+                TTSJob.created_at < end,
+                TTSJob.archived_at.is_(None),
+                TTSJob.status.in_(FINISHED_STATUSES)
+            )
+            .order_by(TTSJob.id)
+        )).all()
+        if not rows:
+            return 0
+
+        # Keep whatever an interrupted earlier pass already archived
+        records = await _read_archive_async(self.storage, user_id, month)
+        for row in rows:
+            records[row.id] = {
+                "id": row.id,
+                "created_at": row.created_at.isoformat(),
+                "text": row.text,
+                "metadata": row.metadata_,
+            }
+        data = await asyncio.to_thread(_encode, records.values())
+        await self.storage.upload_file(archive_key(user_id, month), data, settings.S3_COLD_STORAGE_CLASS)
+
+        # Blank the payload only once the archive object is written; the
+        # created_at match lets Postgres touch just this month's partition
+        jobs = TTSJob.__table__
+        await self.db.execute(
+            jobs.update()
+            .where(jobs.c.id == bindparam("job_id"), jobs.c.created_at == bindparam("job_created_at"))
+            .values(text="", metadata=bindparam("retained"), archived_at=func.now()),
+            [
+                {
+                    "job_id": row.id,
+                    "job_created_at": row.created_at,
+                    "retained": {
+                        key: value for key, value in (row.metadata_ or {}).items()
+                        if key in RETAINED_METADATA_KEYS
+                    } or None,
+                }
+                for row in rows
+            ]
+        )
+        return len(rows)
+
+async def run(passes: int = 1, batch_size: int = 500) -> None:
+    async with AsyncSessionLocal() as db:
+        archiver = JobArchiver(db, batch_size=batch_size)
+        for _ in range(passes):
+            archived = await archiver.run_once()
+            logger.info("Archived %d jobs", archived)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old TTS job text and metadata to the cold archive")
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=settings.LIFECYCLE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.passes, args.batch_size))
+
+if __name__ == "__main__":
+    main()
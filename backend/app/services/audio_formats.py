@@ -0,0 +1,321 @@
+import asyncio
+import io
+import itertools
+import logging
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.tts import TTSOutputFormat
+from app.services.storage import AsyncStorageService, shard_key
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+ULAW_SAMPLE_RATE = 8000
+ULAW_CUTOFF_HZ = 3600  # below the 4 kHz Nyquist limit of the telephony rate
+
+# Format -> (file extension, media type)
+FORMAT_INFO: Dict[TTSOutputFormat, tuple] = {
+    TTSOutputFormat.WAV: (".wav", "audio/wav"),
+    TTSOutputFormat.ULAW: (".wav", "audio/wav"),
+    TTSOutputFormat.FLAC: (".flac", "audio/flac"),
+    TTSOutputFormat.OPUS: (".ogg", "audio/ogg"),
+}
+
+# Arguments for formats encoded by ffmpeg
+FFMPEG_ARGS: Dict[TTSOutputFormat, List[str]] = {
+    TTSOutputFormat.FLAC: ["-c:a", "flac", "-f", "flac"],
+    TTSOutputFormat.OPUS: ["-c:a", "libopus", "-b:a", "32k", "-f", "ogg"],
+}
+
+_encoder_pool: Optional[ThreadPoolExecutor] = None
+_DONE = object()
+
+def _get_encoder_pool() -> ThreadPoolExecutor:
+    global _encoder_pool
+    if _encoder_pool is None:
+        _encoder_pool = ThreadPoolExecutor(
+            max_workers=settings.ENCODER_WORKERS,
+            thread_name_prefix="audio-encoder"
+        )
+    return _encoder_pool
+
+def is_format_available(output_format: TTSOutputFormat) -> bool:
+    """Check whether audio can be produced in a format on this host."""
+    if output_format in FFMPEG_ARGS:
+        return shutil.which(settings.FFMPEG_PATH) is not None
+    return True
+
+def derivative_key(audio_sha256: str, output_format: TTSOutputFormat) -> str:
+    """Storage key of an encoded copy, shared by all jobs with the same audio."""
+    ext = FORMAT_INFO[output_format][0]
+    return shard_key("derivatives", f"{audio_sha256}.{output_format.value}{ext}")
+
+def encode_pcm_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono 16-bit samples as a PCM WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def _lin2ulaw(samples: np.ndarray) -> bytes:
+    """G.711 mu-law encode 16-bit linear samples (vectorized, matches audioop)."""
+    x = np.clip(np.rint(samples), -32768, 32767).astype(np.int32) >> 2  # 14-bit
+    sign = np.where(x < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(x), 8158) + 33  # top of segment 7
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    mantissa = (magnitude >> (exponent + 1)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+def _ulaw_wav_header(frames: int) -> bytes:
+    """WAV header for 8 kHz mono mu-law (format tag 7) with a known length."""
+    fmt = struct.pack("<HHIIHHH", 7, 1, ULAW_SAMPLE_RATE, ULAW_SAMPLE_RATE, 1, 8, 0)
+    fact = struct.pack("<I", frames)
+    riff_size = 4 + (8 + len(fmt)) + (8 + len(fact)) + (8 + frames) + (frames & 1)
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"fact" + struct.pack("<I", len(fact)) + fact
+        + b"data" + struct.pack("<I", frames)
+    )
+
+def _lowpass_taps(rate: int) -> np.ndarray:
+    """
+    Kaiser-windowed sinc low-pass at ULAW_CUTOFF_HZ for input at rate.
+
+    The filter length grows with the rate so the transition band stays
+    about 800 Hz wide, with roughly 70 dB of stopband attenuation.
+    """
+    count = int(rate / ULAW_SAMPLE_RATE * 42) | 1
+    cutoff = ULAW_CUTOFF_HZ / rate
+    n = np.arange(count) - (count - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(count, 6.8)
+    return (taps / taps.sum()).astype(np.float32)
+
+def _mono_blocks(wav: wave.Wave_read, chunk_frames: int) -> Iterator[np.ndarray]:
+    """Read a 16-bit WAV as mono float blocks."""
+    channels = wav.getnchannels()
+    while True:
+        frames = wav.readframes(chunk_frames)
+        if not frames:
+            return
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        yield samples
+
+def _lowpass_blocks(blocks: Iterator[np.ndarray], taps: np.ndarray) -> Iterator[np.ndarray]:
+    """
+    Filter a stream of blocks, carrying the filter state across them.
+
+    The output is aligned with the input (the filter's delay is trimmed from
+    the start and flushed at the end), so it has exactly as many samples.
+    """
+    delay = (len(taps) - 1) // 2
+    history = np.zeros(len(taps) - 1, dtype=np.float32)
+    skip = delay
+    for block in itertools.chain(blocks, [np.zeros(delay, dtype=np.float32)]):
+        extended = np.concatenate([history, block])
+        filtered = np.convolve(extended, taps, mode="valid")
+        history = extended[len(extended) - len(history):]
+        if skip:
+            trimmed = min(skip, len(filtered))
+            filtered = filtered[trimmed:]
+            skip -= trimmed
+        if len(filtered):
+            yield filtered
+
+def _encode_ulaw(source: BinaryIO, chunk_frames: int = 16384) -> Iterator[bytes]:
+    """Stream 8 kHz mu-law WAV from a 16-bit PCM WAV, one block at a time."""
+    with wave.open(source, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM input is supported")
+        rate = wav.getframerate()
+        total_frames = wav.getnframes()
+
+        out_frames = total_frames * ULAW_SAMPLE_RATE // rate
+        yield _ulaw_wav_header(out_frames)
+
+        blocks = _mono_blocks(wav, chunk_frames)
+        if rate > ULAW_SAMPLE_RATE:
+            # Remove everything above the new Nyquist limit before decimating,
+            # or it folds back into the audible band
+            blocks = _lowpass_blocks(blocks, _lowpass_taps(rate))
+
+        # Linear-interpolation resampler that carries its input window across blocks
+        step = rate / ULAW_SAMPLE_RATE
+        window = np.zeros(0, dtype=np.float32)
+        window_start = 0
+        produced = 0
+
+        for samples in itertools.chain(blocks, [None]):
+            if samples is not None:
+                window = np.concatenate([window, samples])
+            available = window_start + len(window)
+
+            if samples is None or available >= total_frames:
+                target = out_frames
+            else:
+                # Both interpolation neighbours must already be buffered
+                target = min(out_frames, int((available - 1) / step))
+
+            if target > produced and len(window):
+                positions = np.arange(produced, target) * step - window_start
+                left = np.floor(positions).astype(np.int64)
+                right = np.minimum(left + 1, len(window) - 1)
+                frac = positions - left
+                yield _lin2ulaw(window[left] * (1 - frac) + window[right] * frac)
+                produced = target
+
+                consumed = int(produced * step) - window_start
+                window = window[consumed:]
+                window_start += consumed
+
+            if produced >= out_frames:
+                break
+
+        if out_frames & 1:
+            yield b"\x00"  # RIFF chunks are word aligned
+
+def _encode_ffmpeg(source: BinaryIO, args: List[str]) -> Iterator[bytes]:
+    """Stream a file through ffmpeg, yielding output as soon as it is produced."""
+    process = subprocess.Popen(
+        [settings.FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", *args, "pipe:1"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE
+    )
+
+    def feed():
+        try:
+            shutil.copyfileobj(source, process.stdin, CHUNK_SIZE)
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        while True:
+            chunk = process.stdout.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        feeder.join()
+
+def encode(source: BinaryIO, output_format: TTSOutputFormat) -> Iterator[bytes]:
+    """
+    Encode canonical PCM WAV into another format as a stream of chunks.
+
+    Args:
+        source: Readable canonical WAV file
+        output_format: The format to produce
+
+    Returns:
+        An iterator over the encoded bytes
+    """
+    if output_format == TTSOutputFormat.ULAW:
+        return _encode_ulaw(source)
+    if output_format in FFMPEG_ARGS:
+        return _encode_ffmpeg(source, FFMPEG_ARGS[output_format])
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+class _ClientTooSlow(Exception):
+    """The client did not take encoded data for ENCODER_SEND_TIMEOUT_SECONDS."""
+
+async def stream_derivative(
+    storage: AsyncStorageService,
+    source_key: str,
+    cache_key: str,
+    output_format: TTSOutputFormat
+) -> AsyncIterator[bytes]:
+    """
+    Encode a stored file on the encoder pool, streaming chunks as they come.
+
+    The encoded bytes are also spooled to a temp file and, once encoding
+    finishes, stored under cache_key so later requests are served directly.
+    If the client goes away mid-stream, encoding stops and nothing is cached.
+    A client that stops reading for ENCODER_SEND_TIMEOUT_SECONDS has its
+    stream aborted, so it cannot hold an encoder thread indefinitely.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+    stopped = threading.Event()
+
+    def put(item) -> None:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        try:
+            future.result(settings.ENCODER_SEND_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise _ClientTooSlow()
+
+    def hand_off(item) -> None:
+        # Delivered once the client catches up, without holding this thread
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+
+    def produce() -> None:
+        with tempfile.TemporaryFile() as spool:
+            try:
+                with storage.storage.open_file(source_key) as source:
+                    for chunk in encode(source, output_format):
+                        if stopped.is_set():
+                            return
+                        spool.write(chunk)
+                        put(chunk)
+            except _ClientTooSlow:
+                logger.warning("Aborted encoding %s for a client that stopped reading", cache_key)
+                hand_off(RuntimeError("Client stopped reading the encoded stream"))
+                return
+            except Exception as e:
+                if not stopped.is_set():
+                    hand_off(e)
+                return
+            try:
+                put(_DONE)
+            except _ClientTooSlow:
+                hand_off(_DONE)
+
+            try:
+                spool.seek(0)
+                staged = storage.storage.stage_file(spool)
+                storage.storage.commit_staged(staged, cache_key)
+            except Exception:
+                logger.exception("Failed to cache encoded audio %s", cache_key)
+
+    loop.run_in_executor(_get_encoder_pool(), produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        # Unblock a producer waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
@@ -0,0 +1,265 @@
+import asyncio
+import gzip
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple, Union, BinaryIO
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.storage import StorageBlob
+from app.services.storage import AsyncStorageService, get_async_storage_service, shard_key
+from app.services.urls import get_url_service
+
+class BlobStore:
+    """
+    Content-addressed, reference-counted storage for audio files.
+
+    Identical bytes are stored once under a key derived from their SHA-256;
+    each row that points at a blob holds a reference, and the object is only
+    deleted when the last reference is released. Methods do not commit: the
+    caller commits together with the rows that hold the references, which also
+    releases the blob row lock taken here.
+
+    Blobs can be tiered cold: the object is replaced by a gzip-compressed copy
+    under ``cold/`` (stored with a cheaper S3 storage class) and is
+    rehydrated the next time it is read or stored again. Which blobs go cold
+    is decided by last_accessed_at, kept roughly current by put() and
+    ensure_hot().
+    """
+
+    def __init__(self, db: AsyncSession, storage: Optional[AsyncStorageService] = None):
+        self.db = db
+        self.storage = storage or get_async_storage_service()
+
+    async def put(self, file_data: Union[bytes, BinaryIO], ext: str, prefix: str = "blobs") -> Tuple[str, str]:
+        """
+        Store data, reusing an existing blob with the same content.
+
+        Args:
+            file_data: The file data as bytes or a file-like object
+            ext: File extension including the dot (e.g. ".wav")
+            prefix: Storage prefix for newly created blobs
+
+        Returns:
+            The blob's storage key and its SHA-256 hex digest
+        """
+        staged = await self.storage.stage_file(file_data)
+        try:
+            # Insert or take a reference atomically. On conflict this waits for
+            # any concurrent writer of the same content, so the object is in
+            # place by the time we see ref_count > 1.
+            stmt = (
+                insert(StorageBlob)
+                .values(
+                    sha256=staged.sha256,
+                    key=shard_key(prefix, f"{staged.sha256}{ext}"),
+                    size=staged.size,
+                    ref_count=1
+                )
+                .on_conflict_do_update(
+                    index_elements=[StorageBlob.sha256],
+                    set_={"ref_count": StorageBlob.ref_count + 1, "updated_at": func.now(), "last_accessed_at": func.now()}
+                )
+                .returning(StorageBlob.key, StorageBlob.ref_count, StorageBlob.cold_key)
+            )
+            key, ref_count, cold_key = (await self.db.execute(stmt)).one()
+        except BaseException:
+            await self.storage.discard_staged(staged)
+            raise
+
+        if ref_count == 1 or cold_key:
+            # New content, or a cold blob we can rehydrate from the bytes at hand
+            await self.storage.commit_staged(staged, key)
+        else:
+            await self.storage.discard_staged(staged)
+
+        if cold_key:
+            await self.db.execute(
+                update(StorageBlob).where(StorageBlob.sha256 == staged.sha256).values(cold_key=None)
+            )
+            await self.storage.delete_file(cold_key)
+
+        return key, staged.sha256
+
+    async def release(self, key: Optional[str]) -> bool:
+        """
+        Drop one reference to a stored object, deleting it with the last one.
+
+        Keys that are not blobs (files stored before deduplication) are
+        deleted directly.
+
+        Args:
+            key: The storage key whose reference is released
+
+        Returns:
+            True if the underlying object was deleted
+        """
+        if not key:
+            return False
+
+        row = (await self.db.execute(
+            update(StorageBlob)
+            .where(StorageBlob.key == key)
+            .values(ref_count=StorageBlob.ref_count - 1)
+            .returning(StorageBlob.ref_count, StorageBlob.cold_key)
+        )).first()
+
+        if row is not None and row.ref_count > 0:
+            return False
+
+        if row is not None:
+            await self.db.execute(delete(StorageBlob).where(StorageBlob.key == key))
+
+        # Deleted while the row lock is held, so a concurrent put of the same
+        # content re-creates the object after we commit instead of reusing it
+        deleted = await self.storage.delete_file(key)
+        if row is not None and row.cold_key:
+            deleted = await self.storage.delete_file(row.cold_key) or deleted
+        return deleted
+
+    async def ensure_hot(self, key: Optional[str]) -> bool:
+        """
+        Make sure a blob's object is readable under its key, rehydrating it
+        from the cold tier if needed, and record the read.
+
+        The access time is only written when it is older than
+        BLOB_ACCESS_TOUCH_SECONDS, so a popular blob costs one UPDATE per
+        interval rather than one per read.
+
+        Args:
+            key: The storage key about to be read
+
+        Returns:
+            True if the blob row changed (the caller must commit)
+        """
+        if not key:
+            return False
+
+        # Fast path without locking: almost every blob is hot
+        row = (await self.db.execute(
+            select(StorageBlob.id, StorageBlob.cold_key, StorageBlob.last_accessed_at).where(StorageBlob.key == key)
+        )).first()
+        if row is None:
+            return False
+        if not row.cold_key:
+            return await self._touch(row.id, row.last_accessed_at)
+
+        # Concurrent readers wait here and find the blob hot once we commit
+        blob = await self.db.scalar(
+            select(StorageBlob).where(StorageBlob.key == key).with_for_update()
+        )
+        if not blob or not blob.cold_key:
+            return False
+
+        with tempfile.TemporaryFile() as spool:
+            source = await self.storage.open_file(blob.cold_key)
+            try:
+                await asyncio.to_thread(_gunzip, source, spool)
+            finally:
+                source.close()
+            spool.seek(0)
+            await self.storage.upload_file(key, spool)
+
+        cold_key = blob.cold_key
+        blob.cold_key = None
+        blob.last_accessed_at = func.now()
+        await self.db.flush()
+        await self.storage.delete_file(cold_key)
+        return True
+
+    async def _touch(self, blob_id: int, last_accessed_at: Optional[datetime]) -> bool:
+        """Refresh a blob's access time if it is stale; True if it was written."""
+        stale = datetime.now(timezone.utc) - timedelta(seconds=settings.BLOB_ACCESS_TOUCH_SECONDS)
+        if last_accessed_at is not None:
+            if last_accessed_at.tzinfo is None:
+                last_accessed_at = last_accessed_at.replace(tzinfo=timezone.utc)  # SQLite drops the offset
+            if last_accessed_at >= stale:
+                return False
+        result = await self.db.execute(
+            update(StorageBlob)
+            .where(
+                StorageBlob.id == blob_id,
+                or_(StorageBlob.last_accessed_at.is_(None), StorageBlob.last_accessed_at < stale)
+            )
+            .values(last_accessed_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    async def demote(self, blob: StorageBlob, storage_class: Optional[str] = None) -> int:
+        """
+        Move a blob to the cold tier as a compressed copy.
+
+        Unlike the other methods this commits: the row must point at the copy
+        before the original is deleted, and the original is only deleted if no
+        reader or writer rehydrated the blob in the meantime.
+
+        Args:
+            blob: The blob row to demote
+            storage_class: S3 storage class for the compressed copy
+
+        Returns:
+            The size of the compressed copy in bytes
+        """
+        cold_key = f"cold/{blob.key.split('/', 1)[-1]}.gz"
+
+        with tempfile.TemporaryFile() as spool:
+            source = await self.storage.open_file(blob.key)
+            try:
+                await asyncio.to_thread(_gzip, source, spool)
+            finally:
+                source.close()
+            size = spool.tell()
+            spool.seek(0)
+            await self.storage.upload_file(cold_key, spool, storage_class)
+
+        key = blob.key
+        blob.cold_key = cold_key
+        await self.db.commit()
+
+        # put() and ensure_hot() clear cold_key under this lock when they
+        # rehydrate, in which case the hot object must stay
+        still_cold = await self.db.scalar(
+            select(StorageBlob.id)
+            .where(StorageBlob.key == key, StorageBlob.cold_key == cold_key)
+            .with_for_update()
+        )
+        if still_cold:
+            await self.storage.delete_file(key)
+            # Listings link cold blobs through the API; the signed URL
+            # cached for the deleted object must not be handed out again
+            get_url_service().invalidate(key)
+        await self.db.commit()
+        return size
+
+    async def stats(self) -> Dict[str, Any]:
+        """Get deduplication statistics across all blobs."""
+        blobs, references, physical_bytes, logical_bytes = (await self.db.execute(
+            select(
+                func.count(StorageBlob.id),
+                func.coalesce(func.sum(StorageBlob.ref_count), 0),
+                func.coalesce(func.sum(StorageBlob.size), 0),
+                func.coalesce(func.sum(StorageBlob.size * StorageBlob.ref_count), 0)
+            )
+        )).one()
+
+        return {
+            "blobs": blobs,
+            "references": int(references),
+            "physical_bytes": int(physical_bytes),
+            "logical_bytes": int(logical_bytes),
+            "dedup_ratio": float(logical_bytes) / float(physical_bytes) if physical_bytes else 1.0
+        }
+
+
+def _gzip(source: BinaryIO, target: BinaryIO) -> None:
+    with gzip.GzipFile(fileobj=target, mode="wb", mtime=0) as compressed:
+        shutil.copyfileobj(source, compressed, 1024 * 1024)
+
+def _gunzip(source: BinaryIO, target: BinaryIO) -> None:
+    with gzip.GzipFile(fileobj=source, mode="rb") as compressed:
+        shutil.copyfileobj(compressed, target, 1024 * 1024)
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+class _PendingFetch:
+    """A download in progress that concurrent readers of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class DiskCache:
+    """
+    Size-bounded, read-through local disk cache for remote storage objects.
+
+    Entries are evicted in least-recently-used order once the cache grows past
+    max_bytes. Downloads are written to a temporary file and renamed into place,
+    so a reader never sees a partial file, and concurrent misses on the same key
+    are coalesced into a single download.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # cache path -> size
+        self._total_bytes = 0
+        self._pending: Dict[str, _PendingFetch] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + os.path.splitext(key)[1])
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU index from files left by a previous run."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith(".tmp"):
+                    # Interrupted download
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_atime, path, stat.st_size))
+
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits. Lock must be held."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            path, size = next(iter(self._entries.items()))
+            if path == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(path)
+                continue
+            del self._entries[path]
+            self._total_bytes -= size
+            try:
+                # Readers that already opened the file keep their handle
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """Open a cached object for reading, or return None if it is not cached."""
+        path = self._path(key)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            self.bytes_saved += self._entries[path]
+            return open(path, "rb")
+
+    def fill(self, key: str, fetch: Callable[[BinaryIO], None]) -> None:
+        """Download an object into the cache unless it is cached or already being fetched."""
+        path = self._path(key)
+        with self._lock:
+            if path in self._entries or path in self._pending:
+                return
+        self.open(key, fetch).close()
+
+    def open(self, key: str, fetch: Callable[[BinaryIO], None]) -> BinaryIO:
+        """
+        Open a cached object for reading, downloading it on a miss.
+
+        Args:
+            key: The storage key of the object
+            fetch: Callable that writes the object's bytes into the given file
+
+        Returns:
+            A binary file object positioned at the start of the cached copy
+        """
+        path = self._path(key)
+
+        while True:
+            with self._lock:
+                if path in self._entries:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    self.bytes_saved += self._entries[path]
+                    return open(path, "rb")
+
+                pending = self._pending.get(path)
+                if pending is None:
+                    pending = _PendingFetch()
+                    self._pending[path] = pending
+                    self.misses += 1
+                    break
+
+            # Another thread is downloading this key: wait for it and retry
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+
+        try:
+            size = self._download(path, fetch)
+            with self._lock:
+                self._entries[path] = size
+                self._total_bytes += size
+                self._evict(keep=path)
+                return open(path, "rb")
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[path]
+            pending.done.set()
+
+    def _download(self, path: str, fetch: Callable[[BinaryIO], None]) -> int:
+        """Download into a temp file and atomically rename it into place."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fetch(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.getsize(path)
+
+    def invalidate(self, key: str) -> None:
+        """Drop a cached object, e.g. after it was overwritten or deleted."""
+        path = self._path(key)
+        with self._lock:
+            size = self._entries.pop(path, None)
+            if size is None:
+                return
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache effectiveness counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries)
+            }
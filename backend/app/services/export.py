@@ -0,0 +1,209 @@
+import gzip
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.session import SessionLocal
+from app.models.storage import StorageBlob
+from app.models.tts import TTSJob, TTSJobStatus
+from app.services.archive import archive_month, read_archive
+from app.services.storage import StorageService, get_storage_service
+
+CHUNK_SIZE = 64 * 1024
+
+class _ZipSink(io.RawIOBase):
+    """
+    Write-only stream that zipfile writes into and we drain after every write.
+
+    It can tell() but not seek(), so zipfile writes data descriptors after
+    each entry instead of seeking back to patch local headers. Every entry
+    is therefore deflated: stored entries with data descriptors are valid
+    but rejected by several unzip implementations (e.g. Java's
+    ZipInputStream), as a reader cannot find where their data ends.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class HistoryExporter:
+    """
+    Streams a ZIP of a user's generated audio plus a JSON manifest.
+
+    Jobs are read in keyset-ordered batches and audio is copied from storage
+    in small chunks, so memory stays flat no matter how many files are
+    exported. Only zipfile's central directory (one small record per entry)
+    grows with the archive.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        status: Optional[TTSJobStatus] = TTSJobStatus.COMPLETED,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        storage: Optional[StorageService] = None,
+        batch_size: int = 200,
+        session_factory: sessionmaker = SessionLocal
+    ):
+        self.user_id = user_id
+        self.status = status
+        self.created_from = created_from
+        self.created_to = created_to
+        self.storage = storage or get_storage_service()
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        # Jobs created while the export runs are left out of both passes
+        self.started_at = datetime.utcnow()
+        # Archived texts of the month being written; jobs come oldest first
+        self._archive: Optional[Tuple[Any, Dict[int, Dict[str, Any]]]] = None
+
+    def _iter_jobs(self, db: Session, manifest: bool) -> Iterator[Any]:
+        """
+        Yield matching jobs oldest first, one batch per query.
+
+        Only the manifest pass reads the job details and text; the audio
+        pass selects just what it needs to find and name the files.
+        """
+        created_to = min(self.created_to, self.started_at) if self.created_to else self.started_at
+        columns = [TTSJob.id, TTSJob.created_at, TTSJob.audio_key]
+        if manifest:
+            columns += [
+                TTSJob.status,
+                TTSJob.text,
+                TTSJob.voice_type,
+                TTSJob.voice_id,
+                TTSJob.audio_sha256,
+                TTSJob.audio_duration,
+                TTSJob.archived_at
+            ]
+        query = db.query(*columns).filter(TTSJob.user_id == self.user_id, TTSJob.created_at <= created_to)
+        if not manifest:
+            query = (
+                query.add_columns(StorageBlob.cold_key)
+                .outerjoin(StorageBlob, StorageBlob.key == TTSJob.audio_key)
+                .filter(TTSJob.audio_key.isnot(None))
+            )
+        if self.status is not None:
+            query = query.filter(TTSJob.status == self.status)
+        if self.created_from is not None:
+            query = query.filter(TTSJob.created_at >= self.created_from)
+
+        last = None
+        while True:
+            batch_query = query
+            if last is not None:
+                batch_query = batch_query.filter(tuple_(TTSJob.created_at, TTSJob.id) > last)
+            rows = batch_query.order_by(TTSJob.created_at, TTSJob.id).limit(self.batch_size).all()
+            if not rows:
+                return
+            yield from rows
+            last = (rows[-1].created_at, rows[-1].id)
+
+    @staticmethod
+    def _filename(job: Any) -> Optional[str]:
+        if not job.audio_key:
+            return None
+        ext = os.path.splitext(job.audio_key)[1] or ".wav"
+        return f"audio/{job.created_at:%Y%m%d-%H%M%S}-{job.id}{ext}"
+
+    def _text(self, job: Any) -> str:
+        if job.archived_at is None:
+            return job.text
+        month = archive_month(job.created_at)
+        if self._archive is None or self._archive[0] != month:
+            self._archive = (month, read_archive(self.storage, self.user_id, month))
+        record = self._archive[1].get(job.id)
+        return record["text"] if record else job.text
+
+    def _manifest_entry(self, job: Any) -> Dict[str, Any]:
+        return {
+            "id": job.id,
+            "created_at": job.created_at.isoformat(),
+            "status": job.status.value if hasattr(job.status, "value") else job.status,
+            "text": self._text(job),
+            "voice_type": job.voice_type.value if hasattr(job.voice_type, "value") else job.voice_type,
+            "voice_id": job.voice_id,
+            "audio_duration": job.audio_duration,
+            "sha256": job.audio_sha256,
+            "file": self._filename(job),
+        }
+
+    def stream(self) -> Iterator[bytes]:
+        """
+        Generate the ZIP archive as a stream of chunks.
+
+        The manifest comes first, written while walking the jobs once; the
+        audio files follow in a second walk over the same snapshot.
+        Runs synchronously (e.g. in a threadpool) with its own session.
+        """
+        db = self.session_factory()
+        try:
+            for chunk in self._generate(db):
+                if chunk:
+                    yield chunk
+        finally:
+            db.close()
+
+    def _generate(self, db: Session) -> Iterator[bytes]:
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            manifest = zipfile.ZipInfo("manifest.json", date_time=self.started_at.timetuple()[:6])
+            manifest.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(manifest, mode="w") as out:
+                header = {
+                    "exported_at": self.started_at.isoformat(),
+                    "filters": {
+                        "status": self.status.value if self.status else None,
+                        "created_from": self.created_from.isoformat() if self.created_from else None,
+                        "created_to": self.created_to.isoformat() if self.created_to else None,
+                    },
+                }
+                out.write(json.dumps(header)[:-1].encode() + b', "jobs": [')
+                for index, job in enumerate(self._iter_jobs(db, manifest=True)):
+                    out.write((",\n" if index else "\n").encode() + json.dumps(self._manifest_entry(job)).encode())
+                    yield sink.drain()
+                out.write(b"\n]}\n")
+            yield sink.drain()
+
+            for job in self._iter_jobs(db, manifest=False):
+                filename = self._filename(job)
+                if not filename:
+                    continue
+                try:
+                    raw = self.storage.open_file(job.cold_key or job.audio_key)
+                except Exception:
+                    continue  # Expired or deleted since the manifest was written
+                # Cold-tier audio is decompressed on the fly rather than rehydrated
+                source = gzip.GzipFile(fileobj=raw, mode="rb") if job.cold_key else raw
+                info = zipfile.ZipInfo(filename, date_time=job.created_at.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with raw, source, archive.open(info, mode="w") as out:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                        out.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+
+        yield sink.drain()
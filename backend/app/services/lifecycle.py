@@ -0,0 +1,283 @@
+"""
+Storage lifecycle: retention expiry, orphan sweeping and cold tiering.
+
+Every task works through at most one bounded batch per pass, so a pass is
+cheap and can run often; the orphan sweep remembers where it stopped in
+``maintenance_cursors`` and resumes from there on the next pass.
+
+A pass runs periodically under the scheduler (app.services.scheduler), or
+by hand:
+
+Usage:
+    python -m app.services.lifecycle [--passes 1] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.storage import MaintenanceCursor, StorageBlob
+from app.models.tts import TTSJob, ReferenceAudio
+from app.models.user import Subscription
+from app.schemas.tts import TTSOutputFormat
+from app.services.audio_formats import derivative_key
+from app.services.blobs import BlobStore
+from app.services.storage import AsyncStorageService, get_async_storage_service
+from app.services.waveform import peaks_key
+
+logger = logging.getLogger(__name__)
+
+# Prefixes swept for orphans, in the order they are visited. Nothing refers
+# to tmp/: files are staged there (StorageService.stage_file) and left behind
+# when a request dies before committing them.
+SWEEP_PREFIXES = ("blobs", "cold", "derivatives", "peaks", "audios", "reference_audios", "tmp")
+
+class LifecycleManager:
+    """Applies retention and tiering policies to stored audio, one batch at a time."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        storage: Optional[AsyncStorageService] = None,
+        batch_size: int = 500
+    ):
+        self.db = db
+        self.storage = storage or get_async_storage_service()
+        self.blobs = BlobStore(db, self.storage)
+        self.batch_size = batch_size
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Run one bounded pass of every lifecycle task.
+
+        Returns:
+            How many items each task handled
+        """
+        stats = {
+            "expired_jobs": await self.expire_jobs(),
+            "purged_reference_audios": await self.purge_reference_audios(),
+            "orphans_deleted": {prefix: await self.sweep_orphans(prefix) for prefix in SWEEP_PREFIXES},
+            "demoted_blobs": await self.demote_cold_blobs(),
+        }
+        logger.info("Lifecycle pass: %s", stats)
+        return stats
+
+    async def expire_jobs(self) -> int:
+        """Delete the audio of jobs older than their owner's plan retention."""
+        now = datetime.utcnow()
+        plans = list(settings.RETENTION_DAYS_BY_PLAN)
+
+        # One condition per plan; a retention of 0 keeps audio forever
+        expired = [
+            and_(Subscription.plan_id == plan, TTSJob.created_at < now - timedelta(days=days))
+            for plan, days in settings.RETENTION_DAYS_BY_PLAN.items()
+            if days > 0
+        ]
+        if settings.DEFAULT_RETENTION_DAYS > 0:
+            expired.append(and_(
+                or_(Subscription.plan_id.is_(None), Subscription.plan_id.notin_(plans)),
+                TTSJob.created_at < now - timedelta(days=settings.DEFAULT_RETENTION_DAYS)
+            ))
+        if not expired:
+            return 0
+
+        jobs = (await self.db.scalars(
+            select(TTSJob)
+            .options(raiseload("*"))
+            .outerjoin(Subscription, Subscription.user_id == TTSJob.user_id)
+            .where(TTSJob.audio_key.isnot(None), or_(*expired))
+            .order_by(TTSJob.id)
+            .limit(self.batch_size)
+            .with_for_update(of=TTSJob, skip_locked=True)
+        )).all()
+
+        released = []
+        for job in jobs:
+            if await self.blobs.release(job.audio_key):
+                released.append(job.audio_sha256)
+            job.audio_key = None
+            job.audio_sha256 = None
+            job.metadata_ = {**(job.metadata_ or {}), "audio_expired_at": now.isoformat()}
+        await self.db.commit()
+
+        await self._delete_derived(released)
+        return len(jobs)
+
+    async def purge_reference_audios(self) -> int:
+        """Delete reference audios that were soft-deleted long enough ago."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.DELETED_REFERENCE_AUDIO_RETENTION_DAYS)
+        audios = (await self.db.scalars(
+            select(ReferenceAudio)
+            .where(ReferenceAudio.is_active == False, ReferenceAudio.updated_at < cutoff)
+            .order_by(ReferenceAudio.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not audios:
+            return 0
+
+        ids = [audio.id for audio in audios]
+        # Jobs keep their cloned voice_id; only the link to the sample goes
+        await self.db.execute(
+            update(TTSJob)
+            .where(TTSJob.reference_audio_id.in_(ids))
+            .values(reference_audio_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+        released = []
+        for audio in audios:
+            if await self.blobs.release(audio.audio_key):
+                released.append(audio.audio_sha256)
+            await self.db.delete(audio)
+        await self.db.commit()
+
+        await self._delete_derived(released)
+        return len(audios)
+
+    async def sweep_orphans(self, prefix: str) -> int:
+        """
+        Delete objects under a prefix that no row refers to.
+
+        Lists one page after the saved cursor, diffs its keys against the
+        database and deletes the unreferenced ones that are past the grace
+        period. The cursor wraps to the start once the prefix is exhausted.
+
+        Args:
+            prefix: One of SWEEP_PREFIXES
+
+        Returns:
+            The number of objects deleted
+        """
+        cursor = await self._get_cursor(f"orphans:{prefix}")
+        keys = await self.storage.list_files(prefix, start_after=cursor.position, limit=self.batch_size)
+        cursor.position = keys[-1] if len(keys) == self.batch_size else None
+
+        candidates = set(keys) - await self._referenced(prefix, keys)
+        grace = datetime.now(timezone.utc) - timedelta(seconds=settings.ORPHAN_GRACE_SECONDS)
+
+        deleted = 0
+        for key in sorted(candidates):
+            modified = await self.storage.get_file_modified_time(key)
+            if modified is None:
+                continue
+            if modified.tzinfo is None:
+                modified = modified.astimezone()  # local filesystem times are naive local time
+            # Objects are written before the rows that reference them commit
+            if modified > grace:
+                continue
+            if await self.storage.delete_file(key):
+                deleted += 1
+
+        await self.db.commit()
+        if deleted:
+            logger.info("Deleted %d orphaned objects under %s/", deleted, prefix)
+        return deleted
+
+    async def demote_cold_blobs(self) -> int:
+        """Move blobs that have not been read or written for a while to the cold tier."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.COLD_TIER_AFTER_DAYS)
+        blob_ids = (await self.db.scalars(
+            select(StorageBlob.id)
+            .where(StorageBlob.cold_key.is_(None), StorageBlob.last_accessed_at < cutoff)
+            .order_by(StorageBlob.last_accessed_at)
+            .limit(self.batch_size)
+        )).all()
+
+        demoted = 0
+        saved = 0
+        for blob_id in blob_ids:
+            # Skip blobs read since they were picked
+            blob = await self.db.scalar(
+                select(StorageBlob)
+                .where(
+                    StorageBlob.id == blob_id,
+                    StorageBlob.cold_key.is_(None),
+                    StorageBlob.last_accessed_at < cutoff
+                )
+                .with_for_update(skip_locked=True)
+            )
+            if not blob:
+                await self.db.rollback()
+                continue
+            try:
+                size = await self.blobs.demote(blob, settings.S3_COLD_STORAGE_CLASS)
+            except Exception:
+                await self.db.rollback()
+                logger.exception("Failed to demote blob %s", blob_id)
+                continue
+            demoted += 1
+            saved += blob.size - size
+
+        if demoted:
+            logger.info("Demoted %d blobs to the cold tier, saving %d bytes", demoted, saved)
+        return demoted
+
+    async def _referenced(self, prefix: str, keys: List[str]) -> Set[str]:
+        """The subset of listed keys that some row still points at."""
+        if not keys or prefix == "tmp":
+            return set()
+
+        if prefix in ("derivatives", "peaks"):
+            # Named after the audio hash: <sha256>.<format>.<ext> / <sha256>.peaks
+            by_hash: Dict[str, List[str]] = {}
+            for key in keys:
+                by_hash.setdefault(os.path.basename(key).split(".", 1)[0], []).append(key)
+            hashes = list(by_hash)
+            live = set(await self.db.scalars(select(StorageBlob.sha256).where(StorageBlob.sha256.in_(hashes))))
+            live |= set(await self.db.scalars(select(TTSJob.audio_sha256).where(TTSJob.audio_sha256.in_(hashes))))
+            return {key for sha in live for key in by_hash[sha]}
+
+        columns = {
+            "blobs": [StorageBlob.key],
+            "cold": [StorageBlob.cold_key],
+            "audios": [TTSJob.audio_key],
+            "reference_audios": [ReferenceAudio.audio_key],
+        }[prefix]
+        referenced = set()
+        for column in columns:
+            referenced |= set(await self.db.scalars(select(column).where(column.in_(keys))))
+        return referenced
+
+    async def _get_cursor(self, name: str) -> MaintenanceCursor:
+        cursor = await self.db.scalar(select(MaintenanceCursor).where(MaintenanceCursor.name == name))
+        if cursor is None:
+            cursor = MaintenanceCursor(name=name)
+            self.db.add(cursor)
+        return cursor
+
+    async def _delete_derived(self, hashes: Iterable[Optional[str]]) -> None:
+        """Delete encoded copies and peaks of audio that no longer exists."""
+        for sha in filter(None, hashes):
+            if await self.db.scalar(select(StorageBlob.id).where(StorageBlob.sha256 == sha)):
+                continue  # Stored again since it was released
+            for output_format in TTSOutputFormat:
+                if output_format != TTSOutputFormat.WAV:
+                    await self.storage.delete_file(derivative_key(sha, output_format))
+            await self.storage.delete_file(peaks_key(sha))
+
+async def run(passes: int = 1, batch_size: int = 500) -> None:
+    async with AsyncSessionLocal() as db:
+        manager = LifecycleManager(db, batch_size=batch_size)
+        for _ in range(passes):
+            await manager.run_once()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply storage retention and tiering policies")
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=settings.LIFECYCLE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.passes, args.batch_size))
+
+if __name__ == "__main__":
+    main()
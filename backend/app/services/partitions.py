@@ -0,0 +1,132 @@
+"""
+Monthly partitions of tts_jobs.
+
+tts_jobs is range-partitioned on created_at (migration 0006): everything
+from before partitioning lives in tts_jobs_legacy, and every later month in
+its own tts_jobs_pYYYY_MM partition. Rows outside every range go to
+tts_jobs_default, which only works as a safety net: each partition created
+afterwards has to check it for rows of its month. ensure_partitions keeps
+the coming months created in advance so it stays empty; the scheduler
+(app.services.scheduler) runs it daily, or by hand:
+
+Usage:
+    python -m app.services.partitions [--months-ahead 3]
+"""
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "tts_jobs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+_PARTITION_NAME = re.compile(r"^tts_jobs_p(\d{4})_(\d{2})$")
+
+def month_start(value: date) -> date:
+    """The first day of the month value falls in."""
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    """The first day of the month months after (or before) month."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y_%m}"
+
+async def _latest_partition(db: AsyncSession) -> Optional[date]:
+    """The month of the newest monthly partition, or None if there is none."""
+    names = await db.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": PARENT_TABLE})
+    months = [
+        date(int(match.group(1)), int(match.group(2)), 1)
+        for match in map(_PARTITION_NAME.match, names)
+        if match
+    ]
+    return max(months, default=None)
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = 3) -> List[str]:
+    """
+    Create the monthly partitions of tts_jobs up to months_ahead months out.
+
+    Partitions are contiguous: each new one starts where the newest existing
+    one ends, so the ranges can never overlap the legacy partition. Rows
+    that already went to the default partition for a month are moved into
+    that month's new partition.
+
+    Args:
+        db: Database session
+        months_ahead: Months after the current one that must already exist
+
+    Returns:
+        The names of the partitions created
+    """
+    if db.bind.dialect.name != "postgresql":
+        return []
+    latest = await _latest_partition(db)
+    if latest is None:
+        logger.warning("%s has no monthly partitions; is migration 0006 applied?", PARENT_TABLE)
+        return []
+
+    last_needed = add_months(month_start(datetime.utcnow().date()), months_ahead)
+    created = []
+    month = add_months(latest, 1)
+    while month <= last_needed:
+        name = partition_name(month)
+        # Creating a partition briefly locks the parent; give up rather than
+        # queue behind a long query (and block everything queued after us)
+        await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+        await _create_partition(db, month)
+        await db.commit()
+        created.append(name)
+        logger.info("Created partition %s", name)
+        month = add_months(month, 1)
+    return created
+
+async def _create_partition(db: AsyncSession, month: date) -> None:
+    """Create the partition for month, taking over its rows from the default partition."""
+    name = partition_name(month)
+    bounds = f"FROM ('{month} 00:00:00+00') TO ('{add_months(month, 1)} 00:00:00+00')"
+    in_month = f"created_at >= '{month} 00:00:00+00' AND created_at < '{add_months(month, 1)} 00:00:00+00'"
+
+    strays = await db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"))
+    if not strays:
+        await db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+        return
+
+    # Attaching fails while the default partition still holds rows of the
+    # month, so they move in the same transaction
+    await db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.warning("Moved %d rows from %s into %s", moved.rowcount, DEFAULT_PARTITION, name)
+
+async def run(months_ahead: int) -> None:
+    async with AsyncSessionLocal() as db:
+        created = await ensure_partitions(db, months_ahead)
+    logger.info("Created %d partitions", len(created))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create upcoming monthly partitions of tts_jobs")
+    parser.add_argument("--months-ahead", type=int, default=settings.TTS_JOB_PARTITIONS_AHEAD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.months_ahead))
+
+if __name__ == "__main__":
+    main()
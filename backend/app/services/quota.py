@@ -0,0 +1,178 @@
+"""
+Character quota reservation.
+
+Quota is taken when a job is submitted, with a single conditional UPDATE
+that only succeeds while the new usage stays within both limits. The check
+and the increment are one statement, so concurrent submits cannot overshoot
+and no subscription row is read, locked and written back by the app.
+Completed jobs keep their reservation; failed and cancelled ones refund it.
+
+The counters are date-aware: a reservation on a new UTC day, or after the
+billing period ended, starts the counter over in the same statement, so
+quota works without any background process. reset_daily_usage and
+rollover_billing_periods, run by the scheduler (app.services.scheduler),
+only tidy up rows nobody has reserved against since.
+"""
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Integer, Interval, case, cast, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import Subscription
+
+def daily_usage(today: Optional[date] = None):
+    """SQL expression for today's daily usage: zero once the stored day has passed."""
+    today = today or datetime.utcnow().date()
+    return case((Subscription.daily_usage_date < today, 0), else_=Subscription.daily_character_usage)
+
+def monthly_usage(now: Optional[datetime] = None):
+    """SQL expression for the current period's usage: zero once the stored period has ended."""
+    now = now or datetime.utcnow()
+    return case((Subscription.current_period_end <= now, 0), else_=Subscription.monthly_character_usage)
+
+def _current_period_end(now: datetime):
+    """The end of the period containing now, advancing an ended period by whole periods."""
+    period = timedelta(days=settings.BILLING_PERIOD_DAYS)
+    # Only evaluated once the period has ended, so truncation is floor
+    elapsed = cast(
+        func.extract("epoch", now - Subscription.current_period_end) / period.total_seconds(),
+        Integer
+    ) + 1
+    return case(
+        (Subscription.current_period_end <= now, Subscription.current_period_end + elapsed * literal(period, Interval)),
+        else_=Subscription.current_period_end
+    )
+
+async def reserve_quota(db: AsyncSession, user_id: int, characters: int) -> bool:
+    """
+    Atomically add characters to a user's daily and monthly usage if both fit.
+
+    A counter whose day or billing period is over starts again from
+    characters, and the subscription moves to the current day and period.
+    The caller commits, normally together with the job the quota is for.
+
+    Args:
+        db: Database session
+        user_id: Owner of the subscription
+        characters: Characters to reserve
+
+    Returns:
+        False when the subscription is inactive or either limit would be exceeded
+    """
+    now = datetime.utcnow()
+    today = now.date()
+    period_over = Subscription.current_period_end <= now
+    result = await db.execute(
+        update(Subscription)
+        .where(
+            Subscription.user_id == user_id,
+            Subscription.is_active == True,
+            daily_usage(today) + characters <= Subscription.daily_character_limit,
+            monthly_usage(now) + characters <= Subscription.monthly_character_limit
+        )
+        .values(
+            daily_character_usage=daily_usage(today) + characters,
+            daily_usage_date=today,
+            monthly_character_usage=monthly_usage(now) + characters,
+            # SET sees the old row, so the start is derived from the new end
+            current_period_start=case(
+                (period_over, _current_period_end(now) - literal(timedelta(days=settings.BILLING_PERIOD_DAYS), Interval)),
+                else_=Subscription.current_period_start
+            ),
+            current_period_end=_current_period_end(now)
+        )
+        .returning(Subscription.id)
+        # Loaded Subscription objects pick up the new counters from RETURNING
+        .execution_options(synchronize_session="fetch")
+    )
+    return result.scalar_one_or_none() is not None
+
+async def refund_quota(db: AsyncSession, user_id: int, characters: int) -> None:
+    """
+    Give back a reservation whose job failed or was cancelled; the caller commits.
+
+    Usage never drops below zero, in case the counters were reset between the
+    reservation and the refund.
+    """
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.user_id == user_id)
+        .values(
+            daily_character_usage=func.greatest(Subscription.daily_character_usage - characters, 0),
+            monthly_character_usage=func.greatest(Subscription.monthly_character_usage - characters, 0)
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+
+async def reset_daily_usage(db: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Zero the daily usage of every subscription still counting an earlier day.
+
+    Only housekeeping: reserve_quota and the usage endpoints already treat
+    such counters as zero. Runs as set-based UPDATEs of at most batch_size rows, each committed on
+    its own so no transaction holds many row locks.
+
+    Returns:
+        The number of subscriptions reset
+    """
+    today = datetime.utcnow().date()
+    total = 0
+    while True:
+        due = (
+            select(Subscription.id)
+            .where(Subscription.daily_usage_date < today)
+            .order_by(Subscription.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(Subscription)
+            .where(Subscription.id.in_(due))
+            .values(daily_character_usage=0, daily_usage_date=today)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+async def rollover_billing_periods(db: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Start a new billing period, with monthly usage zeroed, for every
+    subscription whose current period has ended.
+
+    A subscription several periods behind moves forward one period per
+    run until it is current. Like reset_daily_usage this only tidies rows up;
+    reserve_quota rolls an ended period over itself.
+
+    Returns:
+        The number of periods rolled over
+    """
+    period = timedelta(days=settings.BILLING_PERIOD_DAYS)
+    total = 0
+    while True:
+        due = (
+            select(Subscription.id)
+            .where(Subscription.current_period_end <= datetime.utcnow())
+            .order_by(Subscription.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(Subscription)
+            .where(Subscription.id.in_(due))
+            .values(
+                monthly_character_usage=0,
+                current_period_start=Subscription.current_period_end,
+                current_period_end=Subscription.current_period_end + period
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
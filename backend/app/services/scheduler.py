@@ -0,0 +1,185 @@
+"""
+Periodic maintenance jobs, run in their own process.
+
+Any number of replicas may run the scheduler; only the one holding a
+Postgres advisory lock (the leader) runs jobs. The lock lives on a dedicated
+connection, so it is released as soon as the leader exits or loses that
+connection, and a standby takes over on its next tick.
+
+Usage:
+    python -m app.services.scheduler [--once]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.archive import JobArchiver
+from app.services.lifecycle import LifecycleManager
+from app.services.partitions import ensure_partitions
+from app.services.quota import reset_daily_usage, rollover_billing_periods
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[[AsyncSession], Awaitable[Any]]
+
+class ScheduledJob:
+    """A maintenance task run every interval seconds, each time with a fresh session."""
+
+    def __init__(self, name: str, interval: float, func: JobFunc):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = 0.0  # monotonic time; due immediately after startup
+
+class Scheduler:
+    """Runs due jobs on every tick while this process is the leader."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine = async_engine,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        lock_id: int = settings.SCHEDULER_LOCK_ID,
+        tick: float = settings.SCHEDULER_TICK_SECONDS
+    ):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.lock_id = lock_id
+        self.tick = tick
+        self.jobs: List[ScheduledJob] = []
+        self._leader_conn: Optional[AsyncConnection] = None
+
+    def add(self, name: str, interval: float, func: JobFunc) -> None:
+        """Register a job; func receives an AsyncSession and its result is logged."""
+        self.jobs.append(ScheduledJob(name, interval, func))
+
+    async def is_leader(self) -> bool:
+        """
+        Check, or try to take, leadership.
+
+        Returns:
+            True while this process holds the advisory lock
+        """
+        if self.engine.dialect.name != "postgresql":
+            return True  # No advisory locks; a single local scheduler is assumed
+
+        if self._leader_conn is not None:
+            try:
+                await self._leader_conn.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                logger.warning("Lost the scheduler leader connection")
+                await self._release()
+
+        conn = await self.engine.connect()
+        try:
+            # Autocommit, so holding the connection does not hold a transaction open
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": self.lock_id})
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+
+        self._leader_conn = conn
+        logger.info("Became the scheduler leader")
+        return True
+
+    async def _release(self) -> None:
+        """Give up leadership by discarding the connection that holds the lock."""
+        if self._leader_conn is None:
+            return
+        conn, self._leader_conn = self._leader_conn, None
+        try:
+            # Session-level locks outlive a connection returned to the pool
+            await conn.invalidate()
+            await conn.close()
+        except Exception:
+            logger.exception("Failed to close the scheduler leader connection")
+
+    async def run_due(self, force: bool = False) -> None:
+        """Run every job whose interval has elapsed (or all of them with force)."""
+        for job in self.jobs:
+            now = time.monotonic()
+            if not force and job.next_run > now:
+                continue
+            job.next_run = now + job.interval
+            try:
+                async with self.session_factory() as db:
+                    result = await job.func(db)
+                logger.info("Scheduled job %s finished: %s", job.name, result)
+            except Exception:
+                logger.exception("Scheduled job %s failed", job.name)
+
+    async def run_forever(self) -> None:
+        try:
+            while True:
+                try:
+                    if await self.is_leader():
+                        await self.run_due()
+                except Exception:
+                    logger.exception("Scheduler tick failed")
+                await asyncio.sleep(self.tick)
+        finally:
+            await self._release()
+
+    async def run_once(self) -> None:
+        """Run every job once, if this process can become the leader."""
+        try:
+            if await self.is_leader():
+                await self.run_due(force=True)
+            else:
+                logger.info("Another scheduler is the leader; nothing to do")
+        finally:
+            await self._release()
+
+def default_scheduler() -> Scheduler:
+    """The scheduler with the application's maintenance jobs registered."""
+    scheduler = Scheduler()
+    batch_size = settings.QUOTA_RESET_BATCH_SIZE
+    scheduler.add(
+        "reset_daily_usage",
+        settings.QUOTA_RESET_INTERVAL_SECONDS,
+        lambda db: reset_daily_usage(db, batch_size)
+    )
+    scheduler.add(
+        "rollover_billing_periods",
+        settings.QUOTA_RESET_INTERVAL_SECONDS,
+        lambda db: rollover_billing_periods(db, batch_size)
+    )
+    scheduler.add(
+        "storage_lifecycle",
+        settings.LIFECYCLE_INTERVAL_SECONDS,
+        lambda db: LifecycleManager(db, batch_size=settings.LIFECYCLE_BATCH_SIZE).run_once()
+    )
+    scheduler.add(
+        "tts_job_partitions",
+        settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+        lambda db: ensure_partitions(db, settings.TTS_JOB_PARTITIONS_AHEAD)
+    )
+    scheduler.add(
+        "archive_tts_jobs",
+        settings.ARCHIVE_INTERVAL_SECONDS,
+        lambda db: JobArchiver(db, batch_size=settings.LIFECYCLE_BATCH_SIZE).run_once()
+    )
+    return scheduler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run periodic maintenance jobs")
+    parser.add_argument("--once", action="store_true", help="run every job once and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    scheduler = default_scheduler()
+    asyncio.run(scheduler.run_once() if args.once else scheduler.run_forever())
+
+if __name__ == "__main__":
+    main()
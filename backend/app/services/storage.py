@@ -1,10 +1,82 @@
+import asyncio
+import hashlib
+import io
 import os
+import shutil
+import tempfile
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 import boto3
-from typing import Optional, Union, BinaryIO
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union, BinaryIO
 from datetime import datetime, timedelta
 from urllib.parse import urljoin
 
 from app.core.config import settings
+from app.services.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+# Objects above the threshold are split into parts and uploaded concurrently
+_transfer_config = TransferConfig(
+    multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=settings.S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+
+def get_s3_client():
+    """
+    Get the process-wide S3 client, creating it on first use.
+    
+    boto3 clients are thread-safe once created, so every request and worker
+    thread shares one client and its connection pool instead of paying for
+    a new client and fresh TLS connections each time.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                # The default boto3 session is not thread-safe, use a private one
+                session = boto3.session.Session()
+                _s3_client = session.client(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                    region_name=settings.AWS_REGION,
+                    endpoint_url=settings.S3_ENDPOINT_URL,
+                    config=Config(
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': settings.S3_MAX_ATTEMPTS, 'mode': 'adaptive'},
+                        tcp_keepalive=True
+                    )
+                )
+    return _s3_client
+
+def shard_key(prefix: str, filename: str) -> str:
+    """
+    Build a hash-sharded storage key, e.g. ``audios/ab/cd/<filename>``.
+    
+    Spreading files over two levels of 256 directories keeps every directory
+    small, so lookups and listings stay fast with millions of files.
+    """
+    digest = hashlib.md5(filename.encode("utf-8"), usedforsecurity=False).hexdigest()
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{filename}"
+
+class StagedFile:
+    """Data hashed and held aside until its content-addressed key is known."""
+    
+    def __init__(self, sha256: str, size: int, path: Optional[str] = None, data: Optional[BinaryIO] = None):
+        self.sha256 = sha256
+        self.size = size
+        self.path = path  # local temp file
+        self.data = data  # in-memory/spooled copy for S3
 
 class StorageService:
     """Service for handling file storage operations."""
@@ -12,43 +84,57 @@ class StorageService:
     def __init__(self):
         self.storage_type = settings.STORAGE_TYPE
         self.base_path = settings.LOCAL_STORAGE_PATH
+        self.cache: Optional[DiskCache] = None
+        self._created_dirs: Set[str] = set()
         
         if self.storage_type == 's3':
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
-            )
+            self.s3_client = get_s3_client()
             self.bucket_name = settings.S3_BUCKET_NAME
+            if settings.DISK_CACHE_ENABLED:
+                self.cache = DiskCache(settings.DISK_CACHE_PATH, settings.DISK_CACHE_MAX_BYTES)
     
     def _get_local_path(self, filepath: str) -> str:
         """Get the full local path for a file."""
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.join(self.base_path, filepath)), exist_ok=True)
         return os.path.join(self.base_path, filepath)
     
-    def upload_file(self, filepath: str, file_data: Union[bytes, BinaryIO]) -> str:
+    def _ensure_local_dir(self, directory: str) -> None:
+        """Create a local directory, once per directory per process."""
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+    
+    def upload_file(
+        self,
+        filepath: str,
+        file_data: Union[bytes, BinaryIO],
+        storage_class: Optional[str] = None
+    ) -> str:
         """
         Upload a file to storage.
         
         Args:
             filepath: The path where the file should be stored (relative to storage root)
             file_data: The file data as bytes or a file-like object
+            storage_class: S3 storage class (e.g. "STANDARD_IA"); ignored for local storage
             
         Returns:
             The path where the file was stored
         """
         if self.storage_type == 's3':
-            # Upload to S3
+            # Upload to S3, using concurrent multipart uploads for large objects
             self.s3_client.upload_fileobj(
-                file_data if hasattr(file_data, 'read') else file_data,
+                file_data if hasattr(file_data, 'read') else io.BytesIO(file_data),
                 self.bucket_name,
-                filepath
+                filepath,
+                ExtraArgs={'StorageClass': storage_class} if storage_class else None,
+                Config=_transfer_config
             )
+            if self.cache:
+                self.cache.invalidate(filepath)
         else:
             # Save to local filesystem
             full_path = self._get_local_path(filepath)
+            self._ensure_local_dir(os.path.dirname(full_path))
             with open(full_path, 'wb') as f:
                 if hasattr(file_data, 'read'):
                     # If it's a file-like object, read and write in chunks
@@ -64,6 +150,82 @@ class StorageService:
         
         return filepath
     
+    def stage_file(self, file_data: Union[bytes, BinaryIO], chunk_size: int = 1024 * 1024) -> StagedFile:
+        """
+        Compute the SHA-256 of a file while staging it for upload.
+        
+        The hash is computed in the same streaming pass that writes the data to
+        a temporary file (local) or spool (S3), so the content-addressed key is
+        known without reading the data twice.
+        
+        Args:
+            file_data: The file data as bytes or a file-like object
+            chunk_size: Size of the chunks read from file-like objects
+            
+        Returns:
+            The staged file; pass it to commit_staged or discard_staged
+        """
+        digest = hashlib.sha256()
+        size = 0
+        
+        if self.storage_type == 's3':
+            if not hasattr(file_data, 'read'):
+                digest.update(file_data)
+                return StagedFile(digest.hexdigest(), len(file_data), data=io.BytesIO(file_data))
+            spool = tempfile.SpooledTemporaryFile(max_size=settings.S3_MULTIPART_THRESHOLD)
+            target = spool
+        else:
+            tmp_dir = self._get_local_path("tmp")
+            self._ensure_local_dir(tmp_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".tmp")
+            target = os.fdopen(fd, 'wb')
+        
+        try:
+            if hasattr(file_data, 'read'):
+                while True:
+                    chunk = file_data.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    target.write(chunk)
+            else:
+                digest.update(file_data)
+                size = len(file_data)
+                target.write(file_data)
+        except BaseException:
+            target.close()
+            if self.storage_type != 's3':
+                os.remove(tmp_path)
+            raise
+        
+        if self.storage_type == 's3':
+            spool.seek(0)
+            return StagedFile(digest.hexdigest(), size, data=spool)
+        
+        target.close()
+        return StagedFile(digest.hexdigest(), size, path=tmp_path)
+    
+    def commit_staged(self, staged: StagedFile, filepath: str) -> str:
+        """Store a staged file under its final path."""
+        if self.storage_type == 's3':
+            try:
+                return self.upload_file(filepath, staged.data)
+            finally:
+                staged.data.close()
+        
+        full_path = self._get_local_path(filepath)
+        self._ensure_local_dir(os.path.dirname(full_path))
+        os.replace(staged.path, full_path)
+        return filepath
+    
+    def discard_staged(self, staged: StagedFile) -> None:
+        """Throw away a staged file, e.g. because identical content is already stored."""
+        if staged.data is not None:
+            staged.data.close()
+        if staged.path and os.path.exists(staged.path):
+            os.remove(staged.path)
+    
     def download_file(self, filepath: str) -> bytes:
         """
         Download a file from storage.
@@ -74,15 +236,191 @@ class StorageService:
         Returns:
             The file data as bytes
         """
+        with self.open_file(filepath) as f:
+            return f.read()
+    
+    def open_file(self, filepath: str) -> BinaryIO:
+        """
+        Open a file in storage for reading.
+        
+        S3 objects are served from the local disk cache when enabled, so
+        repeated reads (e.g. a reference audio used for every cloning job)
+        only hit S3 once.
+        
+        Args:
+            filepath: The path to the file in storage
+            
+        Returns:
+            A binary file-like object; the caller must close it
+        """
         if self.storage_type == 's3':
+            if self.cache:
+                return self.cache.open(filepath, partial(self._download_into, filepath))
             # Download from S3
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filepath)
-            return response['Body'].read()
+            return response['Body']
         else:
             # Read from local filesystem
             full_path = self._get_local_path(filepath)
-            with open(full_path, 'rb') as f:
-                return f.read()
+            return open(full_path, 'rb')
+    
+    def _download_into(self, filepath: str, f: BinaryIO) -> None:
+        self.s3_client.download_fileobj(self.bucket_name, filepath, f, Config=_transfer_config)
+    
+    def open_local_file(self, filepath: str) -> Optional[BinaryIO]:
+        """
+        Open a file only if it can be read from local disk without a download.
+        
+        Returns:
+            The local file, or its disk-cached copy for S3; None when the S3
+            object is not cached (FileNotFoundError for a missing local file)
+        """
+        if self.storage_type == 's3':
+            return self.cache.get(filepath) if self.cache else None
+        return open(self._get_local_path(filepath), 'rb')
+    
+    def warm_cache(self, filepath: str) -> None:
+        """Download an S3 object into the disk cache, if enabled and not cached yet."""
+        if self.storage_type == 's3' and self.cache:
+            self.cache.fill(filepath, partial(self._download_into, filepath))
+    
+    def iter_range(
+        self,
+        filepath: str,
+        start: int,
+        end: int,
+        chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """
+        Stream an inclusive byte range of a file.
+        
+        For S3 a cached copy is read when there is one; otherwise only the
+        requested bytes are fetched, using a ranged GET.
+        
+        Args:
+            filepath: The path to the file in storage
+            start: First byte to return
+            end: Last byte to return (inclusive)
+            chunk_size: Size of the yielded chunks
+        """
+        f = self.open_local_file(filepath)
+        if f is None:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=filepath,
+                Range=f"bytes={start}-{end}"
+            )
+            yield from response['Body'].iter_chunks(chunk_size)
+            return
+        
+        with f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get hit ratio and bytes saved by the local disk cache."""
+        if not self.cache:
+            return {"enabled": False}
+        return self.cache.stats()
+    
+    def copy_file(self, source: str, destination: str) -> str:
+        """
+        Copy a file to a new path within storage.
+        
+        Args:
+            source: The path of the existing file
+            destination: The path to copy it to
+            
+        Returns:
+            The destination path
+        """
+        if self.storage_type == 's3':
+            self.s3_client.copy(
+                {'Bucket': self.bucket_name, 'Key': source},
+                self.bucket_name,
+                destination,
+                Config=_transfer_config
+            )
+            if self.cache:
+                self.cache.invalidate(destination)
+        else:
+            source_path = self._get_local_path(source)
+            destination_path = self._get_local_path(destination)
+            self._ensure_local_dir(os.path.dirname(destination_path))
+            try:
+                # Hard links make the copy free on the same filesystem
+                os.link(source_path, destination_path)
+            except OSError:
+                shutil.copyfile(source_path, destination_path)
+        
+        return destination
+    
+    def list_files(
+        self,
+        prefix: str,
+        start_after: Optional[str] = None,
+        limit: int = 1000,
+        recursive: bool = True
+    ) -> List[str]:
+        """
+        List files under a prefix in key order, one bounded page at a time.
+        
+        Args:
+            prefix: The directory prefix to list (e.g. "audios")
+            start_after: Only return keys after this one (for paging)
+            limit: Maximum number of keys to return
+            recursive: Whether to descend into sub-directories
+            
+        Returns:
+            Up to ``limit`` storage keys
+        """
+        prefix = prefix.rstrip('/') + '/'
+        
+        if self.storage_type == 's3':
+            params = {'Bucket': self.bucket_name, 'Prefix': prefix, 'MaxKeys': limit}
+            if start_after:
+                params['StartAfter'] = start_after
+            if not recursive:
+                params['Delimiter'] = '/'
+            response = self.s3_client.list_objects_v2(**params)
+            return [obj['Key'] for obj in response.get('Contents', [])]
+        
+        keys = []
+        after = tuple(start_after.split('/')) if start_after else None
+        for key in self._walk_local(prefix.rstrip('/'), after, recursive):
+            keys.append(key)
+            if len(keys) >= limit:
+                break
+        return keys
+    
+    def _walk_local(
+        self,
+        prefix: str,
+        after: Optional[Tuple[str, ...]],
+        recursive: bool
+    ) -> Iterator[str]:
+        """Yield local keys under prefix in a stable, resumable order."""
+        try:
+            entries = sorted(os.scandir(self._get_local_path(prefix)), key=lambda e: e.name)
+        except FileNotFoundError:
+            return
+        
+        for entry in entries:
+            key = f"{prefix}/{entry.name}"
+            parts = tuple(key.split('/'))
+            if entry.is_dir():
+                # Skip sub-trees that sort entirely before the resume point
+                if not recursive or (after and parts < after[:len(parts)]):
+                    continue
+                yield from self._walk_local(key, after, recursive)
+            elif not after or parts > after:
+                yield key
     
     def get_presigned_url(self, filepath: str, expires_in: int = 3600) -> str:
         """
@@ -124,6 +462,8 @@ class StorageService:
             if self.storage_type == 's3':
                 # Delete from S3
                 self.s3_client.delete_object(Bucket=self.bucket_name, Key=filepath)
+                if self.cache:
+                    self.cache.invalidate(filepath)
             else:
                 # Delete from local filesystem
                 full_path = self._get_local_path(filepath)
@@ -202,3 +542,122 @@ class StorageService:
                 return None
         except Exception:
             return None
+
+
+_storage_service: Optional[StorageService] = None
+
+def get_storage_service() -> StorageService:
+    """Get the shared storage service instance."""
+    global _storage_service
+    if _storage_service is None:
+        _storage_service = StorageService()
+    return _storage_service
+
+
+def _log_warm_failure(future: "Future[None]") -> None:
+    if future.exception() is not None:
+        logger.warning("Could not fill the disk cache", exc_info=future.exception())
+
+
+class AsyncStorageService:
+    """
+    Async facade over StorageService for use inside request handlers.
+    
+    Blocking disk and S3 calls run on a dedicated, bounded thread pool so a
+    slow upload or download never stalls the event loop (and the unrelated
+    requests it is serving). The pool is separate from the default executor
+    so storage I/O cannot starve other threadpool work.
+    """
+    
+    def __init__(self, storage: StorageService, executor: ThreadPoolExecutor):
+        self.storage = storage
+        self.executor = executor
+    
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+    
+    async def upload_file(
+        self,
+        filepath: str,
+        file_data: Union[bytes, BinaryIO],
+        storage_class: Optional[str] = None
+    ) -> str:
+        """Upload a file to storage without blocking the event loop."""
+        return await self._run(self.storage.upload_file, filepath, file_data, storage_class)
+    
+    async def stage_file(self, file_data: Union[bytes, BinaryIO]) -> StagedFile:
+        """Hash and stage a file without blocking the event loop."""
+        return await self._run(self.storage.stage_file, file_data)
+    
+    async def commit_staged(self, staged: StagedFile, filepath: str) -> str:
+        """Store a staged file under its final path without blocking the event loop."""
+        return await self._run(self.storage.commit_staged, staged, filepath)
+    
+    async def discard_staged(self, staged: StagedFile) -> None:
+        """Throw away a staged file without blocking the event loop."""
+        await self._run(self.storage.discard_staged, staged)
+    
+    async def download_file(self, filepath: str) -> bytes:
+        """Download a file from storage without blocking the event loop."""
+        return await self._run(self.storage.download_file, filepath)
+    
+    async def open_file(self, filepath: str) -> BinaryIO:
+        """Open a file for reading without blocking the event loop."""
+        return await self._run(self.storage.open_file, filepath)
+    
+    async def open_local_file(self, filepath: str) -> Optional[BinaryIO]:
+        """Open a file already on local disk (see StorageService.open_local_file) without blocking the event loop."""
+        return await self._run(self.storage.open_local_file, filepath)
+    
+    def warm_cache(self, filepath: str) -> None:
+        """Start filling the disk cache with an S3 object in the background; returns immediately."""
+        if self.storage.storage_type != 's3' or not self.storage.cache:
+            return
+        future = self.executor.submit(self.storage.warm_cache, filepath)
+        future.add_done_callback(_log_warm_failure)
+    
+    async def list_files(
+        self,
+        prefix: str,
+        start_after: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[str]:
+        """List one page of keys under a prefix without blocking the event loop."""
+        return await self._run(self.storage.list_files, prefix, start_after, limit)
+    
+    async def delete_file(self, filepath: str) -> bool:
+        """Delete a file from storage without blocking the event loop."""
+        return await self._run(self.storage.delete_file, filepath)
+    
+    async def file_exists(self, filepath: str) -> bool:
+        """Check if a file exists without blocking the event loop."""
+        return await self._run(self.storage.file_exists, filepath)
+    
+    async def get_file_size(self, filepath: str) -> Optional[int]:
+        """Get the size of a file without blocking the event loop."""
+        return await self._run(self.storage.get_file_size, filepath)
+    
+    async def get_file_modified_time(self, filepath: str) -> Optional[datetime]:
+        """Get the last modified time of a file without blocking the event loop."""
+        return await self._run(self.storage.get_file_modified_time, filepath)
+    
+    def get_presigned_url(self, filepath: str, expires_in: int = 3600) -> str:
+        """Generate a presigned URL (computed locally, so no I/O to offload)."""
+        return self.storage.get_presigned_url(filepath, expires_in)
+
+
+_async_storage_service: Optional[AsyncStorageService] = None
+
+def get_async_storage_service() -> AsyncStorageService:
+    """Get the shared async storage service instance."""
+    global _async_storage_service
+    if _async_storage_service is None:
+        _async_storage_service = AsyncStorageService(
+            get_storage_service(),
+            ThreadPoolExecutor(
+                max_workers=settings.STORAGE_IO_WORKERS,
+                thread_name_prefix="storage-io"
+            )
+        )
+    return _async_storage_service
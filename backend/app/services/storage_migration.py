@@ -0,0 +1,99 @@
+"""
+Migrate flat storage layouts (``audios/<file>``) to the hash-sharded layout.
+
+Each file is copied to its sharded key, the rows pointing at it are updated,
+and only then is the old file removed, so readers never see a dangling key.
+Safe to re-run: files that were already moved are simply not listed again.
+
+Usage:
+    python -m app.services.storage_migration [--batch-size 500] [--dry-run]
+"""
+import argparse
+import logging
+import os
+
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.tts import TTSJob, ReferenceAudio
+from app.services.storage import StorageService, get_storage_service, shard_key
+
+logger = logging.getLogger(__name__)
+
+# Storage prefix -> model whose audio_key points into it
+LEGACY_PREFIXES = {
+    "audios": TTSJob,
+    "reference_audios": ReferenceAudio,
+}
+
+def migrate_prefix(
+    db: Session,
+    storage: StorageService,
+    prefix: str,
+    batch_size: int = 500,
+    dry_run: bool = False
+) -> int:
+    """
+    Move the flat files directly under a prefix into the sharded layout.
+
+    Args:
+        db: Database session
+        storage: Storage service to migrate
+        prefix: The legacy directory (e.g. "audios")
+        batch_size: Number of files handled per listing page and commit
+        dry_run: Only log what would be moved
+
+    Returns:
+        The number of files migrated
+    """
+    model = LEGACY_PREFIXES[prefix]
+    migrated = 0
+    start_after = None
+
+    while True:
+        keys = storage.list_files(prefix, start_after=start_after, limit=batch_size, recursive=False)
+        if not keys:
+            break
+        start_after = keys[-1]
+
+        moves = {key: shard_key(prefix, os.path.basename(key)) for key in keys}
+        if dry_run:
+            for old_key, new_key in moves.items():
+                logger.info("Would move %s -> %s", old_key, new_key)
+            migrated += len(moves)
+            continue
+
+        for old_key, new_key in moves.items():
+            storage.copy_file(old_key, new_key)
+
+        rows = db.query(model).filter(model.audio_key.in_(list(moves))).all()
+        for row in rows:
+            row.audio_key = moves[row.audio_key]
+        db.commit()
+
+        for old_key in moves:
+            storage.delete_file(old_key)
+
+        migrated += len(moves)
+        logger.info("Migrated %d files under %s/", migrated, prefix)
+
+    return migrated
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate stored audio to the sharded layout")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    storage = get_storage_service()
+    db = SessionLocal()
+    try:
+        for prefix in LEGACY_PREFIXES:
+            count = migrate_prefix(db, storage, prefix, args.batch_size, args.dry_run)
+            logger.info("Done with %s/: %d files", prefix, count)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
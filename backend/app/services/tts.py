@@ -1,22 +1,69 @@
+import asyncio
+import logging
 import os
-import time
-import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 import random
 
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi import Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload, selectinload
 
 from app.core.config import settings
-from app.models.tts import TTSJob, TTSJobStatus, ReferenceAudio, TTSVoiceType
+from app.core.pagination import count_cache, count_key, keyset_page
+from app.core.security import get_read_db
+from app.db.session import get_db
+from app.models.tts import TEXT_PREVIEW_LENGTH, TTSJob, TTSJobStatus, ReferenceAudio, TTSVoiceType
 from app.models.user import User, Subscription
 from app.schemas.tts import TTSGenerateRequest, TTSJobStatus as TTSJobStatusEnum
-from app.services.storage import StorageService
+from app.services.audio_formats import encode_pcm_wav, is_format_available
+from app.services.blobs import BlobStore
+from app.services.quota import refund_quota, reserve_quota
+from app.services.storage import get_async_storage_service
+from app.services.usage import record_job_usage
+from app.services.waveform import store_peaks
+
+logger = logging.getLogger(__name__)
+
+# Fields a job listing can return (fields=) and the columns behind them;
+# audio_url and peaks_url are minted from the storage keys, which are always loaded
+JOB_LIST_FIELDS = {
+    "id": TTSJob.id,
+    "status": TTSJob.status,
+    "created_at": TTSJob.created_at,
+    "updated_at": TTSJob.updated_at,
+    "text_preview": TTSJob.text_preview,
+    "text": TTSJob.text,
+    "voice_type": TTSJob.voice_type,
+    "voice_id": TTSJob.voice_id,
+    "reference_audio_id": TTSJob.reference_audio_id,
+    "audio_url": None,
+    "peaks_url": None,
+    "audio_duration": TTSJob.audio_duration,
+    "error_message": TTSJob.error_message,
+    "metadata": TTSJob.metadata_,
+}
+
+# Everything but the full text and metadata
+DEFAULT_JOB_LIST_FIELDS = (
+    "id", "status", "created_at", "updated_at", "text_preview", "voice_type", "voice_id",
+    "audio_url", "peaks_url", "audio_duration", "error_message"
+)
+
+def job_list_item(job: TTSJob, fields: Sequence[str]) -> Dict[str, Any]:
+    """The requested fields of a job loaded by get_user_jobs."""
+    return {
+        field: (job.metadata_ or {}) if field == "metadata" else getattr(job, field)
+        for field in fields
+    }
 
 class TTSService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.storage = StorageService()
+        self.storage = get_async_storage_service()
+        self.blobs = BlobStore(db, self.storage)
     
     def _get_available_voice(self) -> str:
         """Simulate getting an available voice ID."""
@@ -29,30 +76,31 @@ class TTSService:
         # Base time + time per character (simulated)
         return 1.0 + (text_length / 1000)  # 1s + 1ms per character
     
-    def _simulate_tts_processing(self, text: str, voice_id: str) -> Tuple[bytes, float]:
+    async def _simulate_tts_processing(self, text: str, voice_id: str) -> Tuple[bytes, float]:
         """Simulate TTS processing."""
         # In a real implementation, this would call the actual TTS service
         processing_time = self._get_processing_time(len(text))
-        time.sleep(min(processing_time, 0.1))  # Simulate some processing time
+        await asyncio.sleep(min(processing_time, 0.1))  # Simulate some processing time
         
-        # Generate a mock audio file (empty bytes in this case)
-        audio_data = b""  # In a real implementation, this would be the actual audio data
+        # Generate a mock audio file (silent canonical PCM in this case)
         duration = len(text) / 15  # Rough estimate: 15 characters per second
+        samples = np.zeros(int(duration * settings.TTS_SAMPLE_RATE), dtype=np.int16)
+        audio_data = encode_pcm_wav(samples, settings.TTS_SAMPLE_RATE)  # In a real implementation, this would be the actual audio data
         
         return audio_data, duration
     
-    def create_tts_job(
+    async def create_tts_job(
         self,
         user: User,
         request: TTSGenerateRequest
     ) -> TTSJob:
         """Create a new TTS job."""
-        # Check user's subscription and quota
+        # Check user's subscription
         if not user.subscription or not user.subscription.is_active:
             raise ValueError("No active subscription")
         
-        if not user.subscription.has_quota(len(request.text)):
-            raise ValueError("Insufficient quota")
+        if not is_format_available(request.output_format):
+            raise ValueError(f"Output format '{request.output_format.value}' is not available")
         
         # Validate voice type and reference audio
         voice_id = request.voice_id
@@ -62,14 +110,12 @@ class TTSService:
             if not request.reference_audio_id:
                 raise ValueError("Reference audio ID is required for cloned voice")
             
-            reference_audio = (
-                self.db.query(ReferenceAudio)
-                .filter(
+            reference_audio = await self.db.scalar(
+                select(ReferenceAudio).options(raiseload("*")).where(
                     ReferenceAudio.id == request.reference_audio_id,
                     ReferenceAudio.user_id == user.id,
                     ReferenceAudio.is_active == True
                 )
-                .first()
             )
             
             if not reference_audio:
@@ -81,41 +127,51 @@ class TTSService:
             if not voice_id:
                 voice_id = self._get_available_voice()
         
+        # Take the characters out of the quota; committed together with the job
+        if not await reserve_quota(self.db, user.id, len(request.text)):
+            raise ValueError("Insufficient quota")
+        
         # Create the job
         job = TTSJob(
             user_id=user.id,
             status=TTSJobStatus.QUEUED,
             text=request.text,
+            text_preview=request.text[:TEXT_PREVIEW_LENGTH],
             voice_type=request.voice_type,
             voice_id=voice_id,
             reference_audio_id=reference_audio.id if reference_audio else None,
-            metadata={
+            metadata_={
                 "speed": request.speed,
                 "pitch": request.pitch,
                 "emotion": request.emotion,
                 "language": request.language,
+                "output_format": request.output_format.value,
                 **request.metadata
-            } if request.metadata else {"speed": request.speed, "pitch": request.pitch, "emotion": request.emotion, "language": request.language}
+            } if request.metadata else {"speed": request.speed, "pitch": request.pitch, "emotion": request.emotion, "language": request.language, "output_format": request.output_format.value}
         )
         
         self.db.add(job)
-        self.db.commit()
-        self.db.refresh(job)
+        await self.db.commit()
+        count_cache.invalidate(count_key("jobs", user.id) + ":")
         
         return job
     
-    def process_tts_job(self, job_id: int) -> TTSJob:
-        """Process a TTS job."""
-        # Get the job with a lock to prevent concurrent processing
-        job = (
-            self.db.query(TTSJob)
-            .filter(
-                TTSJob.id == job_id,
-                TTSJob.status.in_([TTSJobStatus.QUEUED, TTSJobStatus.PROCESSING])
-            )
-            .with_for_update()
-            .first()
+    async def process_tts_job(self, job_id: int, created_at: Optional[datetime] = None) -> TTSJob:
+        """
+        Process a TTS job.
+        
+        Pass the job's created_at when known: tts_jobs is partitioned by it,
+        and a lookup by id alone probes every partition's index.
+        """
+        query = select(TTSJob).options(raiseload("*")).where(
+            TTSJob.id == job_id,
+            TTSJob.status.in_([TTSJobStatus.QUEUED, TTSJobStatus.PROCESSING])
         )
+        if created_at is not None:
+            query = query.where(TTSJob.created_at == created_at)
+        
+        # Get the job with a lock to prevent concurrent processing
+        job = await self.db.scalar(query.with_for_update())
         
         if not job:
             raise ValueError("Job not found or already processed")
@@ -123,61 +179,74 @@ class TTSService:
         # Update job status to processing
         job.status = TTSJobStatus.PROCESSING
         self.db.add(job)
-        self.db.commit()
+        await self.db.commit()
+        
+        # Read before any rollback expires the job
+        user_id, reserved = job.user_id, len(job.text)
         
         try:
             # Simulate TTS processing
-            audio_data, duration = self._simulate_tts_processing(job.text, job.voice_id)
+            audio_data, duration = await self._simulate_tts_processing(job.text, job.voice_id)
             
-            # Generate a unique filename
-            filename = f"{job.id}_{int(time.time())}.wav"
-            filepath = os.path.join("audios", filename)
+            # Save the audio file (identical output is stored only once)
+            audio_key, audio_sha256 = await self.blobs.put(audio_data, ".wav")
             
-            # Save the audio file
-            self.storage.upload_file(filepath, audio_data)
+            # Precompute waveform peaks so the UI never has to fetch the audio to draw it
+            try:
+                await store_peaks(self.storage, audio_sha256, audio_data)
+            except Exception:
+                logger.exception("Failed to store waveform peaks for job %s", job.id)
             
             # Update job with results
             job.status = TTSJobStatus.COMPLETED
-            job.audio_url = self.storage.get_presigned_url(filepath)
+            job.audio_key = audio_key
+            job.audio_sha256 = audio_sha256
             job.audio_duration = duration
             
-            # Update user's subscription usage
-            if job.user and job.user.subscription:
-                job.user.subscription.record_usage(len(job.text))
+            # The quota was reserved at submit; only the usage rollup changes
+            await record_job_usage(self.db, job)
             
             self.db.add(job)
-            self.db.commit()
+            await self.db.commit()
             
             return job
             
         except Exception as e:
             # Handle errors
+            await self.db.rollback()
             job.status = TTSJobStatus.FAILED
             job.error_message = str(e)
             self.db.add(job)
-            self.db.commit()
+            await refund_quota(self.db, user_id, reserved)
+            await self.db.commit()
+            await self.db.refresh(job)
             raise
     
-    def get_job_status(self, job_id: int, user_id: Optional[int] = None) -> Optional[TTSJob]:
-        """Get the status of a TTS job."""
-        query = self.db.query(TTSJob).filter(TTSJob.id == job_id)
+    async def get_job_status(self, job_id: int, user_id: Optional[int] = None) -> Optional[TTSJob]:
+        """
+        Get the status of a TTS job.
+        
+        URLs carry only the id, so this probes the id index of every
+        partition (one cheap lookup per month of history).
+        """
+        query = select(TTSJob).options(raiseload("*")).where(TTSJob.id == job_id)
         
         if user_id is not None:
-            query = query.filter(TTSJob.user_id == user_id)
+            query = query.where(TTSJob.user_id == user_id)
         
-        return query.first()
+        return await self.db.scalar(query)
     
-    def cancel_job(self, job_id: int, user_id: int) -> bool:
+    async def cancel_job(self, job_id: int, user_id: int) -> bool:
         """Cancel a pending TTS job."""
-        job = (
-            self.db.query(TTSJob)
-            .filter(
+        job = await self.db.scalar(
+            select(TTSJob)
+            .options(raiseload("*"))
+            .where(
                 TTSJob.id == job_id,
                 TTSJob.user_id == user_id,
                 TTSJob.status.in_([TTSJobStatus.QUEUED, TTSJobStatus.PROCESSING])
             )
             .with_for_update()
-            .first()
         )
         
         if not job:
@@ -185,29 +254,66 @@ class TTSService:
         
         job.status = TTSJobStatus.CANCELLED
         self.db.add(job)
-        self.db.commit()
+        await refund_quota(self.db, user_id, len(job.text))
+        await self.db.commit()
+        count_cache.invalidate(count_key("jobs", user_id) + ":")
         
         return True
     
-    def get_user_jobs(
+    async def get_user_jobs(
         self,
         user_id: int,
         status: Optional[TTSJobStatusEnum] = None,
         limit: int = 100,
-        offset: int = 0
-    ) -> Tuple[List[TTSJob], int]:
-        """Get a user's TTS jobs with optional filtering."""
-        query = self.db.query(TTSJob).filter(TTSJob.user_id == user_id)
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Sequence[str] = DEFAULT_JOB_LIST_FIELDS
+    ) -> Tuple[List[TTSJob], Optional[str], Optional[int]]:
+        """
+        Get a page of a user's TTS jobs, newest first, with optional filtering.
+        
+        Only the columns behind fields are loaded, so a listing never reads
+        the (TOASTed) text or metadata unless asked for them; touching any
+        other attribute of the returned jobs raises instead of querying.
+        
+        Args:
+            user_id: Owner of the jobs
+            status: Only jobs in this status
+            limit: Page size
+            cursor: next_cursor of the previous page
+            include_total: Also count all matching jobs
+            fields: Names from JOB_LIST_FIELDS
+        
+        Returns:
+            The jobs, the next page's cursor and the total (None unless requested)
+        """
+        unknown = [field for field in fields if field not in JOB_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        columns = [TTSJob.created_at, TTSJob.audio_key, TTSJob.audio_sha256]
+        columns += [JOB_LIST_FIELDS[field] for field in fields if JOB_LIST_FIELDS[field] is not None]
+        
+        query = (
+            select(TTSJob)
+            .options(load_only(*{column.key: column for column in columns}.values(), raiseload=True), raiseload("*"))
+            .where(TTSJob.user_id == user_id)
+        )
         
         if status is not None:
-            query = query.filter(TTSJob.status == status)
+            query = query.where(TTSJob.status == status)
         
-        total = query.count()
-        jobs = query.order_by(TTSJob.created_at.desc()).offset(offset).limit(limit).all()
+        jobs, next_cursor = await keyset_page(self.db, query, TTSJob, limit, cursor)
+        total = await self._count(count_key("jobs", user_id, status), query) if include_total else None
         
-        return jobs, total
+        return jobs, next_cursor, total
     
-    def create_reference_audio(
+    async def _count(self, key: str, query) -> int:
+        """Total rows of a list query, from the short-lived count cache when possible."""
+        async def count() -> int:
+            return await self.db.scalar(select(func.count()).select_from(query.subquery()))
+        return await count_cache.get(key, count)
+    
+    async def create_reference_audio(
         self,
         user_id: int,
         file_data: bytes,
@@ -219,33 +325,29 @@ class TTSService:
     ) -> ReferenceAudio:
         """Upload and create a reference audio."""
         # Check user's voice clone limit
-        user = self.db.query(User).filter(User.id == user_id).first()
+        user = await self.db.scalar(
+            select(User).options(selectinload(User.subscription), raiseload("*")).where(User.id == user_id)
+        )
         if not user or not user.subscription:
             raise ValueError("User not found or has no subscription")
         
         # Count active reference audios
-        active_audios = (
-            self.db.query(ReferenceAudio)
-            .filter(
+        active_audios = await self.db.scalar(
+            select(func.count(ReferenceAudio.id)).where(
                 ReferenceAudio.user_id == user_id,
                 ReferenceAudio.is_active == True
             )
-            .count()
         )
         
         if active_audios >= user.subscription.max_voice_clones:
             raise ValueError(f"Maximum number of voice clones ({user.subscription.max_voice_clones}) reached")
         
-        # Generate a unique filename
         file_ext = os.path.splitext(filename)[1].lower()
         if file_ext not in ['.wav', '.mp3', '.ogg', '.flac']:
             raise ValueError("Unsupported file format")
         
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        filepath = os.path.join("reference_audios", unique_filename)
-        
-        # Upload the file
-        self.storage.upload_file(filepath, file_data)
+        # Upload the file (re-uploads of the same audio share one stored copy)
+        audio_key, audio_sha256 = await self.blobs.put(file_data, file_ext)
         
         # Get audio duration (simulated)
         duration = 10.0  # In a real implementation, use a library to get the actual duration
@@ -255,28 +357,36 @@ class TTSService:
             user_id=user_id,
             name=name,
             description=description,
-            audio_url=self.storage.get_presigned_url(filepath),
+            audio_key=audio_key,
+            audio_sha256=audio_sha256,
             audio_duration=duration,
             is_public=is_public,
-            metadata=metadata or {}
+            metadata_=metadata or {}
         )
         
         self.db.add(audio)
-        self.db.commit()
-        self.db.refresh(audio)
+        await self.db.commit()
+        count_cache.invalidate(count_key("reference_audios", user_id) + ":")
         
         return audio
     
-    def delete_reference_audio(self, audio_id: int, user_id: int) -> bool:
-        """Delete a reference audio."""
-        audio = (
-            self.db.query(ReferenceAudio)
-            .filter(
+    async def get_reference_audio(self, audio_id: int, user_id: int) -> Optional[ReferenceAudio]:
+        """Get one of a user's reference audios."""
+        return await self.db.scalar(
+            select(ReferenceAudio).options(raiseload("*")).where(
                 ReferenceAudio.id == audio_id,
                 ReferenceAudio.user_id == user_id
             )
-            .first()
         )
+    
+    async def ensure_audio_available(self, audio_key: Optional[str]) -> None:
+        """Rehydrate stored audio from the cold tier before it is read."""
+        if await self.blobs.ensure_hot(audio_key):
+            await self.db.commit()
+    
+    async def delete_reference_audio(self, audio_id: int, user_id: int) -> bool:
+        """Delete a reference audio."""
+        audio = await self.get_reference_audio(audio_id, user_id)
         
         if not audio:
             return False
@@ -284,29 +394,35 @@ class TTSService:
         # Mark as inactive instead of deleting to preserve referential integrity
         audio.is_active = False
         self.db.add(audio)
-        self.db.commit()
+        await self.db.commit()
+        count_cache.invalidate(count_key("reference_audios", user_id) + ":")
         
         return True
     
-    def get_reference_audios(
+    async def get_reference_audios(
         self,
         user_id: int,
         is_active: bool = True,
         limit: int = 100,
-        offset: int = 0
-    ) -> Tuple[List[ReferenceAudio], int]:
-        """Get a user's reference audios."""
-        query = self.db.query(ReferenceAudio).filter(
+        cursor: Optional[str] = None,
+        include_total: bool = False
+    ) -> Tuple[List[ReferenceAudio], Optional[str], Optional[int]]:
+        """Get a page of a user's reference audios, newest first."""
+        query = select(ReferenceAudio).options(raiseload("*")).where(
             ReferenceAudio.user_id == user_id,
             ReferenceAudio.is_active == is_active
         )
         
-        total = query.count()
-        audios = query.order_by(ReferenceAudio.created_at.desc()).offset(offset).limit(limit).all()
+        audios, next_cursor = await keyset_page(self.db, query, ReferenceAudio, limit, cursor)
+        total = await self._count(count_key("reference_audios", user_id, is_active), query) if include_total else None
         
-        return audios, total
+        return audios, next_cursor, total
 
 
-def get_tts_service(db: Session) -> TTSService:
+def get_tts_service(db: AsyncSession = Depends(get_db)) -> TTSService:
     """Dependency to get a TTS service instance."""
     return TTSService(db)
+
+def get_read_tts_service(db: AsyncSession = Depends(get_read_db)) -> TTSService:
+    """Dependency to get a TTS service for read-only endpoints, backed by a replica."""
+    return TTSService(db)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.storage import StorageBlob
+from app.models.tts import TTSJob, ReferenceAudio
+from app.services.storage import StorageService, get_storage_service
+
+class URLService:
+    """
+    Mints access URLs for stored audio on read.
+
+    Jobs and reference audios only persist their storage key. URLs are signed
+    when a response is built and kept in an in-memory TTL cache, so repeated
+    listings hand out the same URL until it gets close to expiry instead of
+    re-signing every row on every request.
+
+    On S3 a URL points straight at the object, which is gone while its blob
+    is in the cold tier; such files are linked through the API endpoints
+    instead, which rehydrate them on read.
+    """
+
+    def __init__(
+        self,
+        storage: StorageService,
+        expires_in: int = 3600,
+        refresh_margin: int = 300,
+        max_entries: int = 10000
+    ):
+        self.storage = storage
+        self.expires_in = expires_in
+        self.refresh_margin = min(refresh_margin, expires_in // 2)
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_url(self, key: Optional[str]) -> Optional[str]:
+        """
+        Get a URL for a storage key, reusing a cached one while it is fresh.
+
+        Args:
+            key: The storage key of the file
+
+        Returns:
+            A URL that stays valid for at least the refresh margin, or None if
+            there is no key
+        """
+        if not key:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[1] - now > self.refresh_margin:
+                self._cache.move_to_end(key)
+                return cached[0]
+
+        url = self.storage.get_presigned_url(key, expires_in=self.expires_in)
+
+        with self._lock:
+            self._cache[key] = (url, now + self.expires_in)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+        return url
+
+    def invalidate(self, key: str) -> None:
+        """Drop a cached URL, e.g. after the underlying object is deleted."""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    async def _cold_keys(self, db: AsyncSession, keys: Iterable[Optional[str]]) -> Set[str]:
+        """The keys among keys whose blob is in the cold tier (only looked up on S3)."""
+        keys = {key for key in keys if key}
+        if self.storage.storage_type != 's3' or not keys:
+            return set()
+        return set(await db.scalars(
+            select(StorageBlob.key).where(StorageBlob.key.in_(keys), StorageBlob.cold_key.isnot(None))
+        ))
+
+    async def attach_job_urls(self, db: AsyncSession, jobs: Iterable[TTSJob]) -> None:
+        """Fill in the audio_url and peaks_url of each job from its storage keys."""
+        jobs = list(jobs)
+        cold = await self._cold_keys(db, (job.audio_key for job in jobs))
+        for job in jobs:
+            if self.storage.storage_type == 's3' and job.audio_key not in cold:
+                job.audio_url = self.get_url(job.audio_key)
+            else:
+                # Local and cold files are served by the authenticated audio endpoint
+                job.audio_url = f"/api/tts/audio/{job.id}" if job.audio_key else None
+            # Peaks are small and immutable, so they are always served by the API
+            job.peaks_url = f"/api/tts/audio/{job.id}/peaks" if job.audio_sha256 else None
+
+    async def attach_reference_audio_urls(self, db: AsyncSession, audios: Iterable[ReferenceAudio]) -> None:
+        """Fill in the audio_url of each reference audio from its storage key."""
+        audios = list(audios)
+        cold = await self._cold_keys(db, (audio.audio_key for audio in audios))
+        for audio in audios:
+            if self.storage.storage_type == 's3' and audio.audio_key not in cold:
+                audio.audio_url = self.get_url(audio.audio_key)
+            else:
+                audio.audio_url = f"/api/tts/reference-audios/{audio.id}/audio"
+
+
+_url_service: Optional[URLService] = None
+
+def get_url_service() -> URLService:
+    """Get the shared URL service instance."""
+    global _url_service
+    if _url_service is None:
+        _url_service = URLService(
+            get_storage_service(),
+            expires_in=settings.PRESIGNED_URL_EXPIRE_SECONDS,
+            refresh_margin=settings.PRESIGNED_URL_REFRESH_MARGIN,
+            max_entries=settings.URL_CACHE_MAX_ENTRIES
+        )
+    return _url_service
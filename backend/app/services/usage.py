@@ -0,0 +1,185 @@
+"""
+Per-user daily usage rollups.
+
+Completing a job adds it to its owner's row for the job's creation day (UTC)
+in the same transaction, so usage summaries read a handful of rollup rows
+instead of scanning tts_jobs.
+
+Usage (rebuild rollups from existing jobs):
+    python -m app.services.usage [--since 2024-01-01] [--days-per-batch 31]
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.tts import ReferenceAudio, TTSJob, TTSJobStatus
+from app.models.usage import UsageRollup
+from app.models.user import Subscription, User
+from app.services.quota import daily_usage, monthly_usage
+
+logger = logging.getLogger(__name__)
+
+def usage_day(created_at: Optional[datetime]) -> date:
+    """The rollup day of a job: its UTC creation date."""
+    if created_at is None:
+        return datetime.utcnow().date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+async def record_job_usage(db: AsyncSession, job: TTSJob) -> None:
+    """Add a completed job to its owner's daily rollup; the caller commits."""
+    await db.execute(
+        insert(UsageRollup)
+        .values(user_id=job.user_id, day=usage_day(job.created_at), jobs=1, characters=len(job.text))
+        .on_conflict_do_update(
+            constraint="uq_usage_rollups_user_id_day",
+            set_={
+                "jobs": UsageRollup.jobs + 1,
+                "characters": UsageRollup.characters + len(job.text),
+                "updated_at": func.now(),
+            }
+        )
+    )
+
+async def get_usage_summary(db: AsyncSession, user: User) -> Dict[str, Any]:
+    """
+    Quota counters plus today's and this month's completed usage.
+
+    Args:
+        db: Database session
+        user: User with their subscription (limits) loaded
+
+    Returns:
+        The usage payload served by /tts/usage and /users/me/usage
+    """
+    today = datetime.utcnow().date()
+    start_of_month = today.replace(day=1)
+
+    # At most 31 rows per user
+    jobs_today, characters_today, characters_this_month = (await db.execute(
+        select(
+            func.coalesce(func.sum(case((UsageRollup.day == today, UsageRollup.jobs), else_=0)), 0),
+            func.coalesce(func.sum(case((UsageRollup.day == today, UsageRollup.characters), else_=0)), 0),
+            func.coalesce(func.sum(UsageRollup.characters), 0)
+        ).where(
+            UsageRollup.user_id == user.id,
+            UsageRollup.day >= start_of_month,
+            UsageRollup.day <= today
+        )
+    )).one()
+
+    # Read fresh: the authenticated user may be a cached copy without counters.
+    # A counter of a past day or period reads as zero until it is next used
+    daily, monthly = (await db.execute(
+        select(daily_usage(today), monthly_usage())
+        .where(Subscription.user_id == user.id)
+    )).one()
+
+    active_audios = await db.scalar(
+        select(func.count(ReferenceAudio.id)).where(
+            ReferenceAudio.user_id == user.id,
+            ReferenceAudio.is_active == True
+        )
+    )
+
+    sub = user.subscription
+    return {
+        "daily_usage": daily,
+        "daily_limit": sub.daily_character_limit,
+        "monthly_usage": monthly,
+        "monthly_limit": sub.monthly_character_limit,
+        "voice_clones_used": active_audios,
+        "voice_clones_limit": sub.max_voice_clones,
+        "jobs_today": int(jobs_today),
+        "characters_today": int(characters_today),
+        "characters_this_month": int(characters_this_month)
+    }
+
+async def backfill(db: AsyncSession, since: Optional[date] = None, days_per_batch: int = 31) -> int:
+    """
+    Rebuild rollups from completed jobs, one window of days per transaction.
+
+    Rows are overwritten rather than added to, so the backfill can be rerun
+    safely; jobs completing while it runs are counted by record_job_usage.
+    Archived jobs no longer have their text, so a day with any archived job
+    keeps the rollup it had rather than being replaced by a smaller total.
+
+    Args:
+        db: Database session
+        since: First day to rebuild; defaults to the oldest job
+        days_per_batch: Days aggregated per statement
+
+    Returns:
+        The number of rollup rows written
+    """
+    if since is None:
+        oldest = await db.scalar(select(func.min(TTSJob.created_at)))
+        if oldest is None:
+            return 0
+        since = usage_day(oldest)
+
+    # Windows are bounded on the raw column so each one only reads the
+    # partitions it covers; the UTC day is computed for the rows inside it
+    day = func.date(func.timezone("UTC", TTSJob.created_at))
+    written = 0
+    end = datetime.utcnow().date()
+    start = since
+    while start <= end:
+        stop = start + timedelta(days=days_per_batch)
+        totals = (
+            select(
+                TTSJob.user_id,
+                day.label("day"),
+                func.count(TTSJob.id).label("jobs"),
+                func.sum(func.length(TTSJob.text)).label("characters")
+            )
+            .where(
+                TTSJob.status == TTSJobStatus.COMPLETED,
+                TTSJob.created_at >= datetime.combine(start, time.min, tzinfo=timezone.utc),
+                TTSJob.created_at < datetime.combine(stop, time.min, tzinfo=timezone.utc)
+            )
+            .group_by(TTSJob.user_id, day)
+            .having(func.count(TTSJob.archived_at) == 0)
+        )
+        stmt = insert(UsageRollup).from_select(["user_id", "day", "jobs", "characters"], totals)
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_usage_rollups_user_id_day",
+                set_={
+                    "jobs": stmt.excluded.jobs,
+                    "characters": stmt.excluded.characters,
+                    "updated_at": func.now(),
+                }
+            )
+        )
+        await db.commit()
+        written += result.rowcount
+        logger.info("Backfilled usage rollups for %s to %s", start, stop - timedelta(days=1))
+        start = stop
+
+    return written
+
+async def run(since: Optional[date] = None, days_per_batch: int = 31) -> None:
+    async with AsyncSessionLocal() as db:
+        written = await backfill(db, since, days_per_batch)
+    logger.info("Wrote %d usage rollup rows", written)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build daily usage rollups from existing TTS jobs")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--days-per-batch", type=int, default=31)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.since, args.days_per_batch))
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,62 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
 import uuid
 
 from app.models.user import User, Subscription, UserRole
+from app.models.tts import TTSJob, ReferenceAudio
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.pagination import count_cache, count_key, keyset_page
+from app.core.principal_cache import principal_cache
+from app.core.security import get_password_hash, verify_and_update_password, verify_password
+from app.services.blobs import BlobStore
 
-def get_user(db: Session, user_id: int) -> Optional[User]:
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
     """Get a user by ID."""
-    return db.query(User).filter(User.id == user_id).first()
+    return await db.scalar(
+        select(User).options(selectinload(User.subscription), raiseload("*")).where(User.id == user_id)
+    )
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(
+        select(User).options(selectinload(User.subscription), raiseload("*")).where(User.email == email)
+    )
 
-def get_users(
-    db: Session, 
-    skip: int = 0, 
+async def get_users(
+    db: AsyncSession, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     email: Optional[str] = None,
     is_active: Optional[bool] = None,
-    role: Optional[str] = None
-) -> List[User]:
-    """Get a list of users with optional filtering."""
-    query = db.query(User)
+    role: Optional[UserRole] = None,
+    include_total: bool = False
+) -> Tuple[List[User], Optional[str], Optional[int]]:
+    """Get a page of users, newest first, with optional filtering."""
+    query = select(User).options(raiseload("*"))
     
     if email:
-        query = query.filter(User.email.ilike(f"%{email}%"))
+        query = query.where(User.email.ilike(f"%{email}%"))
     if is_active is not None:
-        query = query.filter(User.is_active == is_active)
+        query = query.where(User.is_active == is_active)
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
+    
+    users, next_cursor = await keyset_page(db, query, User, limit, cursor)
+    
+    total = None
+    if include_total:
+        async def count() -> int:
+            return await db.scalar(select(func.count()).select_from(query.subquery()))
+        total = await count_cache.get(count_key("users", email, is_active, role), count)
     
-    return query.offset(skip).limit(limit).all()
+    return users, next_cursor, total
 
-def create_user(db: Session, user_in: UserCreate) -> User:
+async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     """Create a new user with a subscription."""
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await get_password_hash(user_in.password)
     
     # Create user
     db_user = User(
@@ -62,13 +81,13 @@ def create_user(db: Session, user_in: UserCreate) -> User:
     db_user.subscription = subscription
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    count_cache.invalidate("users:")
     
     return db_user
 
-def update_user(
-    db: Session, 
+async def update_user(
+    db: AsyncSession, 
     db_user: User, 
     user_in: UserUpdate
 ) -> User:
@@ -77,17 +96,17 @@ def update_user(
     
     if "email" in update_data and update_data["email"] != db_user.email:
         # Check if new email is already in use
-        existing_user = get_user_by_email(db, update_data["email"])
+        existing_user = await get_user_by_email(db, update_data["email"])
         if existing_user and existing_user.id != db_user.id:
             raise ValueError("Email already in use")
     
     if "new_password" in update_data and update_data["new_password"]:
         # Verify current password if changing password
-        if not verify_password(update_data["current_password"], db_user.hashed_password):
+        if not await verify_password(update_data["current_password"], db_user.hashed_password):
             raise ValueError("Current password is incorrect")
         
         # Update password
-        db_user.hashed_password = get_password_hash(update_data["new_password"])
+        db_user.hashed_password = await get_password_hash(update_data["new_password"])
         # Remove password fields from update data to avoid overwriting
         update_data.pop("current_password", None)
         update_data.pop("new_password", None)
@@ -98,33 +117,47 @@ def update_user(
             setattr(db_user, field, value)
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await principal_cache.invalidate(db_user.id)
     
     return db_user
 
-def delete_user(db: Session, user_id: int) -> bool:
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
     """Delete a user by ID."""
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         return False
     
-    db.delete(db_user)
-    db.commit()
+    # Release the user's stored audio; blobs shared with other users survive
+    blobs = BlobStore(db)
+    job_keys = select(TTSJob.audio_key).where(TTSJob.user_id == user_id, TTSJob.audio_key.isnot(None))
+    audio_keys = select(ReferenceAudio.audio_key).where(ReferenceAudio.user_id == user_id)
+    for key in (await db.scalars(union_all(job_keys, audio_keys))).all():
+        await blobs.release(key)
+    
+    await db.delete(db_user)
+    await db.commit()
+    count_cache.invalidate("users:")
+    await principal_cache.invalidate(user_id)
     return True
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate a user by email and password."""
-    user = get_user_by_email(db, email=email)
+    user = await get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Hashed with an outdated scheme or cost; upgrade while we have the password
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-def create_admin_user(db: Session, email: str, password: str, full_name: str = None) -> User:
+async def create_admin_user(db: AsyncSession, email: str, password: str, full_name: str = None) -> User:
     """Create an admin user (for initialization)."""
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash(password)
     
     db_user = User(
         email=email,
@@ -148,13 +181,12 @@ def create_admin_user(db: Session, email: str, password: str, full_name: str = N
     db_user.subscription = subscription
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     
     return db_user
 
-def update_user_subscription(
-    db: Session,
+async def update_user_subscription(
+    db: AsyncSession,
     user_id: int,
     plan_id: str,
     is_active: bool = True,
@@ -163,7 +195,7 @@ def update_user_subscription(
     max_voice_clones: int = None
 ) -> bool:
     """Update a user's subscription."""
-    user = get_user(db, user_id)
+    user = await get_user(db, user_id)
     if not user or not user.subscription:
         return False
     
@@ -186,6 +218,6 @@ def update_user_subscription(
         subscription.current_period_end = datetime.utcnow() + timedelta(days=30)
     
     db.add(subscription)
-    db.commit()
+    await db.commit()
     
     return True
@@ -0,0 +1,122 @@
+import asyncio
+import io
+import struct
+import wave
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.storage import AsyncStorageService, shard_key
+
+# Bucket counts per resolution; each level is 4x coarser than the previous one
+PEAK_LEVELS = (4096, 1024, 256, 64)
+
+MAGIC = b"PEAK"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBHII")  # magic, version, levels, reserved, sample rate, duration (ms)
+_LEVEL = struct.Struct("<I")  # bucket count, followed by interleaved int8 (min, max) pairs
+
+def peaks_key(audio_sha256: str) -> str:
+    """Storage key of the peaks blob, shared by all jobs with the same audio."""
+    return shard_key("peaks", f"{audio_sha256}.peaks")
+
+def compute_peaks(wav_data: bytes) -> Tuple[Dict[int, np.ndarray], int, int]:
+    """
+    Compute min/max peaks at every resolution in PEAK_LEVELS.
+
+    The finest level is computed from the samples in one vectorized pass;
+    coarser levels are reduced from it, so the cost is a single scan of the audio.
+
+    Args:
+        wav_data: A 16-bit PCM WAV file
+
+    Returns:
+        Peaks per bucket count as (buckets, 2) int8 arrays of (min, max),
+        the sample rate and the duration in milliseconds
+    """
+    with wave.open(io.BytesIO(wav_data), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+
+    # Envelope across channels, one (low, high) pair per frame
+    frames = samples.reshape(-1, channels)
+    low, high = frames.min(axis=1), frames.max(axis=1)
+
+    duration_ms = int(len(frames) * 1000 / sample_rate) if sample_rate else 0
+    finest = PEAK_LEVELS[0]
+
+    if len(frames) == 0:
+        mins = maxs = np.zeros(finest, dtype=np.int16)
+    else:
+        # Bucket boundaries; short clips repeat samples across buckets
+        starts = (np.arange(finest) * len(frames)) // finest
+        starts = np.minimum(starts, len(frames) - 1)
+        mins = np.minimum.reduceat(low, starts)
+        maxs = np.maximum.reduceat(high, starts)
+
+    levels = {}
+    for buckets in PEAK_LEVELS:
+        factor = len(mins) // buckets
+        level_min = mins.reshape(buckets, factor).min(axis=1)
+        level_max = maxs.reshape(buckets, factor).max(axis=1)
+        pairs = np.stack([level_min, level_max], axis=1).astype(np.int32)
+        levels[buckets] = (pairs * 127 // 32768).astype(np.int8)
+
+    return levels, sample_rate, duration_ms
+
+def pack_peaks(levels: Dict[int, np.ndarray], sample_rate: int, duration_ms: int) -> bytes:
+    """Serialize peak levels into the compact binary format."""
+    parts = [_HEADER.pack(MAGIC, VERSION, len(levels), 0, sample_rate, duration_ms)]
+    for buckets, pairs in levels.items():
+        parts.append(_LEVEL.pack(buckets))
+        parts.append(pairs.tobytes())
+    return b"".join(parts)
+
+def select_level(blob: bytes, buckets: int) -> Optional[bytes]:
+    """
+    Extract a single resolution from a peaks blob.
+
+    Picks the coarsest level with at least the requested number of buckets
+    (or the finest available), so clients only download what they draw.
+
+    Returns:
+        A peaks blob containing just that level, or None if the blob is invalid
+    """
+    magic, version, count, _, sample_rate, duration_ms = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+
+    offset = _HEADER.size
+    levels = {}
+    for _ in range(count):
+        (level_buckets,) = _LEVEL.unpack_from(blob, offset)
+        start = offset + _LEVEL.size
+        offset = start + level_buckets * 2
+        levels[level_buckets] = blob[start:offset]
+
+    candidates = [b for b in levels if b >= buckets]
+    chosen = min(candidates) if candidates else max(levels)
+
+    return (
+        _HEADER.pack(MAGIC, VERSION, 1, 0, sample_rate, duration_ms)
+        + _LEVEL.pack(chosen)
+        + levels[chosen]
+    )
+
+async def store_peaks(storage: AsyncStorageService, audio_sha256: str, wav_data: bytes) -> str:
+    """
+    Compute and store the peaks blob for a canonical WAV.
+
+    Args:
+        storage: Storage to write the blob to
+        audio_sha256: SHA-256 of the audio, which names the blob
+        wav_data: The canonical PCM WAV
+
+    Returns:
+        The storage key of the peaks blob
+    """
+    levels, sample_rate, duration_ms = await asyncio.to_thread(compute_peaks, wav_data)
+    key = peaks_key(audio_sha256)
+    await storage.upload_file(key, pack_peaks(levels, sample_rate, duration_ms))
+    return key
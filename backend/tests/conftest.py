@@ -0,0 +1,112 @@
+"""
+Shared test setup.
+
+Settings are read when the app is first imported, so the environment is
+pointed at a throwaway database and storage directory before that happens.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="speechix-tests-")
+
+# Settings read .env from the working directory; a developer's own config
+# must not leak into the tests
+os.chdir(_tmp)
+
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp}/test.db"
+os.environ["STORAGE_TYPE"] = "local"
+os.environ["LOCAL_STORAGE_PATH"] = os.path.join(_tmp, "storage")
+os.environ["DISK_CACHE_PATH"] = os.path.join(_tmp, "cache")
+
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import httpx
+import pytest
+from moto import mock_aws
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models import storage as _storage_models, tts as _tts_models, usage as _usage_models, user as _user_models  # register every table
+from app.core import security
+from app.core.principal_cache import PrincipalCache
+from app.services import storage as storage_module, urls
+from app.services.storage import AsyncStorageService, StorageService
+
+
+@pytest.fixture
+async def db():
+    """A session on a freshly created schema."""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Pooled connections belong to this test's event loop
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    """Async local storage rooted in a directory of its own."""
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_PATH", str(tmp_path / "storage"))
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield AsyncStorageService(StorageService(), executor)
+    executor.shutdown()
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    """
+    An empty PostgreSQL database at TEST_DATABASE_URL, for what SQLite cannot
+    run (migrations, partitions, upserts). Skipped when no server answers.
+    Settings point at it, so Alembic migrates it.
+    """
+    engine = create_engine(settings.TEST_DATABASE_URL, poolclass=NullPool)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE"))
+            conn.execute(text("CREATE SCHEMA public"))
+    except OperationalError:
+        pytest.skip("PostgreSQL is not reachable at TEST_DATABASE_URL")
+    monkeypatch.setattr(settings, "DATABASE_URL", settings.TEST_DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """An in-memory S3 bucket that the app's shared storage services use."""
+    with mock_aws():
+        monkeypatch.setattr(settings, "STORAGE_TYPE", "s3")
+        monkeypatch.setattr(settings, "S3_BUCKET_NAME", "speechix-test")
+        monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", "testing")
+        monkeypatch.setattr(settings, "DISK_CACHE_ENABLED", False)
+        # Shared clients and services are rebuilt against the mock
+        for module, name in [
+            (storage_module, "_s3_client"),
+            (storage_module, "_storage_service"),
+            (storage_module, "_async_storage_service"),
+            (urls, "_url_service"),
+        ]:
+            monkeypatch.setattr(module, name, None)
+        client = boto3.client("s3", region_name=settings.AWS_REGION)
+        client.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+        yield client
+
+
+@pytest.fixture
+async def client(db, monkeypatch):
+    """An HTTP client calling the app in-process, on the test database."""
+    from app.main import app
+
+    # Users cached by an earlier test may share ids with this test's users
+    monkeypatch.setattr(security, "principal_cache", PrincipalCache(ttl=60, max_entries=1000))
+    async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+        yield http
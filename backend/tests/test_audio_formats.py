@@ -0,0 +1,64 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.schemas.tts import TTSOutputFormat
+from app.services import audio_formats
+from app.services.audio_formats import ULAW_SAMPLE_RATE, encode, encode_pcm_wav, stream_derivative
+from app.services.storage import AsyncStorageService, StorageService
+
+
+def tone(frequency: float, seconds: float, rate: int = 24000, amplitude: float = 10000) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    return encode_pcm_wav(amplitude * np.sin(2 * np.pi * frequency * t), rate)
+
+
+def decode_ulaw_wav(data: bytes) -> np.ndarray:
+    """G.711 mu-law decode the data chunk of a WAV file."""
+    start = data.index(b"data") + 8
+    length = int.from_bytes(data[start - 4:start], "little")
+    u = ~np.frombuffer(data[start:start + length], dtype=np.uint8).astype(np.int32) & 0xFF
+    magnitude = (((u & 0x0F) << 3) + 0x84 << ((u >> 4) & 0x07)) - 0x84
+    return np.where(u & 0x80, -magnitude, magnitude).astype(np.float64)
+
+
+def rms(samples: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(samples ** 2)))
+
+
+def test_ulaw_has_the_expected_length():
+    output = b"".join(encode(io.BytesIO(tone(440, 1.5)), TTSOutputFormat.ULAW))
+
+    assert len(decode_ulaw_wav(output)) == int(1.5 * ULAW_SAMPLE_RATE)
+
+
+def test_ulaw_filters_out_frequencies_above_nyquist():
+    passband = decode_ulaw_wav(b"".join(encode(io.BytesIO(tone(1000, 1)), TTSOutputFormat.ULAW)))
+    # 6 kHz would fold back to 2 kHz at an 8 kHz rate without the low-pass
+    stopband = decode_ulaw_wav(b"".join(encode(io.BytesIO(tone(6000, 1)), TTSOutputFormat.ULAW)))
+
+    assert rms(passband) > 5000
+    assert rms(stopband) < rms(passband) * 0.01
+
+
+async def test_slow_client_releases_the_encoder(monkeypatch):
+    monkeypatch.setattr(settings, "ENCODER_SEND_TIMEOUT_SECONDS", 0.2)
+    encoder_pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(audio_formats, "_encoder_pool", encoder_pool)
+    storage = AsyncStorageService(StorageService(), ThreadPoolExecutor(max_workers=2))
+    storage.storage.upload_file("audios/slow.wav", tone(440, 30))
+
+    stream = stream_derivative(storage, "audios/slow.wav", "derivatives/slow.ulaw.wav", TTSOutputFormat.ULAW)
+    await stream.__anext__()
+    await asyncio.sleep(1)
+
+    # The encoder thread gave up and is free for other work
+    assert await asyncio.get_running_loop().run_in_executor(encoder_pool, lambda: "free") == "free"
+    with pytest.raises(RuntimeError, match="stopped reading"):
+        async for _ in stream:
+            pass
+    assert not storage.storage.file_exists("derivatives/slow.ulaw.wav")
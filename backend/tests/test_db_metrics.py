@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import (
+    MAX_TRACKED_STATEMENTS, QueryBudgetExceeded, _explain, check_query_budget, engine, track_queries
+)
+from app.main import DatabaseUsageMiddleware
+
+
+def run_queries(count: int) -> None:
+    with engine.connect() as conn:
+        for _ in range(count):
+            conn.execute(text("SELECT 1"))
+
+
+async def call(app, scope=None):
+    """Run one GET request through an ASGI app, returning the sent messages."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": "GET", "path": "/", "headers": [], **(scope or {})}, receive, send)
+    return messages
+
+
+def streaming_app(queries: int):
+    async def app(scope, receive, send):
+        run_queries(queries)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"audio/wav")]})
+        await send({"type": "http.response.zerocopysend", "file": 3, "count": 10})
+        await send({"type": "http.response.body", "body": b"tail", "more_body": False})
+    return app
+
+
+async def test_middleware_passes_messages_through_and_adds_headers(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+    messages = await call(DatabaseUsageMiddleware(streaming_app(queries=2)))
+
+    assert [message["type"] for message in messages] == [
+        "http.response.start", "http.response.zerocopysend", "http.response.body"
+    ]
+    headers = dict(messages[0]["headers"])
+    assert headers[b"x-db-query-count"] == b"2"
+    assert b"x-db-time-ms" in headers
+
+
+async def test_middleware_enforces_the_query_budget(monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_BUDGET_PER_REQUEST", 2)
+
+    await call(DatabaseUsageMiddleware(streaming_app(queries=2)))
+    with pytest.raises(QueryBudgetExceeded):
+        await call(DatabaseUsageMiddleware(streaming_app(queries=3)))
+
+
+def test_tracked_statements_are_capped():
+    with track_queries() as stats:
+        run_queries(MAX_TRACKED_STATEMENTS + 50)
+
+    assert stats.count == MAX_TRACKED_STATEMENTS + 50
+    assert len(stats.statements) == MAX_TRACKED_STATEMENTS
+    with pytest.raises(QueryBudgetExceeded, match="and 50 more"):
+        check_query_budget(stats, 10)
+
+
+def test_slow_selects_are_explained_in_and_out_of_transactions(postgres):
+    statement = "SELECT relname FROM pg_class WHERE relname = %(name)s"
+
+    # Inside a transaction the EXPLAIN runs in a savepoint and leaves it usable
+    with postgres.begin() as conn:
+        conn.execute(text("SELECT 1"))
+        assert _explain(conn, statement, {"name": "pg_class"}).startswith("Index")
+        assert _explain(conn, "SELECT missing FROM nowhere", {}) is None
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    # With no transaction to protect, SAVEPOINT would fail; the plan still comes back
+    with postgres.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+        assert _explain(conn, statement, {"name": "pg_class"}).startswith("Index")
@@ -0,0 +1,77 @@
+"""
+Concurrent requests share the async engine's pool without exhausting it.
+
+The test database is SQLite, whose default pool is not the one production
+uses, so the app is pointed at a QueuePool of fixed size for the test.
+"""
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.security import create_access_token
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.tts import TTSJob, TTSJobStatus
+from app.models.user import User
+
+POOL_SIZE = 4
+REQUESTS = 60
+
+
+async def test_concurrent_requests_hold_throughput_within_the_pool(db, client):
+    user = User(email="busy@example.com", hashed_password="x")
+    db.add(user)
+    await db.flush()
+    db.add_all(
+        TTSJob(user_id=user.id, status=TTSJobStatus.COMPLETED, text=f"job {index}", text_preview=f"job {index}")
+        for index in range(20)
+    )
+    await db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+    pooled = create_async_engine(
+        async_engine.url, poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE, max_overflow=0, pool_timeout=5
+    )
+    checked_out = peak = 0
+
+    def on_checkout(dbapi_connection, record, proxy):
+        nonlocal checked_out, peak
+        checked_out += 1
+        peak = max(peak, checked_out)
+
+    def on_checkin(dbapi_connection, record):
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(pooled.sync_engine, "checkout", on_checkout)
+    event.listen(pooled.sync_engine, "checkin", on_checkin)
+    AsyncSessionLocal.configure(bind=pooled)
+    try:
+        async def history():
+            return (await client.get("/api/tts/history", headers=headers)).status_code
+
+        # Warm the pool, then time the same requests one by one and all at once
+        await asyncio.gather(*(history() for _ in range(POOL_SIZE)))
+        started = time.perf_counter()
+        sequential = [await history() for _ in range(REQUESTS)]
+        sequential_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        concurrent = await asyncio.gather(*(history() for _ in range(REQUESTS)))
+        concurrent_time = time.perf_counter() - started
+    finally:
+        AsyncSessionLocal.configure(bind=async_engine)
+        pool_status = pooled.pool.checkedout()
+        await pooled.dispose()
+
+    # Every request got a connection: none waited out pool_timeout
+    assert sequential == concurrent == [200] * REQUESTS
+    # Requests queued for the pool instead of opening connections past it,
+    # and every connection went back
+    assert 1 < peak <= POOL_SIZE
+    assert checked_out == 0 and pool_status == 0
+    # Queuing for a connection does not cost throughput
+    assert concurrent_time < sequential_time * 1.5
@@ -0,0 +1,45 @@
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+
+from app.db.session import track_queries
+from app.models.tts import TTSJob, TTSJobStatus
+from app.models.user import User
+from app.services.export import HistoryExporter
+
+
+async def add_jobs(db, storage, count: int) -> User:
+    user = User(email="export@example.com", hashed_password="x")
+    db.add(user)
+    await db.flush()
+    start = datetime.utcnow() - timedelta(hours=1)
+    for index in range(count):
+        key = f"audios/{user.id}/{index}.wav"
+        await storage.upload_file(key, b"RIFF" + bytes(index) * 1000)
+        db.add(TTSJob(
+            user_id=user.id, status=TTSJobStatus.COMPLETED, text=f"job {index}", audio_key=key,
+            # Pairs share a timestamp, so batches also split on id
+            created_at=start + timedelta(seconds=index // 2)
+        ))
+    await db.commit()
+    return user
+
+
+async def test_exports_deflated_entries_reading_text_once(db, storage):
+    user = await add_jobs(db, storage, 5)
+
+    with track_queries() as stats:
+        data = b"".join(HistoryExporter(user.id, storage=storage.storage, batch_size=2).stream())
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_DEFLATED}
+    manifest = json.loads(archive.read("manifest.json"))
+    assert [job["text"] for job in manifest["jobs"]] == [f"job {index}" for index in range(5)]
+    for job in manifest["jobs"]:
+        assert archive.read(job["file"]) == b"RIFF" + bytes(job["id"] - 1) * 1000
+
+    # The audio pass reads only keys, never the text again
+    audio_pass = [statement for statement in stats.statements if "storage_blobs" in statement]
+    assert audio_pass
+    assert not any("tts_jobs.text" in statement for statement in audio_pass)
@@ -0,0 +1,64 @@
+"""
+The hot queries are planned onto the indexes added for them.
+
+Plans come from the test database (SQLite's EXPLAIN QUERY PLAN), for the
+exact statements the services issue, so a query reshaped so it no longer
+matches its index fails here instead of in production.
+"""
+from contextlib import asynccontextmanager
+from typing import List
+
+from sqlalchemy import event
+
+from app.db.session import async_engine
+from app.schemas.tts import TTSJobStatus as TTSJobStatusEnum
+from app.services.lifecycle import LifecycleManager
+from app.services.tts import TTSService
+from app.services.user import get_users
+
+
+@asynccontextmanager
+async def query_plans(db):
+    """Collect the EXPLAIN QUERY PLAN of every statement run inside the block."""
+    executed = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    plans: List[str] = []
+    try:
+        yield plans
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    connection = await db.connection()
+    for statement, parameters in executed:
+        rows = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plans.append("\n".join(row[-1] for row in rows))
+
+
+async def test_history_listing_uses_the_user_indexes(db):
+    service = TTSService(db)
+
+    async with query_plans(db) as plans:
+        await service.get_user_jobs(1)
+    async with query_plans(db) as status_plans:
+        await service.get_user_jobs(1, status=TTSJobStatusEnum.COMPLETED)
+
+    assert "USING INDEX ix_tts_jobs_user_id_created_at" in plans[0]
+    assert "USING INDEX ix_tts_jobs_user_id_status_created_at" in status_plans[0]
+
+
+async def test_admin_user_listing_uses_the_keyset_index(db):
+    async with query_plans(db) as plans:
+        await get_users(db, limit=20)
+
+    assert "ix_users_created_at_id" in plans[0]
+    assert "TEMP B-TREE" not in plans[0]
+
+
+async def test_orphan_sweep_looks_up_keys_by_index(db, storage):
+    async with query_plans(db) as plans:
+        await LifecycleManager(db, storage)._referenced("audios", ["audios/1/a.wav", "audios/1/b.wav"])
+
+    assert "INDEX ix_tts_jobs_audio_key" in plans[0]
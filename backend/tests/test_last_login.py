@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+
+from app.core import security
+from app.core.last_login import LastLoginBuffer
+from app.core.security import create_access_token
+from app.db.session import async_engine
+from app.models.user import User
+
+
+async def add_users(db, count: int) -> list:
+    users = [User(email=f"seen{index}@example.com", hashed_password="x") for index in range(count)]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+async def last_logins(db) -> dict:
+    return dict((await db.execute(select(User.id, User.last_login))).all())
+
+
+async def test_repeated_requests_become_one_batched_update(db):
+    users = await add_users(db, 3)
+    buffer = LastLoginBuffer(async_engine, flush_interval=3600, max_pending=1000, min_interval=300)
+    updates = []
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE users"):
+            updates.append(len(parameters) if executemany else 1)
+
+    for _ in range(50):
+        for user in users:
+            buffer.touch(user.id)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_updates)
+    try:
+        assert await buffer.flush() == 3
+        assert await buffer.flush() == 0
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_updates)
+
+    assert updates == [3]
+    assert all(await last_logins(db))
+
+
+async def test_recent_or_newer_values_are_left_alone(db):
+    recent, stale = await add_users(db, 2)
+    buffer = LastLoginBuffer(async_engine, flush_interval=3600, max_pending=1000, min_interval=300)
+    now = datetime.utcnow()
+    recent.last_login = now - timedelta(seconds=10)
+    stale.last_login = now - timedelta(hours=1)
+    await db.commit()
+
+    # Whatever a cached copy of the user says, the stored value decides
+    buffer.touch(recent.id)
+    buffer.touch(stale.id)
+    await buffer.flush()
+    seen = await last_logins(db)
+    assert seen[recent.id] == recent.last_login
+    assert seen[stale.id] > now - timedelta(seconds=1)
+
+    # Another worker wrote a later time meanwhile
+    later = datetime.utcnow() + timedelta(minutes=5)
+    stale.last_login = later
+    await db.commit()
+    buffer.touch(stale.id)
+    await buffer.flush()
+
+    seen = await last_logins(db)
+    assert seen[stale.id] == later
+
+
+async def test_polling_commits_once_per_flush_instead_of_once_per_request(db, client, monkeypatch):
+    user = (await add_users(db, 1))[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+    polls = 30
+
+    async def commits_for_polls(buffer: LastLoginBuffer) -> int:
+        monkeypatch.setattr(security, "last_login_buffer", buffer)
+        commits = []
+
+        def count_commit(conn):
+            commits.append(conn)
+
+        buffer.start()
+        event.listen(async_engine.sync_engine, "commit", count_commit)
+        try:
+            for _ in range(polls):
+                assert (await client.get("/api/tts/history", headers=headers)).status_code == 200
+            await buffer.stop()
+        finally:
+            event.remove(async_engine.sync_engine, "commit", count_commit)
+        return len(commits)
+
+    # Flushing on every touch is the old UPDATE-per-request behaviour
+    unbuffered = await commits_for_polls(
+        LastLoginBuffer(async_engine, flush_interval=3600, max_pending=1, min_interval=0)
+    )
+    buffered = await commits_for_polls(
+        LastLoginBuffer(async_engine, flush_interval=3600, max_pending=1000, min_interval=300)
+    )
+
+    assert unbuffered >= polls
+    assert buffered == 1
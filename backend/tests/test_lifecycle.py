@@ -0,0 +1,64 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.storage import StorageBlob
+from app.services.blobs import BlobStore
+from app.services.lifecycle import LifecycleManager
+
+
+def days_ago(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+async def add_blob(db, storage, name: str, last_accessed_at: datetime) -> StorageBlob:
+    key = f"blobs/{name}.wav"
+    await storage.upload_file(key, b"RIFF" + name.encode() * 100)
+    blob = StorageBlob(
+        sha256=name.ljust(64, "0"),
+        key=key,
+        size=404,
+        updated_at=days_ago(365),
+        last_accessed_at=last_accessed_at
+    )
+    db.add(blob)
+    await db.commit()
+    return blob
+
+
+async def test_demotes_blobs_by_last_access_not_last_write(db, storage):
+    idle = await add_blob(db, storage, "idle", days_ago(settings.COLD_TIER_AFTER_DAYS + 1))
+    popular = await add_blob(db, storage, "popular", days_ago(1))
+
+    assert await LifecycleManager(db, storage).demote_cold_blobs() == 1
+
+    cold_keys = dict((await db.execute(select(StorageBlob.key, StorageBlob.cold_key))).all())
+    assert cold_keys[idle.key] is not None
+    assert cold_keys[popular.key] is None
+    assert not await storage.file_exists(idle.key)
+
+
+async def test_reads_refresh_a_stale_access_time_once(db, storage):
+    blob = await add_blob(db, storage, "read", days_ago(2))
+    blobs = BlobStore(db, storage)
+
+    assert await blobs.ensure_hot(blob.key) is True
+    await db.commit()
+    assert await blobs.ensure_hot(blob.key) is False
+
+    accessed = await db.scalar(select(StorageBlob.last_accessed_at).where(StorageBlob.id == blob.id))
+    assert accessed.replace(tzinfo=timezone.utc) > days_ago(1)
+
+
+async def test_sweeps_abandoned_staged_uploads(db, storage):
+    abandoned = await storage.stage_file(b"left behind by a failed request")
+    in_flight = await storage.stage_file(b"still being uploaded")
+    old = time.time() - settings.ORPHAN_GRACE_SECONDS - 60
+    os.utime(abandoned.path, (old, old))
+
+    assert await LifecycleManager(db, storage).sweep_orphans("tmp") == 1
+    assert not os.path.exists(abandoned.path)
+    assert os.path.exists(in_flight.path)
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app.core.pagination import count_cache
+from app.db.session import query_budget
+from app.models.tts import TTSJob, TTSJobStatus
+from app.models.user import Subscription, User
+from app.services.tts import TTSService
+from app.services.user import get_user, get_users
+
+
+async def add_users(db, count: int) -> list:
+    start = datetime.utcnow() - timedelta(hours=1)
+    users = [
+        User(
+            email=f"user{index}@example.com",
+            hashed_password="x",
+            created_at=start + timedelta(seconds=index),
+            subscription=Subscription(plan_id="free")
+        )
+        for index in range(count)
+    ]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+async def test_listing_jobs_runs_fixed_queries_and_never_lazy_loads(db):
+    user, = await add_users(db, 1)
+    start = datetime.utcnow() - timedelta(hours=1)
+    db.add_all([
+        TTSJob(
+            user_id=user.id,
+            status=TTSJobStatus.COMPLETED,
+            text=f"job {index}",
+            created_at=start + timedelta(seconds=index)
+        )
+        for index in range(20)
+    ])
+    await db.commit()
+    db.expunge_all()
+    count_cache.invalidate("jobs:")
+
+    with query_budget(1):
+        jobs, _, _ = await TTSService(db).get_user_jobs(user.id, limit=10)
+    with query_budget(2):  # the page and its count
+        _, _, total = await TTSService(db).get_user_jobs(user.id, limit=10, include_total=True)
+        assert total == 20
+
+    assert len(jobs) == 10
+    with pytest.raises(InvalidRequestError):
+        jobs[0].user
+    with pytest.raises(InvalidRequestError):
+        jobs[0].reference_audio
+    with pytest.raises(InvalidRequestError):
+        jobs[0].text  # listings load text_preview only
+
+
+async def test_listing_users_is_one_query_and_never_lazy_loads(db):
+    await add_users(db, 15)
+    db.expunge_all()
+
+    with query_budget(1):
+        users, next_cursor, _ = await get_users(db, limit=10)
+
+    assert len(users) == 10 and next_cursor
+    with pytest.raises(InvalidRequestError):
+        users[0].subscription
+    with pytest.raises(InvalidRequestError):
+        users[0].tts_jobs
+
+
+async def test_user_lookup_loads_only_the_subscription(db):
+    user, = await add_users(db, 1)
+    db.expunge_all()
+
+    with query_budget(2):
+        loaded = await get_user(db, user.id)
+
+    assert loaded.subscription.plan_id == "free"
+    with pytest.raises(InvalidRequestError):
+        loaded.reference_audios
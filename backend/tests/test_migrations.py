@@ -0,0 +1,72 @@
+import os
+from datetime import date, datetime, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
+
+
+def migrate(revision: str) -> None:
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    if revision.startswith("-") or revision == "base":
+        command.downgrade(config, revision)
+    else:
+        command.upgrade(config, revision)
+
+
+def partition_of(conn, job_id: int) -> str:
+    return conn.execute(text("SELECT tableoid::regclass::text FROM tts_jobs WHERE id = :id"), {"id": job_id}).scalar()
+
+
+def test_partitioning_starts_after_the_newest_job(postgres):
+    migrate("0005")
+    with postgres.begin() as conn:
+        user_id = conn.execute(text(
+            "INSERT INTO users (email, hashed_password, role) VALUES ('old@example.com', 'x', 'USER') RETURNING id"
+        )).scalar()
+        job_ids = [
+            conn.execute(text(
+                "INSERT INTO tts_jobs (user_id, status, text, voice_type, created_at) "
+                "VALUES (:user_id, 'COMPLETED', :text, 'STANDARD', :created_at) RETURNING id"
+            ), {"user_id": user_id, "text": "x" * 500, "created_at": created_at}).scalar()
+            for created_at in (datetime(2024, 5, 1), datetime(2027, 3, 15, 12))
+        ]
+
+    migrate("head")
+
+    with postgres.begin() as conn:
+        # The legacy range ends after the 2027 row, and monthly partitions follow it
+        assert [partition_of(conn, job_id) for job_id in job_ids] == ["tts_jobs_legacy", "tts_jobs_legacy"]
+        partitions = set(conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST('tts_jobs' AS regclass)"
+        )).scalars())
+        assert {"tts_jobs_p2027_04", "tts_jobs_default"} <= partitions
+        assert "tts_jobs_p2027_03" not in partitions
+
+        # New jobs go in as before, and the backfill filled every preview
+        new_id = conn.execute(text(
+            "INSERT INTO tts_jobs (user_id, status, text, voice_type) "
+            "VALUES (:user_id, 'QUEUED', 'new', 'STANDARD') RETURNING id"
+        ), {"user_id": user_id}).scalar()
+        assert new_id > max(job_ids)
+        assert conn.execute(text("SELECT count(*) FROM tts_jobs WHERE length(text_preview) = 140")).scalar() == 2
+
+    migrate("0005")
+    with postgres.begin() as conn:
+        assert conn.execute(text("SELECT count(*) FROM tts_jobs")).scalar() == 3
+
+
+def test_boundary_defaults_to_the_month_after_the_upgrade(postgres):
+    migrate("0006")
+    with postgres.begin() as conn:
+        bound = conn.execute(text(
+            "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c WHERE c.relname = 'tts_jobs_legacy'"
+        )).scalar()
+
+    # A day of margin for jobs inserted while the migration runs
+    margin = (datetime.utcnow() + timedelta(days=1)).date()
+    assert f"TO ('{date(margin.year + margin.month // 12, margin.month % 12 + 1, 1)} " in bound
@@ -0,0 +1,54 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.models.user import Subscription, User
+from app.services.quota import reserve_quota
+
+
+async def add_subscriber(db, daily_limit: int, monthly_limit: int) -> User:
+    user = User(
+        email="quota@example.com",
+        hashed_password="x",
+        subscription=Subscription(
+            plan_id="free",
+            daily_character_limit=daily_limit,
+            monthly_character_limit=monthly_limit
+        )
+    )
+    db.add(user)
+    await db.commit()
+    return user
+
+
+async def reserve_concurrently(user_id: int, attempts: int, characters: int) -> int:
+    """Reserve from separate sessions at once, like parallel submits; returns the successes."""
+    async def reserve() -> bool:
+        async with AsyncSessionLocal() as session:
+            reserved = await reserve_quota(session, user_id, characters)
+            await session.commit()
+            return reserved
+
+    return sum(await asyncio.gather(*(reserve() for _ in range(attempts))))
+
+
+async def usage(db, user_id: int):
+    return (await db.execute(
+        select(Subscription.daily_character_usage, Subscription.monthly_character_usage)
+        .where(Subscription.user_id == user_id)
+    )).one()
+
+
+async def test_concurrent_reservations_never_exceed_the_daily_limit(db):
+    user = await add_subscriber(db, daily_limit=500, monthly_limit=10000)
+
+    assert await reserve_concurrently(user.id, attempts=20, characters=100) == 5
+    assert tuple(await usage(db, user.id)) == (500, 500)
+
+
+async def test_concurrent_reservations_never_exceed_the_monthly_limit(db):
+    user = await add_subscriber(db, daily_limit=10000, monthly_limit=350)
+
+    assert await reserve_concurrently(user.id, attempts=20, characters=100) == 3
+    assert tuple(await usage(db, user.id)) == (300, 300)
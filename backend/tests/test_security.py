@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import PasswordHasher, pwd_context
+
+
+async def test_hashing_burst_keeps_the_loop_free_and_sheds_load():
+    hasher = PasswordHasher(pwd_context, workers=2, max_pending=4)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def sign_in():
+        # Stands in for a hash: blocks its thread for a while
+        await hasher.run(time.sleep, 0.2)
+
+    heartbeat = asyncio.get_running_loop().create_task(ticker())
+    results = await asyncio.gather(*(sign_in() for _ in range(10)), return_exceptions=True)
+    heartbeat.cancel()
+
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == 6
+    assert all(error.status_code == 503 and error.headers["Retry-After"] for error in rejected)
+    assert hasher.stats()["completed"] == 4 and hasher.stats()["pending"] == 0
+    # Two workers take about 0.4 s for four hashes; the loop kept running meanwhile
+    assert ticks >= 20
+
+
+async def test_hasher_accepts_work_again_once_drained():
+    hasher = PasswordHasher(pwd_context, workers=1, max_pending=1)
+
+    busy = asyncio.get_running_loop().create_task(hasher.run(time.sleep, 0.05))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException):
+        await hasher.run(time.sleep, 0)
+    await busy
+
+    assert await hasher.run(pwd_context.verify, "secret", pwd_context.hash("secret"))
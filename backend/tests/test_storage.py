@@ -0,0 +1,118 @@
+import io
+import threading
+import time
+from unittest import mock
+
+import boto3
+import pytest
+
+from app.core.config import settings
+from app.services import storage
+
+
+@pytest.fixture
+def s3_session(monkeypatch):
+    """A mocked boto3 session, with the shared client reset around the test."""
+    monkeypatch.setattr(storage, "_s3_client", None)
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "s3")
+    monkeypatch.setattr(settings, "DISK_CACHE_ENABLED", False)
+    with mock.patch.object(storage.boto3.session, "Session") as session:
+        yield session
+
+
+def test_storage_services_share_one_s3_client(s3_session):
+    first = storage.StorageService()
+    second = storage.StorageService()
+
+    s3_session.assert_called_once_with()
+    s3_session.return_value.client.assert_called_once()
+    assert first.s3_client is second.s3_client is s3_session.return_value.client.return_value
+
+
+def test_concurrent_first_use_creates_one_s3_client(s3_session):
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def worker():
+        barrier.wait()
+        clients.append(storage.get_s3_client())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    s3_session.assert_called_once_with()
+    assert len(clients) == 8
+    assert all(client is clients[0] for client in clients)
+
+
+def test_uploads_use_the_shared_transfer_config(s3_session):
+    service = storage.StorageService()
+
+    service.upload_file("audios/a.wav", b"RIFF")
+
+    client = s3_session.return_value.client.return_value
+    assert client.upload_fileobj.call_args.kwargs["Config"] is storage._transfer_config
+
+
+def test_uncached_range_is_a_ranged_get_and_later_reads_hit_the_cache(s3_session, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "DISK_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "DISK_CACHE_PATH", str(tmp_path))
+    client = s3_session.return_value.client.return_value
+    client.get_object.return_value = {"Body": mock.Mock(iter_chunks=mock.Mock(return_value=iter([b"bcd"])))}
+    client.download_fileobj.side_effect = lambda bucket, key, f, Config: f.write(b"abcdef")
+    service = storage.StorageService()
+
+    assert list(service.iter_range("audios/a.wav", 1, 3)) == [b"bcd"]
+    client.get_object.assert_called_once_with(Bucket=service.bucket_name, Key="audios/a.wav", Range="bytes=1-3")
+    client.download_fileobj.assert_not_called()
+
+    service.warm_cache("audios/a.wav")
+    assert list(service.iter_range("audios/a.wav", 1, 3)) == [b"bcd"]
+    assert client.get_object.call_count == 1
+    assert client.download_fileobj.call_count == 1
+
+
+def test_shared_client_transfers_outrun_a_client_per_call(s3):
+    """
+    Round trips through the shared client against a new client per call.
+
+    moto answers in-process, so this measures client construction (session,
+    service model, endpoint resolution) but not the TLS handshakes a fresh
+    client also pays against real S3; the real gap is larger.
+    """
+    payload = b"RIFF" + bytes(64 * 1024)
+    rounds = 10
+
+    def round_trip(client, index):
+        key = f"audios/bench/{index}.wav"
+        client.upload_fileobj(io.BytesIO(payload), settings.S3_BUCKET_NAME, key, Config=storage._transfer_config)
+        body = io.BytesIO()
+        client.download_fileobj(settings.S3_BUCKET_NAME, key, body, Config=storage._transfer_config)
+        assert body.getvalue() == payload
+
+    def new_client():
+        return boto3.session.Session().client(
+            "s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+        )
+
+    shared = storage.get_s3_client()
+    round_trip(shared, -1)  # first use builds the shared client
+
+    started = time.perf_counter()
+    for index in range(rounds):
+        round_trip(shared, index)
+    shared_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for index in range(rounds):
+        round_trip(new_client(), index)
+    per_call_time = time.perf_counter() - started
+
+    assert shared_time * 3 < per_call_time, (shared_time, per_call_time)
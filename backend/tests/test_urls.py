@@ -0,0 +1,49 @@
+import requests
+from sqlalchemy import select
+
+from app.core.security import create_access_token
+from app.models.storage import StorageBlob
+from app.models.tts import TTSJob, TTSJobStatus
+from app.models.user import User
+from app.services.blobs import BlobStore
+from app.services.storage import get_async_storage_service
+from app.services.urls import get_url_service
+
+AUDIO = b"RIFF" + b"\x01\x02" * 4000
+
+
+async def test_listed_url_of_a_demoted_blob_still_serves_the_audio(db, s3, client):
+    storage = get_async_storage_service()
+    user = User(email="cold@example.com", hashed_password="x")
+    db.add(user)
+    await db.flush()
+    audio_key, audio_sha256 = await BlobStore(db, storage).put(AUDIO, ".wav")
+    job = TTSJob(
+        user_id=user.id, status=TTSJobStatus.COMPLETED, text="hello",
+        audio_key=audio_key, audio_sha256=audio_sha256
+    )
+    db.add(job)
+    await db.commit()
+
+    url_service = get_url_service()
+    await url_service.attach_job_urls(db, [job])
+    signed = job.audio_url
+    assert requests.get(signed).content == AUDIO
+
+    blob = await db.scalar(select(StorageBlob).where(StorageBlob.key == audio_key))
+    await BlobStore(db, storage).demote(blob)
+    # The object behind the signed URL is gone while the blob is cold
+    assert requests.get(signed).status_code == 404
+
+    await url_service.attach_job_urls(db, [job])
+    assert job.audio_url == f"/api/tts/audio/{job.id}"
+    response = await client.get(
+        job.audio_url, headers={"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+    )
+    assert response.status_code == 200
+    assert response.content == AUDIO
+
+    # Read back, the blob is hot again and gets a signed URL
+    await url_service.attach_job_urls(db, [job])
+    assert job.audio_url.startswith("https://")
+    assert requests.get(job.audio_url).content == AUDIO
@@ -0,0 +1,50 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.services.usage import backfill
+from tests.test_migrations import migrate
+
+
+async def test_backfill_rebuilds_days_but_keeps_archived_ones(postgres):
+    migrate("head")
+    with postgres.begin() as conn:
+        user_id = conn.execute(text(
+            "INSERT INTO users (email, hashed_password, role) VALUES ('usage@example.com', 'x', 'USER') RETURNING id"
+        )).scalar()
+        jobs = [
+            (datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc), "a" * 10, None),
+            (datetime(2024, 3, 2, 4, 30, tzinfo=timezone.utc), "b" * 20, None),
+            (datetime(2024, 3, 9, 12, tzinfo=timezone.utc), "", datetime(2024, 6, 1, tzinfo=timezone.utc)),
+            (datetime(2024, 3, 9, 13, tzinfo=timezone.utc), "c" * 5, None),
+        ]
+        for created_at, body, archived_at in jobs:
+            conn.execute(text(
+                "INSERT INTO tts_jobs (user_id, status, text, voice_type, created_at, archived_at) "
+                "VALUES (:user_id, 'COMPLETED', :text, 'STANDARD', :created_at, :archived_at)"
+            ), {"user_id": user_id, "text": body, "created_at": created_at, "archived_at": archived_at})
+        # Rollups recorded before the archive ran, and a stale one to be replaced
+        conn.execute(text(
+            "INSERT INTO usage_rollups (user_id, day, jobs, characters) "
+            "VALUES (:user_id, '2024-03-09', 2, 105), (:user_id, '2024-03-02', 9, 999)"
+        ), {"user_id": user_id})
+
+    engine = create_async_engine(settings.TEST_DATABASE_URL.replace("+psycopg2", "+asyncpg"))
+    try:
+        async with AsyncSession(engine) as db:
+            await backfill(db, days_per_batch=3)
+    finally:
+        await engine.dispose()
+
+    with postgres.begin() as conn:
+        rollups = {
+            day: (jobs, characters)
+            for day, jobs, characters in conn.execute(text("SELECT day, jobs, characters FROM usage_rollups"))
+        }
+    assert rollups == {
+        date(2024, 3, 1): (1, 10),
+        date(2024, 3, 2): (1, 20),
+        date(2024, 3, 9): (2, 105),
+    }
@@ -17,6 +17,9 @@ if not exist "backend\.env" (
 echo Starting Backend Server...
 start "Speechix Backend" cmd /k "cd /d c:\Users\msbuddhu\Desktop\Speechix\backend && .\venv\Scripts\activate && uvicorn app.main:app --reload"
 
+echo Starting Scheduler...
+start "Speechix Scheduler" cmd /k "cd /d c:\Users\msbuddhu\Desktop\Speechix\backend && .\venv\Scripts\activate && python -m app.services.scheduler"
+
 echo Starting Frontend Server...
 start "Speechix Frontend" cmd /k "cd /d c:\Users\msbuddhu\Desktop\Speechix && npm install && npm run dev"
 
@@ -52,14 +52,19 @@ if not exist "node_modules" (
 echo.
 echo ✨ Setup complete!
 echo.
-echo To start the development servers, open two terminal windows and run:
+echo To start the development servers, open three terminal windows and run:
 echo.
 echo Terminal 1 (Backend):
 echo cd backend
 echo call venv\Scripts\activate.bat
 echo uvicorn app.main:app --reload
 echo.
-echo Terminal 2 (Frontend):
+echo Terminal 2 (Scheduler - periodic maintenance jobs):
+echo cd backend
+echo call venv\Scripts\activate.bat
+echo python -m app.services.scheduler
+echo.
+echo Terminal 3 (Frontend):
 echo cd %~dp0
 call npm run dev
 echo.
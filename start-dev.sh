@@ -59,7 +59,12 @@ echo "cd backend"
 echo "source venv/bin/activate  # On Windows: .\\venv\\Scripts\\activate"
 echo "uvicorn app.main:app --reload"
 echo ""
-echo "Terminal 2 (Frontend):"
+echo "Terminal 2 (Scheduler - periodic maintenance jobs):"
+echo "cd backend"
+echo "source venv/bin/activate  # On Windows: .\\venv\\Scripts\\activate"
+echo "python -m app.services.scheduler"
+echo ""
+echo "Terminal 3 (Frontend):"
 echo "npm run dev"
 echo ""
 echo "🌐 Access the application at: http://localhost:3000"